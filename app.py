@@ -1,13 +1,46 @@
 import streamlit as st
-import fitz
+import logging
+import os
+import time
 import pandas as pd
-from io import BytesIO
-import re
-import textwrap
 from datetime import datetime
-import plotly.express as px
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+
+from extracteur import (
+    COLONNES_RESULTATS,
+    CONCURRENCE_PAR_DEFAUT,
+    DocumentResultCache,
+    IndicatorStore,
+    LLMResponseCache,
+    PDFEconomicExtractor,
+    RunCheckpointStore,
+    carte_pertinence,
+    empreinte_document,
+    formater_plages,
+    lire_plages,
+    pages_pertinentes,
+    reglages_llm,
+    version_pipeline,
+)
+from extracteur.backends import BACKEND_FAUX, BACKEND_GROQ, BACKEND_OPENAI, URL_OPENAI_PAR_DEFAUT, verifier_connexion
+from extracteur.client_service import STATUTS_FINAUX, ExtractionServiceClient
+from extracteur.service import STATUT_TERMINE
+from extracteur.suivi import AnalyseEnCours
+from extracteur.decoupage import BUDGET_TOKENS_BLOC, CHEVAUCHEMENT_TOKENS
+from extracteur.export import FORMATS_EXPORT, exporter, parquet_disponible
+from extracteur.historique import AGREGATIONS
+from extracteur.limitation import REQUETES_PAR_MINUTE, TOKENS_PAR_MINUTE, planificateur_backend
+from extracteur.mesures import journaliser_rapport
+from extracteur.pertinence import SEUIL_PERTINENCE_PAGE
+from extracteur.preselection import SEUIL_PRESELECTION
+from extracteur.recherche import IndexRecherche
+from extracteur.regles import MODE_HYBRIDE, MODE_LLM, MODE_REGLES
+
+# Journaux du pipeline (dont la ligne JSON de chaque analyse) dans la sortie du serveur Streamlit
+journal = logging.getLogger("extracteur")
+if not journal.handlers:
+    journal.addHandler(logging.StreamHandler())
+    journal.setLevel(logging.INFO)
 
 # Configuration de la page avec thème sombre
 st.set_page_config(
@@ -281,196 +314,25 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-class PDFEconomicExtractor:
-    def __init__(self, groq_api_key):
-        try:
-            from groq import Groq
-            self.client = Groq(api_key=groq_api_key)
-        except Exception as e:
-            st.error(f"Erreur lors de l'initialisation de Groq: {str(e)}")
-            raise e
-        self.tableau_final = []
-
-    def callback_llama_groq(self, bloc):
-        try:
-            prompt = f"""
-MISSION: Extraire UNIQUEMENT les indicateurs économiques OFFICIELS et PRÉCIS du texte.
-
-CRITÈRES STRICTS D'INCLUSION:
-• PIB et croissance économique (avec période précise)
-• Taux d'inflation (général, sectoriel, sous-jacent)  
-• Taux directeurs et politiques monétaires
-• Commerce extérieur (exportations/importations en %)
-• Indices boursiers (MASI, etc.)
-• Taux de change et devises
-• Contribution sectorielle à la croissance
-• Masse monétaire et crédit
-• Déficit/excédent budgétaire
+@st.cache_resource
+def get_llm_cache():
+    return LLMResponseCache()
 
-FORMAT STRICT:
-Secteur/Indicateur|Valeur|Période|Phrase_complète
+@st.cache_resource
+def get_document_cache():
+    return DocumentResultCache()
 
-Texte à analyser:
-{bloc}
-
-Répondez UNIQUEMENT avec les données au format demandé, une ligne par indicateur VALIDE.
-"""
-            
-            completion = self.client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.05,
-                max_tokens=1024
-            )
-            
-            return completion.choices[0].message.content
-            
-        except Exception as e:
-            error_msg = str(e).lower()
-            if "rate limit" in error_msg:
-                st.error("Limite de taux API atteinte. Attendez quelques minutes.")
-            elif "api key" in error_msg or "unauthorized" in error_msg:
-                st.error("Clé API invalide. Vérifiez votre clé Groq.")
-            else:
-                st.error(f"Erreur API Groq: {e}")
-            return ""
+@st.cache_resource
+def get_checkpoint_store():
+    return RunCheckpointStore()
 
-    def analyser_texte_economique(self, llama_response):
-        if not llama_response:
-            return []
-        
-        lignes = llama_response.strip().split('\n')
-        tableau = []
-        
-        mots_cles_valides = [
-            'pib', 'inflation', 'croissance', 'taux', 'export', 'import', 
-            'indice', 'bourse', 'change', 'monétaire', 'budgétaire', 
-            'déficit', 'excédent', 'investissement', 'consommation',
-            'agriculture', 'industrie', 'service', 'manufacture', 'construction'
-        ]
-        
-        for ligne in lignes:
-            ligne = ligne.strip()
-            if ligne and '|' in ligne:
-                ligne = ligne.strip('| ')
-                colonnes = [col.strip() for col in ligne.split('|')]
-                
-                if len(colonnes) >= 4:
-                    secteur_indicateur = colonnes[0].strip()
-                    valeur = colonnes[1].strip()
-                    periode = colonnes[2].strip()
-                    phrase = colonnes[3].strip()
-                    
-                    if self._valider_donnee_economique(secteur_indicateur, valeur, periode, phrase, mots_cles_valides):
-                        tableau.append({
-                            "Secteur/Indicateur": secteur_indicateur,
-                            "Valeur": valeur,
-                            "Période": periode,
-                            "Phrase": phrase
-                        })
-        
-        return tableau
+@st.cache_resource
+def get_indicator_store():
+    return IndicatorStore()
 
-    def _valider_donnee_economique(self, secteur_indicateur, valeur, periode, phrase, mots_cles_valides):
-        if any(mot in secteur_indicateur.lower() for mot in ['secteur', 'indicateur', 'terme', 'valeur']):
-            return False
-        
-        texte_complet = f"{secteur_indicateur} {phrase}".lower()
-        if not any(mot in texte_complet for mot in mots_cles_valides):
-            return False
-        
-        if not re.search(r'-?\d+[,.]?\d*', valeur):
-            return False
-        
-        exclusions = ['téléphone', 'adresse', 'email', 'contact', 'page', 'référence']
-        if any(mot in texte_complet for mot in exclusions):
-            return False
-        
-        if len(secteur_indicateur) < 3 or len(phrase) < 20:
-            return False
-        
-        return True
-
-    def extract_text_from_pdf(self, pdf_bytes):
-        try:
-            document = fitz.open(stream=pdf_bytes, filetype="pdf")
-            text = ""
-            for page in document:
-                text += page.get_text()
-            document.close()
-            return text
-        except Exception as e:
-            st.error(f"Erreur lors de l'extraction du PDF: {e}")
-            return ""
-
-    def clean_text(self, text):
-        text = re.sub(r'\n+', '\n', text)
-        text = re.sub(r'\s+', ' ', text)
-        return text.strip()
-
-    def decouper_en_blocs(self, text, taille_max=1500):
-        blocs = textwrap.wrap(
-            text,
-            width=taille_max,
-            break_long_words=False,
-            break_on_hyphens=False
-        )
-        return blocs
-
-    def filtrer_donnees_qualite(self, donnees):
-        donnees_filtrees = []
-        
-        indicateurs_prioritaires = [
-            'pib', 'croissance', 'inflation', 'taux directeur', 'export', 'import',
-            'indice', 'change', 'bourse', 'déficit', 'masse monétaire'
-        ]
-        
-        for donnee in donnees:
-            secteur_indicateur = donnee.get('Secteur/Indicateur', '').lower()
-            phrase = donnee.get('Phrase', '').lower()
-            valeur = donnee.get('Valeur', '')
-            
-            score = 0
-            
-            for indicateur in indicateurs_prioritaires:
-                if indicateur in secteur_indicateur or indicateur in phrase:
-                    score += 2
-            
-            if '%' in valeur or 'point' in valeur:
-                score += 1
-            
-            if any(mot in phrase for mot in ['trimestre', 'annuel', 'mensuel', '2024', '2025']):
-                score += 1
-            
-            if score >= 2:
-                donnees_filtrees.append(donnee)
-        
-        return donnees_filtrees
-
-def test_api_groq(api_key):
-    try:
-        from groq import Groq
-        client = Groq(api_key=api_key)
-        
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": "Test de connectivité. Répondez simplement 'OK'."}],
-            max_tokens=5,
-            temperature=0
-        )
-        
-        if completion.choices[0].message.content:
-            return True, "API Groq connectée avec succès"
-        else:
-            return False, "Réponse vide de l'API"
-    except Exception as e:
-        error_msg = str(e).lower()
-        if "api key" in error_msg or "unauthorized" in error_msg:
-            return False, "Clé API invalide. Vérifiez votre clé Groq."
-        elif "rate limit" in error_msg:
-            return False, "Limite de taux atteinte. Attendez quelques minutes."
-        else:
-            return False, f"Erreur: {str(e)}"
+@st.cache_data(max_entries=8, show_spinner="Scoring pages...")
+def get_carte_pertinence(pdf_bytes):
+    return carte_pertinence(pdf_bytes)
 
 def get_api_key():
     try:
@@ -479,6 +341,58 @@ def get_api_key():
         default_key = ""
     return default_key
 
+def get_service_url():
+    # Mode client léger : l'extraction est confiée au service (python -m extracteur.service)
+    url = os.environ.get("EXTRACTEUR_SERVICE_URL", "")
+    if not url:
+        try:
+            url = st.secrets.get("EXTRACTEUR_SERVICE_URL", "")
+        except:
+            url = ""
+    return url
+
+def suivre_travail(client, job_id):
+    # Interroge le service jusqu'à la fin du travail ; l'identifiant reste dans l'URL
+    # pour qu'un rechargement de la page reprenne le suivi
+    progress_bar = st.progress(0, text="Waiting in queue...")
+    partiel = st.empty()
+    while True:
+        try:
+            travail = client.resultats(job_id)
+        except Exception as e:
+            st.markdown(f'<div class="status-error">Service d\'extraction injoignable : {str(e)}</div>', 
+                       unsafe_allow_html=True)
+            return
+        if travail["total"]:
+            progress_bar.progress(
+                min(travail["termines"] / travail["total"], 1.0),
+                text=f"{travail['termines']}/{travail['total']} blocks analyzed"
+            )
+        partiel.caption(
+            f"Travail {job_id[:8]} : {travail['statut']}, {len(travail['lignes'])} lignes "
+            f"brutes sur {travail['blocs_analyses']} blocs analysés"
+        )
+        if travail["statut"] in STATUTS_FINAUX:
+            break
+        time.sleep(1)
+    
+    if travail["statut"] != STATUT_TERMINE:
+        st.markdown(f'<div class="status-error">Erreur pendant l\'analyse : {travail["erreur"]}</div>', 
+                   unsafe_allow_html=True)
+        return
+    progress_bar.progress(1.0, text="Analysis completed")
+    df_final = pd.DataFrame(client.sortie(job_id), columns=COLONNES_RESULTATS)
+    if not df_final.empty and travail.get("empreinte"):
+        # Entrepôt d'indicateurs : même clé qu'une analyse locale du PDF (lignes sans provenance)
+        get_indicator_store().ingerer(travail["empreinte"], travail["nom"], df_final)
+    if df_final.empty:
+        st.markdown('<div class="status-warning">Aucun indicateur valide après filtrage qualité</div>', 
+                   unsafe_allow_html=True)
+        return
+    memoriser_resultats(
+        df_final, travail["nom"], f"✅ Analysis completed! {len(df_final)} indicators extracted.", job=job_id
+    )
+
 def create_header():
     st.markdown("""
     <div class="main-header">
@@ -546,7 +460,7 @@ def create_metrics_section(df):
             </div>
             """, unsafe_allow_html=True)
 
-def create_charts(df):
+def create_charts(df, serie=None, cle="resultats"):
     if df is None or df.empty:
         return
     
@@ -578,22 +492,33 @@ def create_charts(df):
         fig.update_xaxes(showgrid=False, color='#9ca3af')
         fig.update_yaxes(showgrid=True, gridcolor='#374151', color='#9ca3af')
         
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(fig, use_container_width=True, key=f"{cle}_secteurs")
     
     with col2:
-        # Graphique temporel
-        periode_counts = df['Période'].value_counts()
-        
         fig = go.Figure()
         
-        fig.add_trace(go.Scatter(
-            x=list(range(len(periode_counts))),
-            y=periode_counts.values,
-            mode='lines+markers',
-            line_color='#38e07b',
-            fill='tonexty',
-            fillcolor='rgba(56, 224, 123, 0.3)'
-        ))
+        if serie is not None and not serie.empty:
+            # Série chronologique de l'entrepôt d'indicateurs : valeurs réelles, périodes dans l'ordre
+            for indicateur, points in serie.groupby('Indicateur', sort=False):
+                fig.add_trace(go.Scatter(
+                    x=points['Période'],
+                    y=points['Valeur'],
+                    mode='lines+markers',
+                    name=indicateur
+                ))
+            fig.update_xaxes(type='category')
+        else:
+            # Graphique temporel
+            periode_counts = df['Période'].value_counts()
+            
+            fig.add_trace(go.Scatter(
+                x=list(range(len(periode_counts))),
+                y=periode_counts.values,
+                mode='lines+markers',
+                line_color='#38e07b',
+                fill='tonexty',
+                fillcolor='rgba(56, 224, 123, 0.3)'
+            ))
         
         fig.update_layout(
             title="Economic Growth Over Time",
@@ -602,13 +527,356 @@ def create_charts(df):
             font_color='white',
             title_font_size=16,
             height=350,
-            showlegend=False
+            showlegend=serie is not None and serie['Indicateur'].nunique() > 1
         )
         
         fig.update_xaxes(showgrid=False, color='#9ca3af')
         fig.update_yaxes(showgrid=True, gridcolor='#374151', color='#9ca3af')
         
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(fig, use_container_width=True, key=f"{cle}_periodes")
+
+@st.fragment(run_every=1.0)
+def suivre_analyse_locale():
+    # Rafraîchi chaque seconde sans réexécuter la page : progression, temps restant, lignes déjà extraites
+    suivi = st.session_state.get("analyse")
+    if suivi is None:
+        return
+    analyse = suivi["analyse"]
+    if analyse.terminee:
+        # Résultats complets, métriques et graphiques : réexécution de toute la page
+        st.rerun()
+    total = analyse.total_estime()
+    restant = analyse.temps_restant()
+    st.progress(
+        min(analyse.termines / total, 1.0) if total else 0.0,
+        text=f"{analyse.termines}/{total} blocks analyzed" if total else "Reading PDF..."
+    )
+    lignes = analyse.lignes()
+    col_etat, col_bouton = st.columns([4, 1])
+    repris = analyse.extractor.nb_blocs_repris
+    col_etat.caption(
+        f"{len(lignes)} indicators found so far — page {analyse.pages_lues}/{analyse.nb_pages or '?'}"
+        + (f" — {repris} blocks recovered from an interrupted run" if repris else "")
+        + (f" — about {restant:.0f} s remaining" if restant is not None else "")
+    )
+    if analyse.annulation.is_set():
+        col_bouton.caption("Cancelling: waiting for requests already sent...")
+    else:
+        col_bouton.button("⏹️ Cancel", on_click=analyse.annuler, help="Stop sending blocks and keep what was extracted")
+    for erreur in suivi["erreurs"]:
+        st.error(erreur)
+    st.dataframe(lignes, use_container_width=True, hide_index=True)
+    st.caption("Preliminary rows, before quality filtering and deduplication.")
+
+def terminer_analyse_locale(suivi):
+    analyse = suivi["analyse"]
+    extractor = analyse.extractor
+    for erreur in suivi["erreurs"]:
+        st.error(erreur)
+    if analyse.erreur is not None:
+        e = analyse.erreur
+        st.markdown(f'<div class="status-error">Erreur pendant l\'analyse : {str(e)}</div>', 
+                   unsafe_allow_html=True)
+        if "api_key" in str(e).lower():
+            st.info("Problème avec la clé API Groq. Vérifiez qu'elle est valide.")
+        elif "rate limit" in str(e).lower():
+            st.info("Limite de taux API atteinte. Attendez quelques minutes.")
+        return
+    
+    if not extractor.nb_blocs:
+        st.markdown('<div class="status-error">Impossible d\'extraire le texte du PDF</div>', 
+                   unsafe_allow_html=True)
+        return
+    
+    rapport = analyse.rapport
+    journaliser_rapport(rapport, document=suivi["nom"])
+    compteurs = rapport["compteurs"]
+    details = [
+        f"Présélection : {extractor.nb_blocs_ignores} appels API évités "
+        f"sur {extractor.nb_blocs} blocs"
+    ]
+    if "pages" in rapport["reglages"]:
+        details.append(
+            f"Pages : {analyse.nb_pages} pages analysées ({rapport['reglages']['pages']}), "
+            f"les autres n'ont pas été envoyées au découpage"
+        )
+    if extractor.mode != MODE_LLM:
+        details.append(f"Moteur de règles : {extractor.nb_blocs_regles} blocs traités hors ligne")
+    if extractor.stats_extraction:
+        stats = extractor.stats_extraction
+        details.append(
+            f"Extraction parallèle : {stats['pages']} pages sur {stats['processus']} processus "
+            f"en {stats['duree']:.1f} s (accélération ×{stats['acceleration']:.1f})"
+        )
+    details.append(
+        f"Cache LLM : {compteurs.get('cache_llm_hits', 0)} hits, "
+        f"{compteurs.get('cache_llm_misses', 0)} misses"
+    )
+    if compteurs.get("tableaux"):
+        details.append(
+            f"Tableaux : {compteurs['tableaux']} tableaux lus d'après la mise en page, "
+            f"{compteurs.get('lignes_tableaux', 0)} indicateurs extraits sans appel API "
+            f"(~{compteurs.get('tokens_tableaux', 0)} tokens non envoyés)"
+        )
+    if compteurs["appels_evites_repetitions"] or compteurs.get("lignes_repetees"):
+        details.append(
+            f"Répétitions : {compteurs.get('lignes_repetees', 0)} lignes d'en-tête/pied de page "
+            f"(~{compteurs.get('tokens_repetes', 0)} tokens), {compteurs.get('phrases_repetees', 0)} phrases "
+            f"répétées (~{compteurs.get('tokens_phrases_repetees', 0)} tokens) et "
+            f"{compteurs.get('blocs_quasi_doublons', 0)} blocs quasi dupliqués retirés, "
+            f"≈ {compteurs['appels_evites_repetitions']} appels API évités"
+        )
+    if extractor.nb_blocs_repris:
+        details.append(
+            f"Reprise : {extractor.nb_blocs_repris} blocs récupérés d'une analyse interrompue, "
+            f"{extractor.nb_blocs - extractor.nb_blocs_ignores - extractor.nb_blocs_repris} nouveaux blocs analysés"
+        )
+    if extractor.nb_blocs_echec:
+        details.append(
+            f"{extractor.nb_blocs_echec} blocs sans réponse de l'API : relancez l'analyse pour ne traiter que ceux-ci"
+        )
+    
+    df_final = analyse.df_final
+    if not df_final.empty:
+        # Entrepôt d'indicateurs : chaque ligne avec sa provenance (bloc, pages) ; un résultat partiel
+        # est remplacé par celui de l'analyse reprise
+        get_indicator_store().ingerer(suivi["empreinte"], suivi["nom"], extractor.resultats_detailles())
+    if df_final.empty:
+        if extractor.tableau_final:
+            st.markdown('<div class="status-warning">Aucun indicateur valide après filtrage qualité</div>', 
+                       unsafe_allow_html=True)
+            st.info("Essayez avec un rapport économique officiel ou un bulletin de banque centrale.")
+        else:
+            st.markdown('<div class="status-warning">Aucun indicateur économique détecté</div>', 
+                       unsafe_allow_html=True)
+            st.info("Le PDF ne semble pas contenir de données économiques exploitables.")
+        return
+    
+    if analyse.annulee or extractor.nb_blocs_echec:
+        # Résultat partiel : affiché et exportable, jamais mis en cache ; relancer l'analyse reprend
+        # au point de reprise
+        message = (
+            f"⏹️ Analysis {'cancelled' if analyse.annulee else 'incomplete'}: {len(df_final)} indicators "
+            f"extracted from {analyse.termines} analyzed blocks (page {analyse.pages_lues}/{analyse.nb_pages}). "
+            "Run the analysis again to resume where it stopped."
+        )
+    else:
+        get_document_cache().set(
+            suivi["empreinte"], suivi["version"], df_final.to_dict("records"), nom=suivi["nom"]
+        )
+        message = f"✅ Analysis completed! {len(df_final)} indicators extracted."
+    memoriser_resultats(df_final, suivi["nom"], message, details, rapport=rapport)
+
+def memoriser_resultats(df_final, nom, message, details=None, job=None, rapport=None):
+    # Conservés entre les reruns : rechercher ou télécharger ne relance ni l'extraction ni les appels LLM
+    st.session_state["resultats"] = {
+        "df": df_final,
+        "nom": nom,
+        "message": message,
+        "details": details or [],
+        "job": job,
+        "rapport": rapport,
+        # Index de recherche construit une seule fois par jeu de résultats
+        "index": IndexRecherche(df_final),
+        # Exports générés à la demande, une fois par format
+        "exports": {},
+    }
+
+def afficher_resultats_memorises(diagnostics=False):
+    resultats = st.session_state.get("resultats")
+    if resultats is None:
+        return
+    st.success(resultats["message"])
+    for detail in resultats["details"]:
+        st.caption(detail)
+    if diagnostics:
+        afficher_diagnostics(resultats["rapport"])
+    display_results(resultats["df"], resultats["index"], resultats["exports"])
+
+def afficher_diagnostics(rapport):
+    # Rapport d'exécution : où passent le temps et le quota, pour régler concurrence et taille des blocs
+    with st.expander("🩺 Run diagnostics", expanded=True):
+        if rapport is None:
+            st.caption("No diagnostics for this result (loaded from cache or computed by the extraction service).")
+            return
+        llm = rapport["llm"]
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Total time", f"{rapport['duree_totale']:.1f} s")
+        col2.metric("API calls", llm["appels"])
+        col3.metric("Latency p50 / p95", f"{llm['latence_p50']:.2f} / {llm['latence_p95']:.2f} s")
+        col4.metric("Tokens (prompt / completion)", f"{llm['tokens_prompt']} / {llm['tokens_completion']}")
+        st.dataframe(
+            pd.DataFrame(
+                [(etape, mesure["appels"], mesure["duree"]) for etape, mesure in rapport["etapes"].items()],
+                columns=["Stage", "Calls", "Self time (s)"]
+            ),
+            use_container_width=True,
+            hide_index=True
+        )
+        st.caption(
+            f"Rate-limit wait: {rapport['attente_planificateur']:.1f} s — "
+            + ", ".join(f"{cle}: {valeur}" for cle, valeur in rapport["compteurs"].items())
+        )
+        st.caption("Settings: " + ", ".join(f"{cle}={valeur}" for cle, valeur in rapport["reglages"].items()))
+
+@st.fragment
+def afficher_historique():
+    # Entrepôt d'indicateurs : séries chronologiques sur tous les documents déjà analysés
+    store = get_indicator_store()
+    documents = store.documents()
+    if documents.empty:
+        return
+    st.markdown("---")
+    with st.expander(f"📈 Indicator history ({len(documents)} documents)"):
+        col_indicateur, col_documents, col_agregation = st.columns([2, 1, 1])
+        derniers = col_documents.number_input(
+            "Last N documents", min_value=1, max_value=len(documents), value=len(documents),
+            help="Documents are ranked by analysis order (most recently ingested first), not by bulletin date"
+        )
+        indicateurs = store.indicateurs(derniers_documents=derniers)
+        indicateur = col_indicateur.selectbox(
+            "Indicator", options=[None] + list(indicateurs["Indicateur"]),
+            format_func=lambda nom: "All indicators" if nom is None else nom
+        )
+        agregation = col_agregation.selectbox(
+            "Conflicting values", options=list(AGREGATIONS),
+            help="Value kept when several documents report different figures for the same period: "
+                 "the most recently analyzed document, or the mean, min or max"
+        )
+        filtres = {"indicateur": indicateur, "derniers_documents": derniers}
+        tableau = store.tableau(**filtres)
+        serie = store.serie(agregation, **filtres)
+        create_metrics_section(tableau)
+        create_charts(tableau, serie=serie if indicateur is not None else None, cle="historique")
+        st.dataframe(
+            serie.drop(columns=["ordre", "dernier_document"]) if indicateur is not None else tableau,
+            use_container_width=True, hide_index=True
+        )
+
+def choisir_pages(pdf_bytes):
+    # Carte de pertinence (sans LLM) : l'utilisateur garde tout le PDF, les N meilleures pages ou des plages ;
+    # renvoie les numéros des pages retenues, ou None pour tout le document
+    carte = get_carte_pertinence(pdf_bytes)
+    nb_pages = len(carte)
+    libelles_selection = {
+        "toutes": "All pages",
+        "meilleures": "Top N relevant pages",
+        "plages": "Page ranges",
+    }
+    with st.expander(f"📑 Page relevance map ({nb_pages} pages)"):
+        selection = st.radio(
+            "Pages to analyze", options=list(libelles_selection), format_func=libelles_selection.get,
+            horizontal=True
+        )
+        pages = None
+        if selection == "meilleures":
+            nb_pertinentes = max(1, int((carte["Score"] >= SEUIL_PERTINENCE_PAGE).sum()))
+            nb_meilleures = st.number_input(
+                "Number of pages", min_value=1, max_value=nb_pages, value=nb_pertinentes,
+                help=f"Default: pages scoring at least {SEUIL_PERTINENCE_PAGE:g}"
+            )
+            pages = pages_pertinentes(carte, nb_meilleures)
+        elif selection == "plages":
+            texte = st.text_input("Page ranges", placeholder="e.g. 1-5, 12, 30-40")
+            if texte.strip():
+                try:
+                    pages = lire_plages(texte, nb_pages)
+                except ValueError as e:
+                    st.markdown(f'<div class="status-error">{e}</div>', unsafe_allow_html=True)
+        
+        retenues = set(pages) if pages is not None else set(carte["Page"])
+        fig = go.Figure(data=[
+            go.Bar(
+                x=carte["Page"],
+                y=carte["Score"],
+                marker_color=['#38e07b' if page in retenues else '#4b5563' for page in carte["Page"]],
+                customdata=carte[["Chiffres", "Mots-clés", "Tableaux", "Section"]],
+                hovertemplate="Page %{x} — score %{y}<br>Figures per 100 words: %{customdata[0]}"
+                              "<br>Keywords: %{customdata[1]}, tables: %{customdata[2]}"
+                              "<br>%{customdata[3]}<extra></extra>"
+            )
+        ])
+        fig.update_layout(
+            paper_bgcolor='rgba(0,0,0,0)',
+            plot_bgcolor='rgba(0,0,0,0)',
+            font_color='white',
+            height=250,
+            margin=dict(l=0, r=0, t=10, b=0)
+        )
+        fig.update_xaxes(showgrid=False, color='#9ca3af', title="Page")
+        fig.update_yaxes(showgrid=True, gridcolor='#374151', color='#9ca3af', title="Relevance")
+        st.plotly_chart(fig, use_container_width=True, key="carte_pertinence")
+        if pages is None:
+            st.caption(f"All {nb_pages} pages will be analyzed")
+        else:
+            st.caption(f"{len(pages)} pages selected of {nb_pages}: {formater_plages(pages)}")
+    return pages
+
+def display_results(df_final, index=None, exports=None):
+    st.markdown("## Data Summary")
+    create_metrics_section(df_final)
+    
+    st.markdown("---")
+    create_charts(df_final)
+    
+    st.markdown("---")
+    st.markdown("## Detailed Data Table")
+    display_table(df_final, index, exports)
+
+@st.fragment
+def display_table(df_final, index=None, exports=None):
+    # Fragment : la recherche et les téléchargements ne réexécutent que cette partie de la page
+    if index is None:
+        index = IndexRecherche(df_final)
+    
+    # Barre de recherche
+    search_term = st.text_input(
+        "🔍 Search data entries...",
+        "",
+        help='Accent-insensitive. Scope with secteur:, periode:, phrase:, valeur: — '
+             'e.g. `secteur:inflation periode:2023 valeur>=2.5`, `valeur:1..3`, `"taux directeur"`'
+    )
+    
+    # Filtrage des données
+    df_display = index.rechercher(search_term)
+    
+    # Affichage du tableau
+    st.dataframe(
+        df_display,
+        use_container_width=True,
+        height=400
+    )
+    
+    # Boutons de téléchargement : fichiers générés au clic seulement
+    if exports is None:
+        exports = {}
+    libelles = {"csv": "📄 Download CSV", "xlsx": "📊 Download Excel", "parquet": "🗄️ Download Parquet"}
+    horodatage = datetime.now().strftime('%Y%m%d_%H%M')
+    
+    for colonne, format_export in zip(st.columns(len(libelles)), libelles):
+        extension, mime = FORMATS_EXPORT[format_export]
+        with colonne:
+            disponible = format_export != "parquet" or parquet_disponible()
+            st.download_button(
+                label=libelles[format_export],
+                data=export_differe(df_final, format_export, exports),
+                file_name=f"economic_data_{horodatage}.{extension}",
+                mime=mime,
+                on_click="ignore",
+                disabled=not disponible,
+                help=None if disponible else "Requires pyarrow (pip install pyarrow)",
+                use_container_width=True
+            )
+
+def export_differe(df_final, format_export, exports):
+    # Export généré au premier téléchargement puis conservé pour ce jeu de résultats
+    def generer():
+        if format_export not in exports:
+            exports[format_export] = exporter(df_final, format_export)
+        fichier = exports[format_export]
+        fichier.seek(0)
+        return fichier.read()
+    return generer
 
 def main():
     # Header
@@ -641,11 +909,38 @@ def main():
         )
         st.markdown('</div>', unsafe_allow_html=True)
         
-        # Statut de l'API
-        if api_key:
+        # API LLM : Groq, serveur local compatible OpenAI (vLLM, llama.cpp, Ollama...) ou client simulé
+        libelles_backends = {
+            BACKEND_GROQ: "Groq",
+            BACKEND_OPENAI: "OpenAI-compatible server",
+            BACKEND_FAUX: "Simulated (offline demo)",
+        }
+        backend = st.selectbox("LLM backend", options=list(libelles_backends), format_func=libelles_backends.get)
+        base_url = None
+        modele = None
+        if backend == BACKEND_OPENAI:
+            base_url = st.text_input("Server URL", value=URL_OPENAI_PAR_DEFAUT)
+            modele = st.text_input("Model", help="Model name expected by the server (required)") or None
+        
+        # Quotas par minute de l'API : ceux de l'offre gratuite Groq, aucun par défaut pour un serveur local
+        requetes_par_minute = tokens_par_minute = None
+        if backend != BACKEND_FAUX:
+            col_rpm, col_tpm = st.columns(2)
+            groq = backend == BACKEND_GROQ
+            requetes_par_minute = col_rpm.number_input(
+                "Requests per minute", min_value=0, value=REQUETES_PAR_MINUTE if groq else 0,
+                help="API quota (0 = unlimited)"
+            )
+            tokens_par_minute = col_tpm.number_input(
+                "Tokens per minute", min_value=0, value=TOKENS_PAR_MINUTE if groq else 0, step=1000,
+                help="API quota (0 = unlimited)"
+            )
+        
+        # Statut de l'API (le résultat de la vérification est ensuite réutilisé par l'analyse)
+        if api_key or backend != BACKEND_GROQ:
             if st.button("🔍 Test API Connection", key="test_api"):
                 with st.spinner("Testing..."):
-                    success, message = test_api_groq(api_key)
+                    success, message = verifier_connexion(backend, api_key, base_url, forcer=True)
                     if success:
                         st.markdown(f'<div class="status-success">{message}</div>', unsafe_allow_html=True)
                     else:
@@ -668,8 +963,90 @@ def main():
             st.markdown(f'<div class="status-success">✅ {uploaded_file.name} loaded ({file_size_mb:.1f} MB)</div>', 
                        unsafe_allow_html=True)
         
-        # Bouton d'analyse
-        analyze_button = st.button("🔍 Analyze PDF", type="primary", disabled=not uploaded_file or not api_key)
+        # Pages envoyées au découpage en blocs, choisies avant tout appel LLM
+        pages = choisir_pages(uploaded_file.getvalue()) if uploaded_file else None
+        
+        # Mode d'extraction : LLM, règles locales (hors ligne) ou hybride
+        libelles_modes = {
+            MODE_LLM: "AI (Groq)",
+            MODE_HYBRIDE: "Hybrid (rules + AI for ambiguous blocks)",
+            MODE_REGLES: "Offline rules only",
+        }
+        mode = st.radio(
+            "Extraction mode",
+            options=list(libelles_modes),
+            format_func=libelles_modes.get,
+            horizontal=True
+        )
+        
+        # Nombre de requêtes simultanées vers Groq
+        concurrence = st.slider(
+            "Parallel API requests",
+            min_value=1,
+            max_value=16,
+            value=CONCURRENCE_PAR_DEFAUT,
+            help="Number of blocks analyzed concurrently by the Groq API"
+        )
+        
+        # Taille des blocs envoyés à Groq
+        budget_tokens = st.slider(
+            "Block size (tokens)",
+            min_value=300,
+            max_value=3000,
+            value=BUDGET_TOKENS_BLOC,
+            step=100,
+            help="Sentence-aligned blocks are packed up to this token budget"
+        )
+        
+        # Chevauchement : les dernières phrases d'un bloc sont reprises au début du suivant
+        chevauchement_tokens = st.slider(
+            "Block overlap (tokens)",
+            min_value=0,
+            max_value=budget_tokens // 2,
+            value=min(CHEVAUCHEMENT_TOKENS, budget_tokens // 2),
+            step=50,
+            help="Trailing sentences repeated at the start of the next block, so that figures split "
+                 "across two blocks keep their context (duplicate rows are merged)"
+        )
+        
+        # Seuil de présélection locale (0 = tous les blocs sont envoyés à Groq)
+        seuil_preselection = st.slider(
+            "Pre-screening threshold",
+            min_value=0.0,
+            max_value=8.0,
+            value=SEUIL_PRESELECTION,
+            step=0.5,
+            help="Blocks scoring below this threshold (figures, %, periods, keywords) are not sent to the API"
+        )
+        
+        mode_lot = st.checkbox(
+            "Batch blocks into fewer API requests",
+            value=True,
+            help="Several blocks share one request and one copy of the instructions"
+        )
+        
+        reanalyser = st.checkbox(
+            "Ignore cached result",
+            help="Invalidate the stored result for this PDF and run the full analysis again"
+        )
+        
+        diagnostics = st.checkbox(
+            "Show run diagnostics",
+            help="Per-stage timings, API latency and token usage of the last analysis"
+        )
+        
+        # Bouton d'analyse (en mode service, la clé API est celle du service)
+        service_url = get_service_url()
+        cle_requise = mode != MODE_REGLES and not service_url and backend == BACKEND_GROQ
+        # Un serveur compatible OpenAI ne connaît pas le modèle Groq : son nom est obligatoire
+        modele_requis = mode != MODE_REGLES and not service_url and backend == BACKEND_OPENAI
+        if modele_requis and not modele:
+            st.caption("Enter the model name served by the OpenAI-compatible server to run an analysis")
+        analyze_button = st.button(
+            "🔍 Analyze PDF",
+            type="primary",
+            disabled=not uploaded_file or (cle_requise and not api_key) or (modele_requis and not modele)
+        )
     
     with col_summary:
         # Section de résumé
@@ -685,124 +1062,118 @@ def main():
         </div>
         """, unsafe_allow_html=True)
     
+    # Mode client léger : soumission au service puis suivi du travail
+    if service_url:
+        client = ExtractionServiceClient(service_url)
+        if analyze_button and uploaded_file:
+            try:
+                st.query_params["job"] = client.soumettre(
+                    uploaded_file.getvalue(),
+                    uploaded_file.name,
+                    mode=mode,
+                    budget_tokens=budget_tokens,
+                    chevauchement_tokens=chevauchement_tokens,
+                    seuil_preselection=seuil_preselection,
+                    mode_lot=mode_lot,
+                    concurrence=concurrence,
+                    **({} if pages is None else {"pages": formater_plages(pages)})
+                )
+            except Exception as e:
+                st.markdown(f'<div class="status-error">Service d\'extraction injoignable : {str(e)}</div>', 
+                           unsafe_allow_html=True)
+                return
+        job_id = st.query_params.get("job")
+        resultats = st.session_state.get("resultats")
+        if job_id and (resultats is None or resultats["job"] != job_id):
+            suivre_travail(client, job_id)
+        afficher_resultats_memorises(diagnostics)
+        return
+    
     # Traitement de l'analyse
-    if analyze_button and uploaded_file and api_key:
-        # Test préliminaire de l'API
-        success, message = test_api_groq(api_key)
-        if not success:
-            st.markdown(f'<div class="status-error">Impossible de se connecter à l\'API Groq: {message}</div>', 
-                       unsafe_allow_html=True)
+    if analyze_button and uploaded_file and (api_key or not cle_requise) and (modele or not modele_requis):
+        pdf_bytes = uploaded_file.getvalue()
+        st.session_state.pop("resultats", None)
+        # Une nouvelle analyse remplace celle encore en cours
+        precedente = st.session_state.pop("analyse", None)
+        if precedente is not None:
+            precedente["analyse"].annuler()
+        # La sélection de pages fait partie de la clé : un résultat partiel ne sert pas pour le document entier
+        version = version_pipeline(
+            mode=mode, budget=budget_tokens, chevauchement=chevauchement_tokens, seuil=seuil_preselection,
+            lot=mode_lot,
+            **reglages_llm(backend, modele), **({} if pages is None else {"pages": formater_plages(pages)})
+        )
+        
+        # Résultat déjà calculé pour ce PDF avec la même version du pipeline
+        document_cache = get_document_cache()
+        empreinte = empreinte_document(pdf_bytes)
+        if reanalyser:
+            document_cache.invalider(empreinte)
+            get_checkpoint_store().effacer(empreinte)
+        lignes_en_cache = document_cache.get(empreinte, version)
+        if lignes_en_cache is not None:
+            df_final = pd.DataFrame(lignes_en_cache, columns=COLONNES_RESULTATS)
+            if not get_indicator_store().contient(empreinte):
+                # Résultat antérieur à l'entrepôt : ingéré sans provenance
+                get_indicator_store().ingerer(empreinte, uploaded_file.name, df_final)
+            memoriser_resultats(
+                df_final, uploaded_file.name, f"✅ Cached result loaded! {len(df_final)} indicators extracted."
+            )
+            afficher_resultats_memorises(diagnostics)
+            afficher_historique()
             return
         
-        with st.spinner("Analyzing PDF..."):
-            try:
-                extractor = PDFEconomicExtractor(api_key)
-                
-                # Extraction du texte
-                pdf_bytes = uploaded_file.getvalue()
-                texte_brut = extractor.extract_text_from_pdf(pdf_bytes)
-                
-                if not texte_brut:
-                    st.markdown('<div class="status-error">Impossible d\'extraire le texte du PDF</div>', 
-                               unsafe_allow_html=True)
-                    return
-                
-                # Nettoyage et découpage
-                texte_propre = extractor.clean_text(texte_brut)
-                blocs = extractor.decouper_en_blocs(texte_propre)
-                
-                # Analyse par blocs
-                progress_bar = st.progress(0)
-                for i, bloc in enumerate(blocs):
-                    reponse_llama = extractor.callback_llama_groq(bloc)
-                    if reponse_llama:
-                        donnees_structurees = extractor.analyser_texte_economique(reponse_llama)
-                        extractor.tableau_final.extend(donnees_structurees)
-                    
-                    progress_bar.progress((i + 1) / len(blocs))
-                
-                # Filtrage et finalisation
-                if extractor.tableau_final:
-                    donnees_filtrees = extractor.filtrer_donnees_qualite(extractor.tableau_final)
-                    
-                    if donnees_filtrees:
-                        df_final = pd.DataFrame(donnees_filtrees)
-                        df_final = df_final.drop_duplicates(subset=['Secteur/Indicateur', 'Valeur'])
-                        df_final = df_final.sort_values(['Secteur/Indicateur', 'Période']).reset_index(drop=True)
-                        
-                        st.success(f"✅ Analysis completed! {len(df_final)} indicators extracted.")
-                        
-                        # Affichage des résultats
-                        st.markdown("## Data Summary")
-                        create_metrics_section(df_final)
-                        
-                        st.markdown("---")
-                        create_charts(df_final)
-                        
-                        st.markdown("---")
-                        st.markdown("## Detailed Data Table")
-                        
-                        # Barre de recherche
-                        search_term = st.text_input("🔍 Search data entries...", "")
-                        
-                        # Filtrage des données
-                        if search_term:
-                            df_display = df_final[
-                                df_final.apply(lambda row: search_term.lower() in row.to_string().lower(), axis=1)
-                            ]
-                        else:
-                            df_display = df_final
-                        
-                        # Affichage du tableau
-                        st.dataframe(
-                            df_display,
-                            use_container_width=True,
-                            height=400
-                        )
-                        
-                        # Boutons de téléchargement
-                        col_dl1, col_dl2 = st.columns(2)
-                        
-                        with col_dl1:
-                            csv_data = df_final.to_csv(index=False, sep=';', encoding='utf-8')
-                            st.download_button(
-                                label="📄 Download CSV",
-                                data=csv_data,
-                                file_name=f"economic_data_{datetime.now().strftime('%Y%m%d_%H%M')}.csv",
-                                mime="text/csv",
-                                use_container_width=True
-                            )
-                        
-                        with col_dl2:
-                            excel_buffer = BytesIO()
-                            df_final.to_excel(excel_buffer, index=False, engine='openpyxl')
-                            excel_buffer.seek(0)
-                            
-                            st.download_button(
-                                label="📊 Download Excel",
-                                data=excel_buffer,
-                                file_name=f"economic_data_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
-                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                                use_container_width=True
-                            )
-                    
-                    else:
-                        st.markdown('<div class="status-warning">Aucun indicateur valide après filtrage qualité</div>', 
-                                   unsafe_allow_html=True)
-                        st.info("Essayez avec un rapport économique officiel ou un bulletin de banque centrale.")
-                
-                else:
-                    st.markdown('<div class="status-warning">Aucun indicateur économique détecté</div>', 
-                               unsafe_allow_html=True)
-                    st.info("Le PDF ne semble pas contenir de données économiques exploitables.")
-            
-            except Exception as e:
-                st.markdown(f'<div class="status-error">Erreur pendant l\'analyse : {str(e)}</div>', 
+        # Vérification de l'API : liste des modèles, sans tokens, mémorisée quelques minutes par clé
+        if mode != MODE_REGLES:
+            success, message = verifier_connexion(backend, api_key, base_url)
+            if not success:
+                st.markdown(f'<div class="status-error">Impossible de se connecter à l\'API LLM: {message}</div>', 
                            unsafe_allow_html=True)
-                if "api_key" in str(e).lower():
-                    st.info("Problème avec la clé API Groq. Vérifiez qu'elle est valide.")
-                elif "rate limit" in str(e).lower():
-                    st.info("Limite de taux API atteinte. Attendez quelques minutes.")
+                return
+        
+        # Analyse en arrière-plan : les lignes s'affichent au fil des blocs, l'analyse peut être annulée
+        # Point de reprise : les blocs acquis par une analyse interrompue de ce PDF ne sont pas renvoyés
+        reprise = get_checkpoint_store().reprise(empreinte, version) if mode != MODE_REGLES else None
+        erreurs = []
+        extractor = PDFEconomicExtractor(
+            api_key,
+            planificateur=planificateur_backend(backend, requetes_par_minute, tokens_par_minute),
+            cache=get_llm_cache(),
+            mode=mode,
+            backend=backend,
+            base_url=base_url,
+            modele=modele,
+            signaler_erreur=erreurs.append
+        )
+        st.session_state["analyse"] = {
+            "analyse": AnalyseEnCours(
+                extractor,
+                pdf_bytes,
+                budget_tokens=budget_tokens,
+                chevauchement_tokens=chevauchement_tokens,
+                seuil_preselection=seuil_preselection,
+                max_workers=concurrence,
+                mode_lot=mode_lot,
+                reprise=reprise,
+                pages=pages
+            ).demarrer(),
+            "nom": uploaded_file.name,
+            "empreinte": empreinte,
+            "version": version,
+            "erreurs": erreurs,
+        }
+    
+    suivi = st.session_state.get("analyse")
+    if suivi is not None:
+        if not suivi["analyse"].terminee:
+            suivre_analyse_locale()
+            return
+        st.session_state.pop("analyse")
+        terminer_analyse_locale(suivi)
+    
+    # Derniers résultats de la session, réaffichés à chaque rerun sans nouvelle analyse
+    afficher_resultats_memorises(diagnostics)
+    afficher_historique()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,13 @@
+from .cache import DocumentResultCache, LLMResponseCache, RunCheckpointStore, cle_reponse, empreinte_document
+from .historique import IndicatorStore
+from .limitation import RateLimitScheduler, est_limite_de_taux
+from .pipeline import (
+    COLONNES_RESULTATS,
+    CONCURRENCE_PAR_DEFAUT,
+    PDFEconomicExtractor,
+    VERSION_PIPELINE,
+    reglages_llm,
+    version_pipeline,
+)
+from .pertinence import carte_pertinence, formater_plages, lire_plages, pages_pertinentes
+from .preselection import score_pertinence
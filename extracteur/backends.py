@@ -0,0 +1,131 @@
+import hashlib
+import threading
+import time
+from types import SimpleNamespace
+
+BACKEND_GROQ = "groq"
+BACKEND_OPENAI = "openai"
+BACKEND_FAUX = "faux"
+
+NOMS_BACKENDS = {
+    BACKEND_GROQ: "Groq",
+    BACKEND_OPENAI: "compatible OpenAI",
+    BACKEND_FAUX: "simulée",
+}
+
+# Serveur local compatible OpenAI (vLLM, llama.cpp, Ollama, LM Studio...)
+URL_OPENAI_PAR_DEFAUT = "http://127.0.0.1:8000/v1"
+
+# Durée de validité d'une vérification de connexion réussie, et d'un échec
+DUREE_VALIDITE_VERIFICATION = 300
+DUREE_VALIDITE_ECHEC = 30
+
+
+class ErreurAPICompatible(Exception):
+    # Même interface que les erreurs du SDK Groq : status_code et response.headers (retry-after)
+    def __init__(self, reponse):
+        super().__init__(f"Error code: {reponse.status_code} ({reponse.reason_phrase}) - {reponse.text[:500]}")
+        self.status_code = reponse.status_code
+        self.response = reponse
+
+
+class ClientCompatibleOpenAI:
+    # Client minimal de l'API /chat/completions, sur une connexion HTTP persistante
+    def __init__(self, base_url=URL_OPENAI_PAR_DEFAUT, api_key="", timeout=120.0):
+        import httpx
+
+        entetes = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self._http = httpx.Client(base_url=base_url.rstrip("/") + "/", headers=entetes, timeout=timeout)
+        self.chat = SimpleNamespace(completions=self)
+        self.models = SimpleNamespace(list=self.lister_modeles)
+
+    def _requete(self, methode, chemin, **options):
+        reponse = self._http.request(methode, chemin, **options)
+        if reponse.status_code >= 400:
+            raise ErreurAPICompatible(reponse)
+        return reponse.json()
+
+    def create(self, model, messages, **parametres):
+        donnees = self._requete("POST", "chat/completions", json={"model": model, "messages": messages, **parametres})
+        usage = donnees.get("usage")
+        return SimpleNamespace(
+            choices=[
+                SimpleNamespace(message=SimpleNamespace(content=choix.get("message", {}).get("content") or ""))
+                for choix in donnees.get("choices", [])
+            ],
+            usage=SimpleNamespace(**usage) if usage else None,
+        )
+
+    def lister_modeles(self):
+        return self._requete("GET", "models").get("data", [])
+
+
+def creer_client(backend=BACKEND_GROQ, api_key="", base_url=None):
+    if backend == BACKEND_GROQ:
+        from groq import Groq
+
+        # Les nouvelles tentatives sont gérées par le planificateur
+        return Groq(api_key=api_key, max_retries=0, **({"base_url": base_url} if base_url else {}))
+    if backend == BACKEND_OPENAI:
+        return ClientCompatibleOpenAI(base_url or URL_OPENAI_PAR_DEFAUT, api_key)
+    if backend == BACKEND_FAUX:
+        from .faux_llm import FakeGroqClient
+
+        return FakeGroqClient(latence=0.2)
+    raise ValueError(f"Backend LLM inconnu : {backend}")
+
+
+_lock = threading.Lock()
+_clients = {}
+_verifications = {}
+
+
+def _cle(backend, api_key, base_url):
+    # La clé API n'est conservée que sous forme d'empreinte
+    return backend, hashlib.sha256(api_key.encode("utf-8")).hexdigest(), base_url or ""
+
+
+def obtenir_client(backend=BACKEND_GROQ, api_key="", base_url=None):
+    # Un client par backend et par clé pour tout le processus : sa pool de connexions HTTP
+    # est réutilisée d'une analyse et d'une session à l'autre (pas de nouvelle poignée de main TLS)
+    cle = _cle(backend, api_key, base_url)
+    with _lock:
+        client = _clients.get(cle)
+        if client is None:
+            client = _clients[cle] = creer_client(backend, api_key, base_url)
+    return client
+
+
+def _verifier(client, backend):
+    nom = NOMS_BACKENDS.get(backend, backend)
+    try:
+        # Liste des modèles : aucun token consommé, et la connexion ouverte sert ensuite à l'analyse
+        client.models.list()
+        return True, f"API LLM ({nom}) connectée avec succès"
+    except Exception as e:
+        error_msg = str(e).lower()
+        if "api key" in error_msg or "unauthorized" in error_msg:
+            return False, f"Clé API invalide ({nom}). Vérifiez votre clé."
+        elif "rate limit" in error_msg:
+            return False, "Limite de taux atteinte. Attendez quelques minutes."
+        else:
+            return False, f"Erreur: {str(e)}"
+
+
+def verifier_connexion(backend=BACKEND_GROQ, api_key="", base_url=None, forcer=False, horloge=time.monotonic):
+    # Résultat mémorisé DUREE_VALIDITE_VERIFICATION secondes (DUREE_VALIDITE_ECHEC après un échec)
+    cle = _cle(backend, api_key, base_url)
+    maintenant = horloge()
+    with _lock:
+        memorise = _verifications.get(cle)
+    if memorise is not None and not forcer and memorise[0] > maintenant:
+        return memorise[1]
+    try:
+        client = obtenir_client(backend, api_key, base_url)
+    except Exception as e:
+        return False, f"Erreur lors de l'initialisation du client: {str(e)}"
+    resultat = _verifier(client, backend)
+    validite = DUREE_VALIDITE_VERIFICATION if resultat[0] else DUREE_VALIDITE_ECHEC
+    with _lock:
+        _verifications[cle] = (maintenant + validite, resultat)
+    return resultat
@@ -0,0 +1,302 @@
+import argparse
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import fitz
+
+from .decoupage import BUDGET_TOKENS_BLOC
+from .faux_llm import FakeGroqClient
+from .limitation import RateLimitScheduler
+from .pipeline import CONCURRENCE_PAR_DEFAUT, PDFEconomicExtractor, VERSION_PIPELINE
+from .preselection import SEUIL_PRESELECTION
+from .regles import MODE_HYBRIDE, MODE_LLM, MODE_REGLES
+
+try:
+    import resource
+except ImportError:  # Windows : pas de mesure du pic mémoire
+    resource = None
+
+logger = logging.getLogger("extracteur.benchmark")
+
+PHRASES_ECONOMIQUES = [
+    "Le produit intérieur brut a progressé de {v}% au {trimestre} trimestre {annee}, après {w}% un an plus tôt.",
+    "L'inflation a atteint {v}% en glissement annuel à fin {mois} {annee}.",
+    "L'inflation sous-jacente s'est établie à {v}% en {mois} {annee}.",
+    "Le taux directeur a été maintenu à {v}% lors de la réunion du conseil de {mois} {annee}.",
+    "Les exportations ont augmenté de {v}% en {annee}, portées par la demande extérieure.",
+    "Les importations ont reculé de {v}% au {trimestre} trimestre {annee}.",
+    "Le déficit budgétaire s'est établi à {v}% du PIB en {annee}.",
+    "La masse monétaire a enregistré une hausse de {v}% au {trimestre} trimestre {annee}.",
+    "La valeur ajoutée agricole a reculé de {v}% en {annee}, pénalisée par la sécheresse.",
+    "L'indice MASI a gagné {v}% sur l'ensemble de l'année {annee}.",
+    "Le taux de chômage est passé à {v}% au {trimestre} trimestre {annee}.",
+]
+
+PHRASES_NEUTRES = [
+    "Le présent rapport s'inscrit dans le cadre de la mission de suivi de la conjoncture.",
+    "Les développements qui suivent reprennent les principales évolutions observées au cours de la période.",
+    "Cette section présente le contexte international et ses implications pour l'économie nationale.",
+    "Les travaux du comité ont porté sur l'analyse des risques entourant les perspectives.",
+    "Le conseil a examiné les projections macroéconomiques établies par les services.",
+    "Plusieurs réformes structurelles ont été engagées afin de renforcer la résilience du système financier.",
+]
+
+_TRIMESTRES = ["premier", "deuxième", "troisième", "quatrième"]
+_MOIS = ["janvier", "mars", "juin", "septembre", "décembre"]
+
+
+def generer_pdf(nb_pages, densite=0.3, graine=0):
+    # Rapport économique synthétique et reproductible : densite = part de phrases chiffrées
+    aleatoire = random.Random(graine)
+    document = fitz.open()
+    try:
+        for numero in range(nb_pages):
+            page = document.new_page()
+            page.insert_text((50, 30), "Banque centrale - Rapport sur la politique monétaire", fontsize=8)
+            phrases = []
+            for _ in range(28):
+                if aleatoire.random() < densite:
+                    phrases.append(aleatoire.choice(PHRASES_ECONOMIQUES).format(
+                        v=f"{aleatoire.uniform(-5, 12):.1f}".replace(".", ","),
+                        w=f"{aleatoire.uniform(0, 8):.1f}".replace(".", ","),
+                        trimestre=aleatoire.choice(_TRIMESTRES),
+                        mois=aleatoire.choice(_MOIS),
+                        annee=aleatoire.randint(2019, 2025),
+                    ))
+                else:
+                    phrases.append(aleatoire.choice(PHRASES_NEUTRES))
+            page.insert_textbox(fitz.Rect(50, 50, 545, 780), " ".join(phrases), fontsize=9)
+            page.insert_text((280, 815), str(numero + 1), fontsize=8)
+        return document.tobytes()
+    finally:
+        document.close()
+
+
+def _memoire_pic_mib():
+    if resource is None:
+        return None
+    pic = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss : kilo-octets sous Linux, octets sous macOS
+    return round(pic / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _executer_analyse(pdf_bytes, scenario, cache):
+    client = FakeGroqClient(
+        latence=scenario["latence"], taux_erreur=scenario["taux_erreur"],
+        graine=scenario["graine"], retry_after=scenario["retry_after"]
+    )
+    planificateur = RateLimitScheduler(
+        requetes_par_minute=scenario["rpm"] or 10**6,
+        tokens_par_minute=scenario["tpm"] or 10**9,
+        aleatoire=random.Random(scenario["graine"]).random
+    )
+    extractor = PDFEconomicExtractor("", client=client, planificateur=planificateur, cache=cache,
+                                     mode=scenario["mode"])
+    depart = time.perf_counter()
+    df = extractor.analyser_document(
+        pdf_bytes,
+        budget_tokens=scenario["budget_tokens"],
+        seuil_preselection=scenario["seuil_preselection"],
+        max_workers=scenario["concurrence"],
+        mode_lot=scenario["mode_lot"]
+    )
+    duree = time.perf_counter() - depart
+    rapport = extractor.rapport_execution()
+    latences = sorted(rapport["llm"].pop("latences"))
+    rapport["llm"]["latence_p99"] = round(latences[min(len(latences) - 1, int(0.99 * len(latences)))], 4) \
+        if latences else 0.0
+    rapport["llm"].update(tentatives=client.nb_appels, erreurs_injectees=client.nb_erreurs)
+    return {
+        "duree": round(duree, 4),
+        "pages_par_seconde": round(scenario["pages"] / duree, 2) if duree else None,
+        "blocs_par_seconde": round(extractor.nb_blocs / duree, 2) if duree else None,
+        "indicateurs": len(df),
+        **rapport,
+    }
+
+
+def executer_scenario(chemin_pdf, scenario):
+    # Exécuté dans un processus neuf : le pic mémoire mesuré est celui de ce seul scénario
+    from .cache import LLMResponseCache
+
+    pdf_bytes = Path(chemin_pdf).read_bytes()
+    memoire_base = _memoire_pic_mib()
+    if not scenario["cache"]:
+        resultat = _executer_analyse(pdf_bytes, scenario, None)
+        return [{**resultat, "cache": None, "memoire_base_mib": memoire_base, "memoire_pic_mib": _memoire_pic_mib()}]
+
+    # Cache de réponses vide puis rempli : mesure le gain d'une seconde analyse du même document
+    with tempfile.TemporaryDirectory() as repertoire:
+        cache = LLMResponseCache(chemin=Path(repertoire) / "reponses.sqlite3")
+        froid = _executer_analyse(pdf_bytes, scenario, cache)
+        chaud = _executer_analyse(pdf_bytes, scenario, cache)
+    memoire_pic = _memoire_pic_mib()
+    return [
+        {**froid, "cache": "froid", "memoire_base_mib": memoire_base, "memoire_pic_mib": memoire_pic},
+        {**chaud, "cache": "chaud", "memoire_base_mib": memoire_base, "memoire_pic_mib": memoire_pic},
+    ]
+
+
+def cle_scenario(resultat):
+    scenario = {cle: valeur for cle, valeur in resultat["scenario"].items() if cle != "graine"}
+    return json.dumps({**scenario, "cache": resultat["cache"]}, sort_keys=True)
+
+
+def synthetiser(resultats):
+    # Médiane des répétitions pour chaque scénario
+    groupes = {}
+    for resultat in resultats:
+        groupes.setdefault(cle_scenario(resultat), []).append(resultat)
+    synthese = []
+    for groupe in groupes.values():
+        premier = groupe[0]
+        mediane = lambda extraire: statistics.median(extraire(r) for r in groupe)  # noqa: E731
+        synthese.append({
+            "scenario": premier["scenario"],
+            "cache": premier["cache"],
+            "repetitions": len(groupe),
+            "duree": round(mediane(lambda r: r["duree"]), 4),
+            "pages_par_seconde": round(mediane(lambda r: r["pages_par_seconde"] or 0), 2),
+            "blocs_par_seconde": round(mediane(lambda r: r["blocs_par_seconde"] or 0), 2),
+            "latence_p50": round(mediane(lambda r: r["llm"]["latence_p50"]), 4),
+            "latence_p95": round(mediane(lambda r: r["llm"]["latence_p95"]), 4),
+            "appels_llm": premier["llm"]["appels"],
+            "tentatives_llm": premier["llm"]["tentatives"],
+            "tokens_prompt": premier["llm"]["tokens_prompt"],
+            "indicateurs": premier["indicateurs"],
+            "memoire_pic_mib": max((r["memoire_pic_mib"] or 0) for r in groupe) or None,
+        })
+    return synthese
+
+
+def _commit_git():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparer(reference, courant):
+    # Écart de durée médiane par scénario commun aux deux fichiers de résultats
+    anciens = {cle_scenario(ligne): ligne for ligne in reference["synthese"]}
+    lignes = []
+    for ligne in courant["synthese"]:
+        ancienne = anciens.get(cle_scenario(ligne))
+        if ancienne is None or not ancienne["duree"]:
+            continue
+        ecart = (ligne["duree"] - ancienne["duree"]) / ancienne["duree"] * 100
+        scenario = ligne["scenario"]
+        lignes.append(
+            f"{scenario['pages']:>5} p  c={scenario['concurrence']:<2} lot={int(scenario['mode_lot'])} "
+            f"budget={scenario['budget_tokens']:<5} cache={ligne['cache'] or '-':<5} "
+            f"{ancienne['duree']:>8.2f} s -> {ligne['duree']:>8.2f} s  ({ecart:+.1f} %)  "
+            f"appels {ancienne['appels_llm']} -> {ligne['appels_llm']}"
+        )
+    return lignes
+
+
+def construire_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m extracteur.benchmark",
+        description="Banc d'essai hors ligne du pipeline d'extraction (PDF synthétiques, LLM simulé)."
+    )
+    parser.add_argument("--pages", type=int, nargs="+", default=[20, 100])
+    parser.add_argument("--concurrence", type=int, nargs="+", default=[CONCURRENCE_PAR_DEFAUT])
+    parser.add_argument("--budget-tokens", type=int, nargs="+", default=[BUDGET_TOKENS_BLOC])
+    parser.add_argument("--lots", choices=["oui", "non", "les-deux"], default="oui",
+                        help="Regroupement des blocs en lots")
+    parser.add_argument("--mode", choices=[MODE_LLM, MODE_HYBRIDE, MODE_REGLES], default=MODE_LLM)
+    parser.add_argument("--seuil-preselection", type=float, default=SEUIL_PRESELECTION)
+    parser.add_argument("--densite", type=float, default=0.3, help="Part de phrases chiffrées dans les PDF")
+    parser.add_argument("--latence", type=float, default=0.2, help="Latence simulée d'un appel LLM (s)")
+    parser.add_argument("--taux-erreur", type=float, default=0.0, help="Probabilité d'une erreur 429 simulée")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Délai retry-after des erreurs simulées (s)")
+    parser.add_argument("--rpm", type=int, default=0, help="Quota de requêtes par minute simulé (0 : illimité)")
+    parser.add_argument("--tpm", type=int, default=0, help="Quota de tokens par minute simulé (0 : illimité)")
+    parser.add_argument("--cache", action="store_true", help="Mesure aussi une seconde analyse avec cache rempli")
+    parser.add_argument("-r", "--repetitions", type=int, default=3)
+    parser.add_argument("--graine", type=int, default=0)
+    parser.add_argument("-o", "--sortie", default="benchmark.json", help="Fichier JSON des résultats")
+    parser.add_argument("--comparer", default=None, help="Fichier JSON d'un run précédent à comparer")
+    return parser
+
+
+def main(argv=None):
+    args = construire_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    modes_lot = {"oui": [True], "non": [False], "les-deux": [True, False]}[args.lots]
+    scenarios = [
+        {
+            "pages": pages, "concurrence": concurrence, "budget_tokens": budget, "mode_lot": mode_lot,
+            "mode": args.mode, "seuil_preselection": args.seuil_preselection, "densite": args.densite,
+            "latence": args.latence, "taux_erreur": args.taux_erreur, "retry_after": args.retry_after,
+            "rpm": args.rpm, "tpm": args.tpm, "cache": args.cache, "graine": args.graine,
+        }
+        for pages, concurrence, budget, mode_lot in itertools.product(
+            args.pages, args.concurrence, args.budget_tokens, modes_lot
+        )
+    ]
+
+    resultats = []
+    contexte = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as repertoire:
+        chemins = {}
+        for pages in args.pages:
+            chemins[pages] = Path(repertoire) / f"rapport_{pages}p.pdf"
+            chemins[pages].write_bytes(generer_pdf(pages, args.densite, args.graine))
+        for scenario in scenarios:
+            for repetition in range(args.repetitions):
+                # Un processus par exécution : mémoire et caches internes repartent de zéro
+                with ProcessPoolExecutor(max_workers=1, mp_context=contexte) as executor:
+                    mesures = executor.submit(executer_scenario, str(chemins[scenario["pages"]]), scenario).result()
+                for mesure in mesures:
+                    resultats.append({"scenario": scenario, "repetition": repetition, **mesure})
+                    logger.info(
+                        "%d pages, concurrence %d, lot %s%s : %.2f s, %d appels LLM, p95 %.3f s",
+                        scenario["pages"], scenario["concurrence"], scenario["mode_lot"],
+                        f", cache {mesure['cache']}" if mesure["cache"] else "",
+                        mesure["duree"], mesure["llm"]["appels"], mesure["llm"]["latence_p95"]
+                    )
+
+    sortie = {
+        "horodatage": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _commit_git(),
+        "version_pipeline": VERSION_PIPELINE,
+        "machine": {
+            "python": platform.python_version(),
+            "plateforme": platform.platform(),
+            "processeurs": os.cpu_count(),
+        },
+        "synthese": synthetiser(resultats),
+        "resultats": resultats,
+    }
+    Path(args.sortie).write_text(json.dumps(sortie, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"Résultats écrits dans {args.sortie}")
+
+    if args.comparer:
+        reference = json.loads(Path(args.comparer).read_text(encoding="utf-8"))
+        print(f"Comparaison avec {args.comparer} (commit {reference.get('commit')}) :")
+        for ligne in comparer(reference, sortie) or ["Aucun scénario commun"]:
+            print(ligne)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
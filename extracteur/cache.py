@@ -0,0 +1,259 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+REPERTOIRE_CACHE = Path(os.environ.get(
+    "PDF_EXTRACTOR_CACHE_DIR",
+    Path.home() / ".cache" / "pdf-extractor-economique"
+))
+
+
+# Réponse vide du LLM (bloc sans indicateur) : mise en cache comme les autres, sous cette valeur sentinelle,
+# pour que le bloc ne soit pas renvoyé à chaque analyse
+REPONSE_VIDE = "\x00vide"
+
+
+def cle_reponse(bloc, prompt_template, modele, parametres):
+    # Empreinte du contenu : toute modification du bloc, du prompt ou des paramètres change la clé
+    contenu = json.dumps(
+        {"bloc": bloc, "prompt": prompt_template, "modele": modele, "parametres": parametres},
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(contenu.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    def __init__(self, chemin=None, taille_max=200 * 1024 * 1024, ttl=30 * 24 * 3600, horloge=time.time):
+        self.chemin = Path(chemin) if chemin else REPERTOIRE_CACHE / "reponses_llm.sqlite3"
+        self.chemin.parent.mkdir(parents=True, exist_ok=True)
+        self.taille_max = taille_max
+        self.ttl = ttl
+        self._horloge = horloge
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.chemin), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS reponses (
+                cle TEXT PRIMARY KEY,
+                reponse TEXT NOT NULL,
+                taille INTEGER NOT NULL,
+                cree_le REAL NOT NULL,
+                utilise_le REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_reponses_utilise_le ON reponses(utilise_le)")
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, cle):
+        maintenant = self._horloge()
+        with self._lock:
+            ligne = self._conn.execute(
+                "SELECT reponse, cree_le FROM reponses WHERE cle = ?", (cle,)
+            ).fetchone()
+            if ligne is None:
+                self.misses += 1
+                return None
+            reponse, cree_le = ligne
+            if self.ttl and maintenant - cree_le > self.ttl:
+                self._conn.execute("DELETE FROM reponses WHERE cle = ?", (cle,))
+                self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE reponses SET utilise_le = ? WHERE cle = ?", (maintenant, cle))
+            self._conn.commit()
+            self.hits += 1
+            return "" if reponse == REPONSE_VIDE else reponse
+
+    def set(self, cle, reponse):
+        maintenant = self._horloge()
+        reponse = reponse or REPONSE_VIDE
+        taille = len(reponse.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO reponses (cle, reponse, taille, cree_le, utilise_le) VALUES (?, ?, ?, ?, ?)",
+                (cle, reponse, taille, maintenant, maintenant)
+            )
+            self._evincer()
+            self._conn.commit()
+
+    def _evincer(self):
+        # Purge des entrées expirées puis éviction LRU jusqu'à repasser sous la taille maximale
+        if self.ttl:
+            self._conn.execute("DELETE FROM reponses WHERE cree_le < ?", (self._horloge() - self.ttl,))
+        total = self._conn.execute("SELECT COALESCE(SUM(taille), 0) FROM reponses").fetchone()[0]
+        if total <= self.taille_max:
+            return
+        a_liberer = total - self.taille_max
+        cles = []
+        for cle, taille in self._conn.execute("SELECT cle, taille FROM reponses ORDER BY utilise_le ASC"):
+            cles.append((cle,))
+            a_liberer -= taille
+            if a_liberer <= 0:
+                break
+        self._conn.executemany("DELETE FROM reponses WHERE cle = ?", cles)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM reponses")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entrees, taille = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(taille), 0) FROM reponses"
+            ).fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entrees": entrees, "taille": taille}
+
+
+def empreinte_document(pdf_bytes):
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+class DocumentResultCache:
+    def __init__(self, chemin=None, taille_max=100 * 1024 * 1024, max_documents=500, horloge=time.time):
+        self.chemin = Path(chemin) if chemin else REPERTOIRE_CACHE / "documents.sqlite3"
+        self.chemin.parent.mkdir(parents=True, exist_ok=True)
+        self.taille_max = taille_max
+        self.max_documents = max_documents
+        self._horloge = horloge
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.chemin), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                empreinte TEXT NOT NULL,
+                version TEXT NOT NULL,
+                nom TEXT,
+                lignes TEXT NOT NULL,
+                taille INTEGER NOT NULL,
+                cree_le REAL NOT NULL,
+                utilise_le REAL NOT NULL,
+                PRIMARY KEY (empreinte, version)
+            )
+        """)
+        self._conn.commit()
+
+    def get(self, empreinte, version):
+        with self._lock:
+            ligne = self._conn.execute(
+                "SELECT lignes FROM documents WHERE empreinte = ? AND version = ?", (empreinte, version)
+            ).fetchone()
+            if ligne is None:
+                return None
+            self._conn.execute(
+                "UPDATE documents SET utilise_le = ? WHERE empreinte = ? AND version = ?",
+                (self._horloge(), empreinte, version)
+            )
+            self._conn.commit()
+        return json.loads(ligne[0])
+
+    def set(self, empreinte, version, lignes, nom=None):
+        contenu = json.dumps(lignes, ensure_ascii=False)
+        maintenant = self._horloge()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (empreinte, version, nom, lignes, taille, cree_le, utilise_le) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (empreinte, version, nom, contenu, len(contenu.encode("utf-8")), maintenant, maintenant)
+            )
+            self._evincer()
+            self._conn.commit()
+
+    def _evincer(self):
+        total, nombre = self._conn.execute(
+            "SELECT COALESCE(SUM(taille), 0), COUNT(*) FROM documents"
+        ).fetchone()
+        a_supprimer = []
+        for empreinte, version, taille in self._conn.execute(
+            "SELECT empreinte, version, taille FROM documents ORDER BY utilise_le ASC"
+        ):
+            if total <= self.taille_max and nombre <= self.max_documents:
+                break
+            a_supprimer.append((empreinte, version))
+            total -= taille
+            nombre -= 1
+        self._conn.executemany("DELETE FROM documents WHERE empreinte = ? AND version = ?", a_supprimer)
+
+    def invalider(self, empreinte=None):
+        # Sans empreinte, vide tout le cache de documents
+        with self._lock:
+            if empreinte is None:
+                self._conn.execute("DELETE FROM documents")
+            else:
+                self._conn.execute("DELETE FROM documents WHERE empreinte = ?", (empreinte,))
+            self._conn.commit()
+
+
+class RunCheckpointStore:
+    # Lignes de chaque bloc analysé, par document, version du pipeline et index de bloc :
+    # une analyse interrompue (session fermée, quota épuisé, annulation) reprend sans renvoyer ces blocs
+    def __init__(self, chemin=None, ttl=7 * 24 * 3600, horloge=time.time):
+        self.chemin = Path(chemin) if chemin else REPERTOIRE_CACHE / "points_reprise.sqlite3"
+        self.chemin.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self._horloge = horloge
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.chemin), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS blocs (
+                empreinte TEXT NOT NULL,
+                version TEXT NOT NULL,
+                bloc INTEGER NOT NULL,
+                lignes TEXT NOT NULL,
+                cree_le REAL NOT NULL,
+                PRIMARY KEY (empreinte, version, bloc)
+            )
+        """)
+        # Points de reprise abandonnés : purgés à l'ouverture
+        self._conn.execute("DELETE FROM blocs WHERE cree_le < ?", (self._horloge() - self.ttl,))
+        self._conn.commit()
+
+    def charger(self, empreinte, version):
+        with self._lock:
+            lignes = self._conn.execute(
+                "SELECT bloc, lignes FROM blocs WHERE empreinte = ? AND version = ?", (empreinte, version)
+            ).fetchall()
+        return {bloc: json.loads(contenu) for bloc, contenu in lignes}
+
+    def enregistrer(self, empreinte, version, bloc, lignes):
+        contenu = json.dumps(lignes, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO blocs (empreinte, version, bloc, lignes, cree_le) VALUES (?, ?, ?, ?, ?)",
+                (empreinte, version, bloc, contenu, self._horloge())
+            )
+            self._conn.commit()
+
+    def effacer(self, empreinte, version=None):
+        with self._lock:
+            if version is None:
+                self._conn.execute("DELETE FROM blocs WHERE empreinte = ?", (empreinte,))
+            else:
+                self._conn.execute("DELETE FROM blocs WHERE empreinte = ? AND version = ?", (empreinte, version))
+            self._conn.commit()
+
+    def reprise(self, empreinte, version):
+        return RepriseDocument(self, empreinte, version)
+
+
+class RepriseDocument:
+    # Point de reprise d'une analyse : blocs déjà acquis au démarrage, enregistrement des suivants
+    def __init__(self, store, empreinte, version):
+        self.store = store
+        self.empreinte = empreinte
+        self.version = version
+        self.blocs = store.charger(empreinte, version)
+
+    def enregistrer(self, bloc, lignes):
+        self.store.enregistrer(self.empreinte, self.version, bloc, lignes)
+
+    def effacer(self):
+        self.store.effacer(self.empreinte, self.version)
@@ -0,0 +1,280 @@
+import argparse
+import glob
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+from .backends import BACKEND_GROQ, BACKEND_OPENAI, NOMS_BACKENDS
+from .cache import DocumentResultCache, LLMResponseCache, RunCheckpointStore, empreinte_document
+from .decoupage import BUDGET_TOKENS_BLOC, CHEVAUCHEMENT_TOKENS
+from .export import FORMATS_EXPORT, ecrire_tableau, parquet_disponible
+from .historique import IndicatorStore
+from .limitation import planificateur_backend
+from .mesures import MetriquesPrometheus, journaliser_rapport
+from .pdf import compter_pages
+from .pertinence import carte_pertinence, formater_plages, lire_plages, pages_pertinentes
+from .pipeline import COLONNES_RESULTATS, CONCURRENCE_PAR_DEFAUT, PDFEconomicExtractor, reglages_llm, version_pipeline
+from .preselection import SEUIL_PRESELECTION
+from .regles import MODE_HYBRIDE, MODE_LLM, MODE_REGLES
+
+logger = logging.getLogger("extracteur")
+
+
+def lister_pdfs(entrees):
+    # Accepte des répertoires (parcours récursif), des fichiers ou des motifs glob
+    chemins = []
+    for entree in entrees:
+        chemin = Path(entree)
+        if chemin.is_dir():
+            chemins.extend(sorted(chemin.rglob("*.pdf")))
+        elif chemin.is_file():
+            chemins.append(chemin)
+        else:
+            chemins.extend(sorted(Path(p) for p in glob.glob(entree, recursive=True) if p.lower().endswith(".pdf")))
+    # Dédoublonnage en conservant l'ordre
+    return list(dict.fromkeys(chemin.resolve() for chemin in chemins))
+
+
+def _pages_selectionnees(pdf_bytes, options):
+    # --pages : plages explicites ; --top-pages : meilleures pages de la carte de pertinence ; None : tout le PDF
+    if options["pages"]:
+        return lire_plages(options["pages"], compter_pages(pdf_bytes))
+    if options["top_pages"]:
+        return pages_pertinentes(carte_pertinence(pdf_bytes), options["top_pages"])
+    return None
+
+
+def _traiter_fichier(chemin, options, semaphore):
+    # Exécuté dans un processus de la pool : aucun objet Streamlit n'est importé ici
+    depart = time.perf_counter()
+    pdf_bytes = Path(chemin).read_bytes()
+    pages = _pages_selectionnees(pdf_bytes, options)
+    # La sélection de pages fait partie de la clé : un résultat partiel ne sert pas pour le document entier
+    selection = {} if pages is None else {"pages": formater_plages(pages)}
+    version = version_pipeline(
+        mode=options["mode"], budget=options["budget_tokens"], chevauchement=options["chevauchement_tokens"],
+        seuil=options["seuil_preselection"], lot=options["mode_lot"],
+        **reglages_llm(options["backend"], options["modele"]), **selection
+    )
+    empreinte = empreinte_document(pdf_bytes)
+    cache_documents = DocumentResultCache() if options["cache"] else None
+    if cache_documents is not None:
+        lignes = cache_documents.get(empreinte, version)
+        if lignes is not None:
+            df = pd.DataFrame(lignes, columns=COLONNES_RESULTATS)
+            return str(chemin), df, 0, time.perf_counter() - depart, True, None, None
+
+    # Les limites par minute de l'API sont réparties entre les processus
+    # (ni le client simulé ni un serveur local n'ont de quotas, sauf --rpm/--tpm)
+    planificateur = planificateur_backend(
+        options["backend"], options["rpm"], options["tpm"], nb_processus=options["processus"], semaphore=semaphore
+    )
+    # Blocs déjà analysés lors d'une exécution interrompue du même PDF
+    reprise = None
+    if options["cache"] and options["mode"] != MODE_REGLES:
+        reprise = RunCheckpointStore().reprise(empreinte, version)
+    extractor = PDFEconomicExtractor(
+        options["api_key"],
+        planificateur=planificateur,
+        cache=LLMResponseCache() if options["cache"] else None,
+        mode=options["mode"],
+        backend=options["backend"],
+        base_url=options["url_llm"],
+        modele=options["modele"]
+    )
+    df = extractor.analyser_document(
+        pdf_bytes,
+        budget_tokens=options["budget_tokens"],
+        chevauchement_tokens=options["chevauchement_tokens"],
+        seuil_preselection=options["seuil_preselection"],
+        max_workers=options["concurrence"],
+        mode_lot=options["mode_lot"],
+        reprise=reprise,
+        pages=pages
+    )
+    # Résultat incomplet (blocs en échec) : pas de mise en cache, la prochaine exécution reprend
+    if cache_documents is not None and not df.empty and not extractor.nb_blocs_echec:
+        cache_documents.set(empreinte, version, df.to_dict("records"), nom=Path(chemin).name)
+    # Lignes avec leur provenance (bloc, pages) pour l'entrepôt d'indicateurs
+    detail = extractor.resultats_detailles()
+    return (
+        str(chemin), df, extractor.nb_blocs, time.perf_counter() - depart, False, extractor.rapport_execution(), detail
+    )
+
+
+def _details_rapport(rapport):
+    compteurs = rapport["compteurs"]
+    details = []
+    if "pages" in rapport["reglages"]:
+        details.append(f"pages {rapport['reglages']['pages']}")
+    if compteurs.get("tableaux"):
+        details.append(f"{compteurs['tableaux']} tableaux, {compteurs.get('lignes_tableaux', 0)} lignes sans LLM")
+    tokens_repetes = sum(
+        compteurs.get(compteur, 0) for compteur in ("tokens_repetes", "tokens_phrases_repetees", "tokens_quasi_doublons")
+    )
+    if tokens_repetes:
+        details.append(
+            f"~{tokens_repetes} tokens répétés retirés, ≈ {compteurs['appels_evites_repetitions']} appels évités"
+        )
+    if compteurs["blocs_repris"]:
+        nouveaux = compteurs["blocs"] - compteurs["blocs_ignores"] - compteurs["blocs_repris"]
+        details.append(f"{compteurs['blocs_repris']} blocs repris, {nouveaux} nouveaux")
+    if compteurs["blocs_echec"]:
+        details.append(f"{compteurs['blocs_echec']} blocs en échec, relancez pour les reprendre")
+    return f" ({', '.join(details)})" if details else ""
+
+
+def construire_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m extracteur.cli",
+        description="Extraction par lots des indicateurs économiques d'un ensemble de PDF."
+    )
+    parser.add_argument("entrees", nargs="+", help="Répertoires, fichiers PDF ou motifs glob")
+    parser.add_argument("-o", "--sortie", default="resultats", help="Répertoire de sortie (défaut : resultats)")
+    parser.add_argument("-f", "--format", choices=list(FORMATS_EXPORT), default="csv", dest="format_sortie")
+    parser.add_argument("--mode", choices=[MODE_LLM, MODE_HYBRIDE, MODE_REGLES], default=MODE_LLM)
+    parser.add_argument("-p", "--processus", type=int, default=os.cpu_count() or 1,
+                        help="Nombre de PDF traités en parallèle")
+    parser.add_argument("-c", "--concurrence-llm", type=int, default=CONCURRENCE_PAR_DEFAUT,
+                        help="Nombre maximal d'appels LLM simultanés, tous processus confondus")
+    parser.add_argument("--budget-tokens", type=int, default=BUDGET_TOKENS_BLOC)
+    parser.add_argument("--chevauchement-tokens", type=int, default=CHEVAUCHEMENT_TOKENS,
+                        help="Tokens de fin de bloc (phrases entières) repris au début du bloc suivant (défaut : 0)")
+    parser.add_argument("--seuil-preselection", type=float, default=SEUIL_PRESELECTION)
+    selection = parser.add_mutually_exclusive_group()
+    selection.add_argument("--pages", default=None,
+                           help="Pages à analyser, par exemple « 1-20,45 » (défaut : toutes)")
+    selection.add_argument("--top-pages", type=int, default=None,
+                           help="N'analyse que les N pages les plus pertinentes (carte de pertinence, sans LLM)")
+    parser.add_argument("--sans-lots", action="store_true", help="Un appel LLM par bloc")
+    parser.add_argument("--sans-cache", action="store_true", help="Ignore les caches de réponses et de documents")
+    parser.add_argument("--sans-historique", action="store_true",
+                        help="N'ajoute pas les indicateurs à l'entrepôt (python -m extracteur.historique)")
+    parser.add_argument("--metriques", default=None,
+                        help="Fichier de métriques au format texte Prometheus (collecteur textfile)")
+    parser.add_argument("--api-key", default=os.environ.get("GROQ_API_KEY", ""),
+                        help="Clé API Groq (défaut : variable GROQ_API_KEY)")
+    parser.add_argument("--backend", choices=list(NOMS_BACKENDS), default=BACKEND_GROQ,
+                        help="API LLM : Groq, serveur compatible OpenAI ou client simulé")
+    parser.add_argument("--url-llm", default=None, help="URL de base de l'API (serveur compatible OpenAI)")
+    parser.add_argument("--modele", default=None,
+                        help="Modèle demandé à l'API (défaut : modèle Groq ; obligatoire avec --backend openai)")
+    parser.add_argument("--rpm", type=int, default=None,
+                        help="Quota de requêtes par minute de l'API (défaut : 30 pour Groq, illimité sinon ; 0 : illimité)")
+    parser.add_argument("--tpm", type=int, default=None,
+                        help="Quota de tokens par minute de l'API (défaut : 12000 pour Groq, illimité sinon ; 0 : illimité)")
+    return parser
+
+
+def main(argv=None):
+    args = construire_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if args.mode != MODE_REGLES and args.backend == BACKEND_GROQ and not args.api_key:
+        logger.error("Clé API Groq manquante (--api-key ou GROQ_API_KEY), ou utilisez --mode regles")
+        return 2
+
+    if args.mode != MODE_REGLES and args.backend == BACKEND_OPENAI and not args.modele:
+        logger.error("Nom du modèle manquant (--modele) pour le serveur compatible OpenAI")
+        return 2
+
+    if not 0 <= args.chevauchement_tokens < args.budget_tokens:
+        logger.error("--chevauchement-tokens doit être positif et inférieur à --budget-tokens")
+        return 2
+
+    if args.format_sortie == "parquet" and not parquet_disponible():
+        logger.error("L'export Parquet nécessite pyarrow (pip install pyarrow)")
+        return 2
+
+    chemins = lister_pdfs(args.entrees)
+    if not chemins:
+        logger.error("Aucun fichier PDF trouvé")
+        return 1
+
+    sortie = Path(args.sortie)
+    sortie.mkdir(parents=True, exist_ok=True)
+    nb_processus = max(1, min(args.processus, len(chemins)))
+    options = {
+        "api_key": args.api_key,
+        "mode": args.mode,
+        "budget_tokens": args.budget_tokens,
+        "chevauchement_tokens": args.chevauchement_tokens,
+        "seuil_preselection": args.seuil_preselection,
+        "mode_lot": not args.sans_lots,
+        "cache": not args.sans_cache,
+        "backend": args.backend,
+        "url_llm": args.url_llm,
+        "modele": args.modele,
+        "rpm": args.rpm,
+        "tpm": args.tpm,
+        "concurrence": max(1, args.concurrence_llm),
+        "processus": nb_processus,
+        "pages": args.pages,
+        "top_pages": args.top_pages,
+    }
+
+    depart = time.perf_counter()
+    metriques = MetriquesPrometheus()
+    # Entrepôt d'indicateurs alimenté depuis le processus principal uniquement (un seul écrivain)
+    historique = None if args.sans_historique else IndicatorStore()
+    tableaux = {}
+    nb_blocs = 0
+    nb_erreurs = 0
+    contexte = multiprocessing.get_context("spawn")
+    with contexte.Manager() as manager:
+        semaphore = manager.BoundedSemaphore(options["concurrence"])
+        with ProcessPoolExecutor(max_workers=nb_processus, mp_context=contexte) as executor:
+            futures = {executor.submit(_traiter_fichier, chemin, options, semaphore): chemin for chemin in chemins}
+            for future in as_completed(futures):
+                chemin = futures[future]
+                try:
+                    _, df, blocs, duree, depuis_cache, rapport, detail = future.result()
+                except Exception as e:
+                    nb_erreurs += 1
+                    logger.error("%s : échec (%s)", chemin.name, e)
+                    continue
+                nb_blocs += blocs
+                ecrire_tableau(df, sortie / f"{chemin.stem}.{args.format_sortie}", args.format_sortie)
+                tableaux[chemin] = df.assign(Document=chemin.name)
+                if historique is not None and not df.empty:
+                    empreinte = empreinte_document(chemin.read_bytes())
+                    if detail is not None:
+                        historique.ingerer(empreinte, chemin.name, detail)
+                    elif not historique.contient(empreinte):
+                        historique.ingerer(empreinte, chemin.name, df)
+                logger.info("%s : %d indicateurs, %d blocs, %.1f s%s",
+                            chemin.name, len(df), blocs, duree, " (cache)" if depuis_cache else _details_rapport(rapport))
+                if rapport is not None:
+                    # Rapport produit dans le processus de travail, journalisé ici
+                    metriques.ajouter(rapport)
+                    journaliser_rapport(rapport, document=chemin.name)
+
+    if tableaux:
+        # Fichier combiné dans l'ordre des entrées, quel que soit l'ordre de fin des processus
+        combine = pd.concat([tableaux[chemin] for chemin in chemins if chemin in tableaux], ignore_index=True)
+        ecrire_tableau(combine, sortie / f"indicateurs.{args.format_sortie}", args.format_sortie)
+        nb_indicateurs = len(combine)
+    else:
+        nb_indicateurs = 0
+
+    if args.metriques:
+        Path(args.metriques).write_text(metriques.texte(), encoding="utf-8")
+
+    minutes = max(time.perf_counter() - depart, 1e-9) / 60
+    nb_fichiers = len(chemins) - nb_erreurs
+    print(
+        f"{nb_fichiers} fichiers, {nb_blocs} blocs, {nb_indicateurs} indicateurs en {minutes * 60:.1f} s — "
+        f"{nb_fichiers / minutes:.1f} fichiers/min, {nb_blocs / minutes:.1f} blocs/min, "
+        f"{nb_indicateurs / minutes:.1f} indicateurs/min"
+    )
+    return 1 if nb_erreurs else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
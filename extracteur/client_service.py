@@ -0,0 +1,35 @@
+import json
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from .service import STATUT_ECHEC, STATUT_TERMINE
+
+STATUTS_FINAUX = (STATUT_TERMINE, STATUT_ECHEC)
+
+
+class ExtractionServiceClient:
+    # Client HTTP minimal du service d'extraction (bibliothèque standard uniquement)
+    def __init__(self, url, timeout=30):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _appeler(self, chemin, donnees=None, entetes=None):
+        requete = Request(f"{self.url}{chemin}", data=donnees, headers=entetes or {})
+        with urlopen(requete, timeout=self.timeout) as reponse:
+            return json.loads(reponse.read().decode("utf-8"))
+
+    def soumettre(self, pdf_bytes, nom, **options):
+        parametres = {"nom": nom, **{cle: int(v) if isinstance(v, bool) else v for cle, v in options.items()}}
+        reponse = self._appeler(
+            f"/jobs?{urlencode(parametres)}", donnees=pdf_bytes, entetes={"Content-Type": "application/pdf"}
+        )
+        return reponse["id"]
+
+    def statut(self, job_id):
+        return self._appeler(f"/jobs/{job_id}")
+
+    def resultats(self, job_id):
+        return self._appeler(f"/jobs/{job_id}/resultats")
+
+    def sortie(self, job_id):
+        return self._appeler(f"/jobs/{job_id}/sortie")
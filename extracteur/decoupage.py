@@ -0,0 +1,100 @@
+import re
+
+# Budget par bloc : laisse de la marge pour que les lignes extraites tiennent dans max_tokens
+BUDGET_TOKENS_BLOC = 1200
+CHEVAUCHEMENT_TOKENS = 0
+
+_PIECES = re.compile(r"\d+|[^\W\d_]+|[^\w\s]")
+# Fin de phrase : ponctuation suivie d'un espace puis d'une majuscule, d'un chiffre ou d'un guillemet
+_FIN_PHRASE = re.compile(r'(?<=[.!?;:])\s+(?=[«"A-ZÀ-Ý0-9•–-])')
+
+
+def estimer_tokens(texte):
+    # Approximation du tokenizer Llama 3 : ~6 lettres par token, chiffres par groupes de 3
+    total = 0
+    for piece in _PIECES.findall(texte):
+        if piece[0].isdigit():
+            total += (len(piece) + 2) // 3
+        elif piece[0].isalpha():
+            total += 1 + len(piece) // 6
+        else:
+            total += 1
+    return total
+
+
+def iter_phrases(pages):
+    # Les phrases coupées en fin de page sont complétées avec le début de la page suivante
+    reste = ""
+    for page in pages:
+        texte = f"{reste} {page}".strip() if reste else page.strip()
+        if not texte:
+            continue
+        phrases = _FIN_PHRASE.split(texte)
+        reste = phrases.pop()
+        yield from phrases
+    if reste:
+        yield reste
+
+
+def _decouper_phrase(phrase, budget_tokens):
+    # Phrase plus longue que le budget : découpage sur les mots
+    courant = []
+    tokens = 0
+    for mot in phrase.split(" "):
+        tokens_mot = estimer_tokens(mot)
+        if courant and tokens + tokens_mot > budget_tokens:
+            yield " ".join(courant)
+            courant = []
+            tokens = 0
+        courant.append(mot)
+        tokens += tokens_mot
+    if courant:
+        yield " ".join(courant)
+
+
+def iter_blocs_tokens(phrases, budget_tokens=BUDGET_TOKENS_BLOC, chevauchement_tokens=CHEVAUCHEMENT_TOKENS):
+    courant = []  # (phrase, tokens)
+    tokens = 0
+    nouveau = False  # le bloc courant contient au moins une phrase non reprise du bloc précédent
+    for phrase in phrases:
+        for segment in (_decouper_phrase(phrase, budget_tokens)
+                        if estimer_tokens(phrase) > budget_tokens else (phrase,)):
+            tokens_segment = estimer_tokens(segment)
+            if courant and tokens + tokens_segment > budget_tokens:
+                yield " ".join(texte for texte, _ in courant)
+                # Reprise des dernières phrases du bloc dans le suivant
+                repris = []
+                tokens = 0
+                for texte, nb in reversed(courant):
+                    if tokens + nb > chevauchement_tokens or tokens + nb + tokens_segment > budget_tokens:
+                        break
+                    repris.insert(0, (texte, nb))
+                    tokens += nb
+                courant = repris
+                nouveau = False
+            courant.append((segment, tokens_segment))
+            tokens += tokens_segment
+            nouveau = True
+    if courant and nouveau:
+        yield " ".join(texte for texte, _ in courant)
+
+
+def dedupliquer_chevauchement(resultats_par_bloc):
+    # Un indicateur présent dans la zone de chevauchement est extrait par deux blocs voisins,
+    # avec la même phrase source
+    donnees = []
+    cles_precedentes = set()
+    for lignes in resultats_par_bloc:
+        cles = set()
+        for ligne in lignes:
+            cle = (
+                ligne["Secteur/Indicateur"].lower(),
+                ligne["Valeur"],
+                ligne["Période"],
+                " ".join(ligne["Phrase"].lower().split()),
+            )
+            cles.add(cle)
+            if cle not in cles_precedentes:
+                donnees.append(ligne)
+        cles_precedentes = cles
+    return donnees
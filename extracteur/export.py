@@ -0,0 +1,56 @@
+import importlib.util
+import tempfile
+
+from openpyxl import Workbook
+
+# Format -> (extension, type MIME)
+FORMATS_EXPORT = {
+    "csv": ("csv", "text/csv"),
+    "xlsx": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+LIGNES_PAR_LOT = 10000
+# Au-delà, le fichier exporté est écrit sur disque plutôt qu'en mémoire
+TAILLE_MAX_MEMOIRE = 16 * 1024 * 1024
+
+
+def parquet_disponible():
+    return any(importlib.util.find_spec(moteur) for moteur in ("pyarrow", "fastparquet"))
+
+
+def ecrire_csv(df, destination):
+    df.to_csv(destination, index=False, sep=';', encoding='utf-8', chunksize=LIGNES_PAR_LOT)
+
+
+def ecrire_excel(df, destination):
+    # Classeur en écriture seule : les lignes sont écrites au fil de l'eau, sans garder les cellules en mémoire
+    classeur = Workbook(write_only=True)
+    feuille = classeur.create_sheet("Sheet1")
+    feuille.append([str(colonne) for colonne in df.columns])
+    for debut in range(0, len(df), LIGNES_PAR_LOT):
+        for ligne in df.iloc[debut:debut + LIGNES_PAR_LOT].itertuples(index=False, name=None):
+            feuille.append(list(ligne))
+    classeur.save(destination)
+
+
+def ecrire_parquet(df, destination):
+    if not parquet_disponible():
+        raise ImportError("L'export Parquet nécessite pyarrow (pip install pyarrow)")
+    df.to_parquet(destination, index=False)
+
+
+_ECRIVAINS = {"csv": ecrire_csv, "xlsx": ecrire_excel, "parquet": ecrire_parquet}
+
+
+def ecrire_tableau(df, destination, format_export):
+    # destination : chemin ou fichier binaire ouvert
+    _ECRIVAINS[format_export](df, destination)
+
+
+def exporter(df, format_export):
+    # Fichier temporaire en mémoire jusqu'à TAILLE_MAX_MEMOIRE, puis sur disque ; rembobiné pour lecture
+    fichier = tempfile.SpooledTemporaryFile(max_size=TAILLE_MAX_MEMOIRE)
+    ecrire_tableau(df, fichier, format_export)
+    fichier.seek(0)
+    return fichier
@@ -0,0 +1,74 @@
+import hashlib
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+from .decoupage import estimer_tokens
+from .regles import extraire_indicateurs, formater_reponse
+
+_BLOC_TAGUE = re.compile(r'^\[B(\d+)\]\n(.*?)(?=\n\n\[B\d+\]\n|\n\nRépondez UNIQUEMENT)', re.M | re.S)
+_TEXTE_SIMPLE = re.compile(r'Texte à analyser:\n(.*?)\n\nRépondez UNIQUEMENT', re.S)
+
+
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after=1.0):
+        super().__init__("Rate limit reached (fake)")
+        self.response = SimpleNamespace(headers={"retry-after": str(retry_after)})
+
+
+class FakeGroqClient:
+    # Client déterministe imitant client.chat.completions.create de Groq :
+    # la réponse est produite par le moteur de règles, avec latence et erreurs 429 simulées
+    def __init__(self, latence=0.0, taux_erreur=0.0, graine=0, retry_after=1.0):
+        self.latence = latence
+        self.taux_erreur = taux_erreur
+        self.graine = graine
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self._tentatives = {}
+        self.nb_appels = 0
+        self.nb_erreurs = 0
+        self.chat = SimpleNamespace(completions=self)
+        self.models = SimpleNamespace(list=lambda: SimpleNamespace(data=[SimpleNamespace(id="faux")]))
+
+    def _echoue(self, prompt):
+        # Tirage fonction du prompt et du numéro de tentative : mêmes erreurs quel que soit l'ordre des threads
+        cle = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        with self._lock:
+            tentative = self._tentatives.get(cle, 0)
+            self._tentatives[cle] = tentative + 1
+        return random.Random(f"{self.graine}:{cle}:{tentative}").random() < self.taux_erreur
+
+    def create(self, model, messages, **parametres):
+        prompt = messages[-1]["content"]
+        with self._lock:
+            self.nb_appels += 1
+        if self.latence:
+            time.sleep(self.latence)
+        if self.taux_erreur and self._echoue(prompt):
+            with self._lock:
+                self.nb_erreurs += 1
+            raise FakeRateLimitError(self.retry_after)
+
+        blocs = _BLOC_TAGUE.findall(prompt)
+        if blocs:
+            lignes = []
+            for index, texte in blocs:
+                reponse = formater_reponse(extraire_indicateurs(texte)[0])
+                lignes.extend(f"[B{index}] {ligne}" for ligne in reponse.splitlines())
+            contenu = "\n".join(lignes)
+        else:
+            match = _TEXTE_SIMPLE.search(prompt)
+            contenu = formater_reponse(extraire_indicateurs(match.group(1) if match else prompt)[0])
+
+        usage = SimpleNamespace(
+            prompt_tokens=estimer_tokens(prompt),
+            completion_tokens=estimer_tokens(contenu),
+            total_tokens=estimer_tokens(prompt) + estimer_tokens(contenu)
+        )
+        choix = SimpleNamespace(message=SimpleNamespace(content=contenu), finish_reason="stop")
+        return SimpleNamespace(choices=[choix], usage=usage, model=model)
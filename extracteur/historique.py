@@ -0,0 +1,301 @@
+import argparse
+import re
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .cache import REPERTOIRE_CACHE
+from .pipeline import COLONNES_RESULTATS
+from .recherche import normaliser_texte, valeur_numerique
+
+# Valeur d'une série quand plusieurs documents donnent des chiffres différents pour la même période
+AGREGATIONS = {
+    "dernier": "MAX(valeur_recente)",  # chiffre du document ingéré le plus récemment (révisions)
+    "moyenne": "AVG(valeur_num)",
+    "min": "MIN(valeur_num)",
+    "max": "MAX(valeur_num)",
+}
+
+_MOIS = {
+    "janvier": 1, "fevrier": 2, "mars": 3, "avril": 4, "mai": 5, "juin": 6, "juillet": 7,
+    "aout": 8, "septembre": 9, "octobre": 10, "novembre": 11, "decembre": 12,
+}
+_RANGS = {"premier": 1, "1er": 1, "deuxieme": 2, "second": 2, "2e": 2, "2eme": 2, "troisieme": 3, "3e": 3,
+          "3eme": 3, "quatrieme": 4, "4e": 4, "4eme": 4}
+_ANNEE = re.compile(r"\b((?:19|20)\d{2})\b")
+_MOIS_TEXTE = re.compile(r"\b(" + "|".join(_MOIS) + r")\b")
+_TRIMESTRE = re.compile(r"\b[tq]([1-4])\b|\b(" + "|".join(_RANGS) + r") trimestre\b")
+_SEMESTRE = re.compile(r"\bs([12])\b|\b(premier|1er|deuxieme|second|2e|2eme) semestre\b")
+
+
+def normaliser_periode(periode):
+    # « T1 2023 », « premier trimestre 2023 », « Q1 2023 » -> ("2023-T1", 2023.0) ; « fin mars 2024 » ->
+    # ("2024-03", 2024.1667) ; sans année : texte normalisé et pas d'ordre chronologique
+    texte = " ".join(periode.split())
+    annees = _ANNEE.findall(texte)
+    if not annees:
+        return texte, None
+    annee = int(annees[-1])
+    mois = _MOIS_TEXTE.search(texte)
+    if mois:
+        numero = _MOIS[mois.group(1)]
+        return f"{annee}-{numero:02d}", round(annee + (numero - 1) / 12, 4)
+    trimestre = _TRIMESTRE.search(texte)
+    if trimestre:
+        numero = int(trimestre.group(1)) if trimestre.group(1) else _RANGS[trimestre.group(2)]
+        return f"{annee}-T{numero}", annee + (numero - 1) / 4
+    semestre = _SEMESTRE.search(texte)
+    if semestre:
+        numero = int(semestre.group(1)) if semestre.group(1) else _RANGS[semestre.group(2)]
+        return f"{annee}-S{numero}", annee + (numero - 1) / 2
+    return str(annee), float(annee)
+
+
+def _normaliser_indicateurs(indicateurs):
+    return normaliser_texte(indicateurs).str.replace(r"\s+", " ", regex=True).str.strip(" .:;-")
+
+
+class IndicatorStore:
+    # Entrepôt local des indicateurs de tous les documents analysés : une observation par
+    # (indicateur, période, valeur) normalisés, citée par une ou plusieurs sources (document, page, bloc)
+    def __init__(self, chemin=None):
+        self.chemin = Path(chemin) if chemin else REPERTOIRE_CACHE / "indicateurs.sqlite3"
+        self.chemin.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.chemin), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                empreinte TEXT NOT NULL UNIQUE,
+                nom TEXT,
+                ingere_le REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS observations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                indicateur_norm TEXT NOT NULL,
+                periode_norm TEXT NOT NULL,
+                valeur_cle TEXT NOT NULL,
+                indicateur TEXT NOT NULL,
+                periode TEXT NOT NULL,
+                valeur TEXT NOT NULL,
+                valeur_num REAL,
+                ordre REAL,
+                UNIQUE (indicateur_norm, periode_norm, valeur_cle)
+            );
+            CREATE INDEX IF NOT EXISTS observations_ordre ON observations (ordre);
+            CREATE TABLE IF NOT EXISTS sources (
+                observation_id INTEGER NOT NULL REFERENCES observations (id),
+                document_id INTEGER NOT NULL REFERENCES documents (id),
+                page INTEGER,
+                page_fin INTEGER,
+                bloc INTEGER,
+                phrase TEXT,
+                PRIMARY KEY (observation_id, document_id)
+            );
+            CREATE INDEX IF NOT EXISTS sources_document ON sources (document_id);
+        """)
+        self._conn.commit()
+
+    def contient(self, empreinte):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM documents WHERE empreinte = ?", (empreinte,)
+            ).fetchone() is not None
+
+    def ingerer(self, empreinte, nom, df):
+        # df : colonnes de COLONNES_RESULTATS, plus Bloc, Page et Page fin si connues
+        # (PDFEconomicExtractor.resultats_detailles). Une nouvelle ingestion du même document remplace la précédente
+        df = df.reset_index(drop=True)
+        indicateurs = _normaliser_indicateurs(df["Secteur/Indicateur"].fillna(""))
+        periodes = normaliser_texte(df["Période"].fillna(""))
+        normalisees = {periode: normaliser_periode(periode) for periode in periodes.unique()}
+        valeurs = valeur_numerique(df["Valeur"])
+        valeurs_cles = np.where(
+            np.isnan(valeurs), normaliser_texte(df["Valeur"].fillna("")).str.replace(" ", ""),
+            [f"{valeur:g}" for valeur in np.nan_to_num(valeurs)]
+        )
+        provenance = {
+            colonne: df[colonne].astype(object).where(df[colonne].notna(), None) if colonne in df else [None] * len(df)
+            for colonne in ("Page", "Page fin", "Bloc")
+        }
+        observations = []
+        sources = []
+        for i in range(len(df)):
+            if not indicateurs[i]:
+                continue
+            periode_norm, ordre = normalisees[periodes[i]]
+            cle = (indicateurs[i], periode_norm, str(valeurs_cles[i]))
+            observations.append(cle + (
+                df.at[i, "Secteur/Indicateur"], df.at[i, "Période"], df.at[i, "Valeur"],
+                None if np.isnan(valeurs[i]) else float(valeurs[i]), ordre
+            ))
+            sources.append((
+                _entier(provenance["Page"][i]), _entier(provenance["Page fin"][i]), _entier(provenance["Bloc"][i]),
+                df.at[i, "Phrase"]
+            ) + cle)
+
+        with self._lock, self._conn:
+            ancien = self._conn.execute("SELECT id FROM documents WHERE empreinte = ?", (empreinte,)).fetchone()
+            if ancien is not None:
+                self._conn.execute("DELETE FROM sources WHERE document_id = ?", ancien)
+                self._conn.execute("DELETE FROM documents WHERE id = ?", ancien)
+            document_id = self._conn.execute(
+                "INSERT INTO documents (empreinte, nom, ingere_le) VALUES (?, ?, ?)", (empreinte, nom, time.time())
+            ).lastrowid
+            avant = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO observations (indicateur_norm, periode_norm, valeur_cle, indicateur, periode, "
+                "valeur, valeur_num, ordre) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                observations
+            )
+            nouvelles = self._conn.total_changes - avant
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO sources (observation_id, document_id, page, page_fin, bloc, phrase) "
+                f"SELECT id, {document_id}, ?, ?, ?, ? FROM observations "
+                "WHERE indicateur_norm = ? AND periode_norm = ? AND valeur_cle = ?",
+                sources
+            )
+            if ancien is not None:
+                self._conn.execute(
+                    "DELETE FROM observations WHERE id NOT IN (SELECT observation_id FROM sources)"
+                )
+        return nouvelles
+
+    def _filtres(self, indicateur=None, motif=None, depuis=None, jusqua=None, derniers_documents=None):
+        conditions = []
+        parametres = []
+        if indicateur:
+            conditions.append("o.indicateur_norm = ?")
+            parametres.append(_normaliser_indicateurs(pd.Series([indicateur])).iloc[0])
+        if motif:
+            conditions.append("o.indicateur_norm LIKE ?")
+            parametres.append(f"%{_normaliser_indicateurs(pd.Series([motif])).iloc[0]}%")
+        if depuis is not None:
+            conditions.append("o.ordre >= ?")
+            parametres.append(depuis)
+        if jusqua is not None:
+            conditions.append("o.ordre < ?")
+            parametres.append(jusqua + 1)
+        if derniers_documents:
+            # Derniers documents ingérés (ordre d'analyse), et non les bulletins les plus récents
+            conditions.append("s.document_id IN (SELECT id FROM documents ORDER BY id DESC LIMIT ?)")
+            parametres.append(derniers_documents)
+        return (" WHERE " + " AND ".join(conditions)) if conditions else "", parametres
+
+    def observations(self, **filtres):
+        # Une ligne par observation : nombre de documents qui la citent, dernier document, première source
+        where, parametres = self._filtres(**filtres)
+        requete = f"""
+            SELECT o.indicateur AS "Secteur/Indicateur", o.valeur AS "Valeur", o.periode AS "Période",
+                   MIN(s.phrase) AS "Phrase", o.indicateur_norm, o.periode_norm, o.valeur_num, o.ordre,
+                   COUNT(*) AS sources, MAX(s.document_id) AS dernier_document,
+                   GROUP_CONCAT(d.nom, ', ') AS documents
+            FROM observations o
+            JOIN sources s ON s.observation_id = o.id
+            JOIN documents d ON d.id = s.document_id
+            {where}
+            GROUP BY o.id
+            ORDER BY o.indicateur_norm, o.ordre
+        """
+        with self._lock:
+            return pd.read_sql_query(requete, self._conn, params=parametres)
+
+    def tableau(self, **filtres):
+        # Même forme que le tableau d'une analyse : create_metrics_section et create_charts l'affichent tel quel
+        return self.observations(**filtres)[COLONNES_RESULTATS]
+
+    def serie(self, agregation="dernier", **filtres):
+        # Série chronologique par indicateur : une valeur par période datée, dans l'ordre chronologique
+        if agregation not in AGREGATIONS:
+            raise ValueError(f"Agrégation inconnue : {agregation}")
+        where, parametres = self._filtres(**filtres)
+        condition = "o.ordre IS NOT NULL AND o.valeur_num IS NOT NULL"
+        where = f"{where} AND {condition}" if where else f" WHERE {condition}"
+        # « dernier » : valeur_recente est la valeur de l'observation citée par le document le plus récent
+        # (à égalité, la dernière insérée), identique sur toutes les lignes du groupe
+        requete = f"""
+            WITH obs AS (
+                SELECT o.id, o.indicateur_norm, o.indicateur, o.periode_norm, o.ordre, o.valeur_num,
+                       COUNT(*) AS sources, MAX(s.document_id) AS dernier_document,
+                       FIRST_VALUE(o.valeur_num) OVER (
+                           PARTITION BY o.indicateur_norm, o.periode_norm
+                           ORDER BY MAX(s.document_id) DESC, o.id DESC
+                       ) AS valeur_recente
+                FROM observations o JOIN sources s ON s.observation_id = o.id
+                {where}
+                GROUP BY o.id
+            )
+            SELECT MIN(indicateur) AS "Indicateur", periode_norm AS "Période", ordre,
+                   {AGREGATIONS[agregation]} AS "Valeur", SUM(sources) AS "Sources",
+                   COUNT(*) AS "Valeurs distinctes", MAX(dernier_document) AS dernier_document
+            FROM obs
+            GROUP BY indicateur_norm, periode_norm
+            ORDER BY indicateur_norm, ordre
+        """
+        with self._lock:
+            return pd.read_sql_query(requete, self._conn, params=parametres)
+
+    def indicateurs(self, derniers_documents=None):
+        # Indicateurs connus, du plus cité au moins cité
+        where, parametres = self._filtres(derniers_documents=derniers_documents)
+        requete = f"""
+            SELECT MIN(o.indicateur) AS "Indicateur", o.indicateur_norm, COUNT(DISTINCT o.id) AS observations,
+                   COUNT(DISTINCT s.document_id) AS documents
+            FROM observations o JOIN sources s ON s.observation_id = o.id
+            {where}
+            GROUP BY o.indicateur_norm
+            ORDER BY documents DESC, observations DESC
+        """
+        with self._lock:
+            return pd.read_sql_query(requete, self._conn, params=parametres)
+
+    def documents(self):
+        with self._lock:
+            return pd.read_sql_query(
+                "SELECT d.id, d.nom, d.empreinte, d.ingere_le, COUNT(s.observation_id) AS indicateurs "
+                "FROM documents d LEFT JOIN sources s ON s.document_id = d.id GROUP BY d.id ORDER BY d.id",
+                self._conn
+            )
+
+
+def _entier(valeur):
+    return None if valeur is None else int(valeur)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m extracteur.historique",
+        description="Séries chronologiques d'un indicateur sur l'ensemble des documents déjà analysés."
+    )
+    parser.add_argument("motif", nargs="?", default=None, help="Partie du nom de l'indicateur (ex. inflation)")
+    parser.add_argument("--indicateur", default=None, help="Nom exact de l'indicateur")
+    parser.add_argument("--derniers", type=int, default=None, help="Limiter aux N derniers documents ingérés")
+    parser.add_argument("--depuis", type=int, default=None, help="Première année")
+    parser.add_argument("--jusqua", type=int, default=None, help="Dernière année")
+    parser.add_argument("--agregation", choices=list(AGREGATIONS), default="dernier")
+    parser.add_argument("--base", default=None, help="Fichier SQLite de l'entrepôt")
+    parser.add_argument("-o", "--sortie", default=None, help="Fichier CSV de la série")
+    args = parser.parse_args(argv)
+
+    store = IndicatorStore(args.base)
+    if args.motif is None and args.indicateur is None:
+        print(store.indicateurs(derniers_documents=args.derniers).drop(columns="indicateur_norm").to_string(index=False))
+        return 0
+    serie = store.serie(
+        args.agregation, indicateur=args.indicateur, motif=args.motif, depuis=args.depuis, jusqua=args.jusqua,
+        derniers_documents=args.derniers
+    ).drop(columns=["ordre", "dernier_document"])
+    if args.sortie:
+        serie.to_csv(args.sortie, index=False, sep=';', encoding='utf-8')
+    print(serie.to_string(index=False) if not serie.empty else "Aucune observation")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,32 @@
+# Listes de mots-clés partagées par l'analyse des réponses, le filtrage qualité et la présélection
+
+MOTS_CLES_VALIDES = [
+    'pib', 'inflation', 'croissance', 'taux', 'export', 'import', 
+    'indice', 'bourse', 'change', 'monétaire', 'budgétaire', 
+    'déficit', 'excédent', 'investissement', 'consommation',
+    'agriculture', 'industrie', 'service', 'manufacture', 'construction'
+]
+
+INDICATEURS_PRIORITAIRES = [
+    'pib', 'croissance', 'inflation', 'taux directeur', 'export', 'import',
+    'indice', 'change', 'bourse', 'déficit', 'masse monétaire'
+]
+
+MOTS_EXCLUS_INDICATEUR = ['secteur', 'indicateur', 'terme', 'valeur']
+
+EXCLUSIONS = ['téléphone', 'adresse', 'email', 'contact', 'page', 'référence']
+
+MOTS_PERIODE = ['trimestre', 'annuel', 'mensuel', '2024', '2025']
+
+# Titres de sections (signets / table des matières) : partie macroéconomique d'un rapport, ou hors sujet
+SECTIONS_MACRO = [
+    'conjoncture', 'économi', 'macro', 'croissance', 'inflation', 'prix', 'monétaire', 'finances publiques',
+    'budg', 'comptes extérieurs', 'balance des paiements', 'échanges extérieurs', 'marché du travail', 'emploi',
+    'pib', 'perspectives', 'prévisions', 'activité', 'financement', 'crédit', 'change'
+]
+
+SECTIONS_HORS_SUJET = [
+    'sommaire', 'table des matières', 'gouvernance', 'organisation', 'ressources humaines', 'états financiers',
+    'glossaire', 'abréviations', 'liste des', 'mot du', 'responsabilité sociale', 'rapport de gestion',
+    'audit', 'commissaire', 'remerciements'
+]
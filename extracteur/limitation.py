@@ -0,0 +1,229 @@
+import logging
+import random
+import re
+import threading
+import time
+from collections import deque
+
+from .backends import BACKEND_GROQ
+
+logger = logging.getLogger(__name__)
+
+# Limites publiques Groq pour llama-3.3-70b-versatile (offre gratuite)
+REQUETES_PAR_MINUTE = 30
+TOKENS_PAR_MINUTE = 12000
+# Serveur local compatible OpenAI et client simulé : pas de quota par défaut
+QUOTAS_ILLIMITES = (10**6, 10**9)
+
+_DUREE_GROQ = re.compile(r'(?:(\d+(?:\.\d+)?)h)?(?:(\d+(?:\.\d+)?)m(?!s))?(?:(\d+(?:\.\d+)?)s)?(?:(\d+(?:\.\d+)?)ms)?')
+
+
+def parse_duree(valeur):
+    # Accepte "12", "7.66s", "2m59.56s", "120ms" (format des en-têtes Groq)
+    if valeur is None:
+        return None
+    valeur = str(valeur).strip()
+    if not valeur:
+        return None
+    try:
+        return float(valeur)
+    except ValueError:
+        pass
+    match = _DUREE_GROQ.fullmatch(valeur)
+    if not match or not any(match.groups()):
+        return None
+    heures, minutes, secondes, millis = (float(g) if g else 0.0 for g in match.groups())
+    return heures * 3600 + minutes * 60 + secondes + millis / 1000
+
+
+def est_limite_de_taux(erreur):
+    if getattr(erreur, 'status_code', None) == 429:
+        return True
+    return "rate limit" in str(erreur).lower()
+
+
+# Erreurs de transport des SDK (groq, openai) et de httpx : le serveur n'a pas répondu ou a expiré
+_ERREURS_CONNEXION = {"APIConnectionError", "APITimeoutError", "TransportError", "TimeoutException"}
+
+
+def est_erreur_transitoire(erreur):
+    # Erreur serveur (5xx), expiration ou connexion perdue : la même requête peut aboutir plus tard.
+    # Le SDK Groq ne refait plus ses tentatives (max_retries=0), c'est donc au planificateur de le faire
+    statut = getattr(erreur, 'status_code', None)
+    if isinstance(statut, int) and statut >= 500:
+        return True
+    if isinstance(erreur, (ConnectionError, TimeoutError)):
+        return True
+    return any(classe.__name__ in _ERREURS_CONNEXION for classe in type(erreur).__mro__)
+
+
+def _entetes(erreur):
+    reponse = getattr(erreur, 'response', None)
+    return getattr(reponse, 'headers', None) or {}
+
+
+def delai_retry_after(entetes):
+    if not entetes:
+        return None
+    millis = entetes.get('retry-after-ms')
+    if millis is not None:
+        try:
+            return float(millis) / 1000
+        except ValueError:
+            pass
+    return parse_duree(entetes.get('retry-after'))
+
+
+def quotas_backend(backend, requetes_par_minute=None, tokens_par_minute=None):
+    # Quotas par minute de l'API : None garde la valeur par défaut du backend, 0 signifie illimité
+    defaut = (REQUETES_PAR_MINUTE, TOKENS_PAR_MINUTE) if backend == BACKEND_GROQ else QUOTAS_ILLIMITES
+    requetes = defaut[0] if requetes_par_minute is None else requetes_par_minute or QUOTAS_ILLIMITES[0]
+    tokens = defaut[1] if tokens_par_minute is None else tokens_par_minute or QUOTAS_ILLIMITES[1]
+    return requetes, tokens
+
+
+def planificateur_backend(backend, requetes_par_minute=None, tokens_par_minute=None, nb_processus=1,
+                          semaphore=None):
+    # Même choix de quotas pour l'interface, la CLI et le service ; répartis entre les processus de la CLI
+    requetes, tokens = quotas_backend(backend, requetes_par_minute, tokens_par_minute)
+    return RateLimitScheduler(
+        requetes_par_minute=max(1, requetes // nb_processus),
+        tokens_par_minute=max(1, tokens // nb_processus),
+        semaphore=semaphore
+    )
+
+
+class RateLimitScheduler:
+    def __init__(self, requetes_par_minute=REQUETES_PAR_MINUTE, tokens_par_minute=TOKENS_PAR_MINUTE,
+                 max_tentatives=8, delai_base=1.0, delai_max=60.0,
+                 horloge=time.monotonic, sommeil=time.sleep, aleatoire=random.random, semaphore=None):
+        self.requetes_par_minute = requetes_par_minute
+        self.tokens_par_minute = tokens_par_minute
+        self.max_tentatives = max_tentatives
+        self.delai_base = delai_base
+        self.delai_max = delai_max
+        self._horloge = horloge
+        self._sommeil = sommeil
+        self._aleatoire = aleatoire
+        # Sémaphore optionnel partagé entre processus : limite globale d'appels simultanés
+        self._semaphore = semaphore
+        self._lock = threading.Lock()
+        self._fenetre = deque()  # (horodatage, tokens) des requêtes de la dernière minute
+        self._pause_jusqua = 0.0
+        self.nb_requetes = 0
+        self.nb_limitations = 0
+        self.nb_erreurs_transitoires = 0
+        self.temps_attente = 0.0
+
+    def _purger(self, maintenant):
+        while self._fenetre and self._fenetre[0][0] + 60 <= maintenant:
+            self._fenetre.popleft()
+
+    def _delai_avant_envoi(self, tokens_estimes, maintenant):
+        self._purger(maintenant)
+        delai = max(0.0, self._pause_jusqua - maintenant)
+        if len(self._fenetre) >= self.requetes_par_minute:
+            delai = max(delai, self._fenetre[0][0] + 60 - maintenant)
+        tokens_utilises = sum(tokens for _, tokens in self._fenetre)
+        if self._fenetre and tokens_utilises + tokens_estimes > self.tokens_par_minute:
+            # Attendre que suffisamment de requêtes sortent de la fenêtre
+            a_liberer = tokens_utilises + tokens_estimes - self.tokens_par_minute
+            for horodatage, tokens in self._fenetre:
+                a_liberer -= tokens
+                if a_liberer <= 0:
+                    delai = max(delai, horodatage + 60 - maintenant)
+                    break
+        return delai
+
+    def _reserver(self, tokens_estimes):
+        # Réserve une place dans la fenêtre, en attendant si nécessaire
+        if tokens_estimes > self.tokens_par_minute:
+            # Plus que le quota d'une minute : la requête attend une fenêtre vide, puis l'occupe entièrement
+            logger.warning(
+                "Requête estimée à %d tokens, au-delà du quota de %d tokens par minute",
+                tokens_estimes, self.tokens_par_minute
+            )
+            tokens_estimes = self.tokens_par_minute
+        while True:
+            with self._lock:
+                maintenant = self._horloge()
+                delai = self._delai_avant_envoi(tokens_estimes, maintenant)
+                if delai <= 0:
+                    entree = [maintenant, tokens_estimes]
+                    self._fenetre.append(entree)
+                    self.nb_requetes += 1
+                    return entree
+                # Plancher pour garantir la progression malgré les arrondis flottants
+                delai = max(delai, 0.01)
+                self.temps_attente += delai
+            self._sommeil(delai)
+
+    def _backoff(self, tentative):
+        plafond = min(self.delai_max, self.delai_base * (2 ** tentative))
+        return plafond * (0.5 + self._aleatoire() / 2)
+
+    def mettre_a_jour(self, entetes):
+        # Ajuste le planning à partir des en-têtes x-ratelimit-* renvoyés par l'API
+        if not entetes:
+            return
+        pause = 0.0
+        for ressource in ('requests', 'tokens'):
+            restant = entetes.get(f'x-ratelimit-remaining-{ressource}')
+            reset = parse_duree(entetes.get(f'x-ratelimit-reset-{ressource}'))
+            try:
+                epuise = restant is not None and int(float(restant)) <= 0
+            except ValueError:
+                epuise = False
+            if epuise and reset:
+                pause = max(pause, reset)
+        if pause:
+            self.suspendre(pause)
+
+    def suspendre(self, duree):
+        with self._lock:
+            self._pause_jusqua = max(self._pause_jusqua, self._horloge() + duree)
+
+    def executer(self, appel, tokens_estimes=0):
+        tentative = 0
+        while True:
+            entree = self._reserver(tokens_estimes)
+            try:
+                if self._semaphore is None:
+                    resultat = appel()
+                else:
+                    with self._semaphore:
+                        resultat = appel()
+            except Exception as e:
+                limite = est_limite_de_taux(e)
+                if not (limite or est_erreur_transitoire(e)) or tentative >= self.max_tentatives:
+                    raise
+                with self._lock:
+                    entree[1] = 0
+                if not limite:
+                    # Erreur serveur ou réseau : même attente exponentielle avec gigue, pour ce seul appel
+                    delai = self._backoff(tentative)
+                    with self._lock:
+                        self.nb_erreurs_transitoires += 1
+                        self.temps_attente += delai
+                    logger.warning("Erreur transitoire de l'API (%s), nouvelle tentative dans %.1f s", e, delai)
+                    self._sommeil(delai)
+                    tentative += 1
+                    continue
+                entetes = _entetes(e)
+                self.mettre_a_jour(entetes)
+                retry_after = delai_retry_after(entetes)
+                delai = self._backoff(tentative)
+                if retry_after is not None:
+                    delai = retry_after + self._aleatoire() * self.delai_base
+                with self._lock:
+                    self.nb_limitations += 1
+                self.suspendre(delai)
+                tentative += 1
+                continue
+
+            usage = getattr(resultat, 'usage', None)
+            tokens_reels = getattr(usage, 'total_tokens', None)
+            if tokens_reels is not None:
+                with self._lock:
+                    entree[1] = tokens_reels
+            return resultat
@@ -0,0 +1,82 @@
+import re
+
+from .decoupage import estimer_tokens
+
+PARAMETRES_GENERATION_LOT = {"temperature": 0.05, "max_tokens": 4096}
+# Budget de texte par requête groupée et volume de sortie attendu par bloc
+BUDGET_TOKENS_LOT = 6000
+TOKENS_SORTIE_PAR_BLOC = 400
+
+PROMPT_LOT_TEMPLATE = """
+MISSION: Extraire UNIQUEMENT les indicateurs économiques OFFICIELS et PRÉCIS de chacun des blocs de texte ci-dessous.
+
+CRITÈRES STRICTS D'INCLUSION:
+• PIB et croissance économique (avec période précise)
+• Taux d'inflation (général, sectoriel, sous-jacent)
+• Taux directeurs et politiques monétaires
+• Commerce extérieur (exportations/importations en %)
+• Indices boursiers (MASI, etc.)
+• Taux de change et devises
+• Contribution sectorielle à la croissance
+• Masse monétaire et crédit
+• Déficit/excédent budgétaire
+
+Chaque bloc commence par son identifiant entre crochets, par exemple [B12].
+
+FORMAT STRICT (chaque ligne préfixée par l'identifiant du bloc d'où provient l'indicateur):
+[B12] Secteur/Indicateur|Valeur|Période|Phrase_complète
+
+Blocs à analyser:
+{blocs}
+
+Répondez UNIQUEMENT avec les données au format demandé, une ligne par indicateur VALIDE.
+"""
+
+_PREFIXE_BLOC = re.compile(r'^\s*\[?\s*B(\d+)\s*\]?\s*[:|\-]?\s*(.*)$')
+
+
+def max_blocs_par_lot(max_tokens=PARAMETRES_GENERATION_LOT["max_tokens"]):
+    return max(1, max_tokens // TOKENS_SORTIE_PAR_BLOC)
+
+
+def former_lots(blocs_indexes, budget_tokens=BUDGET_TOKENS_LOT, max_blocs=None):
+    # Regroupe des (index, bloc) consécutifs tant que le budget d'entrée et de sortie le permet
+    max_blocs = max_blocs or max_blocs_par_lot()
+    lot = []
+    tokens = 0
+    for index, bloc in blocs_indexes:
+        tokens_bloc = estimer_tokens(bloc)
+        if lot and (tokens + tokens_bloc > budget_tokens or len(lot) >= max_blocs):
+            yield lot
+            lot = []
+            tokens = 0
+        lot.append((index, bloc))
+        tokens += tokens_bloc
+    if lot:
+        yield lot
+
+
+def formater_lot(lot):
+    return PROMPT_LOT_TEMPLATE.format(blocs="\n\n".join(f"[B{index}]\n{bloc}" for index, bloc in lot))
+
+
+def separer_reponse_lot(reponse, ids_blocs, on_orpheline=None):
+    # Renvoie le texte de réponse de chaque bloc, ou None si les lignes ne sont pas attribuables ;
+    # on_orpheline(ligne) est appelé pour chaque ligne de données sans identifiant de bloc du lot
+    sections = {index: [] for index in ids_blocs}
+    orphelines = []
+    for ligne in reponse.strip().split('\n'):
+        if '|' not in ligne:
+            continue
+        match = _PREFIXE_BLOC.match(ligne)
+        if match and int(match.group(1)) in sections:
+            sections[int(match.group(1))].append(match.group(2))
+        else:
+            orphelines.append(ligne.strip())
+    lignes_attribuees = sum(len(lignes) for lignes in sections.values())
+    if lignes_attribuees < len(orphelines):
+        return None
+    if on_orpheline is not None:
+        for ligne in orphelines:
+            on_orpheline(ligne)
+    return {index: '\n'.join(lignes) for index, lignes in sections.items()}
@@ -0,0 +1,185 @@
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("extracteur.rapport")
+
+# Bornes de l'histogramme Prometheus des latences d'appel LLM (secondes)
+BORNES_LATENCE = (0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+
+
+def _centile(valeurs_triees, centile):
+    if not valeurs_triees:
+        return 0.0
+    rang = min(len(valeurs_triees) - 1, int(round(centile / 100 * (len(valeurs_triees) - 1))))
+    return valeurs_triees[rang]
+
+
+class RapportExecution:
+    # Mesures d'une analyse : durée propre de chaque étape (hors étapes imbriquées),
+    # latence et tokens de chaque appel LLM, compteurs et réglages
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pile = threading.local()
+        self.debut = time.perf_counter()
+        self.fin = None
+        self.etapes = {}
+        self.latences = []
+        self.tokens_prompt = 0
+        self.tokens_completion = 0
+        self.compteurs = {}
+        self.reglages = {}
+
+    def _ajouter(self, etape, duree):
+        with self._lock:
+            mesure = self.etapes.setdefault(etape, {"appels": 0, "duree": 0.0})
+            mesure["appels"] += 1
+            mesure["duree"] += duree
+
+    @contextmanager
+    def mesurer(self, etape):
+        # Pile par thread : le temps des étapes imbriquées est retiré de l'étape englobante
+        pile = getattr(self._pile, "etapes", None)
+        if pile is None:
+            pile = self._pile.etapes = []
+        pile.append(0.0)
+        debut = time.perf_counter()
+        try:
+            yield
+        finally:
+            duree = time.perf_counter() - debut
+            imbrique = pile.pop()
+            if pile:
+                pile[-1] += duree
+            self._ajouter(etape, duree - imbrique)
+
+    def mesurer_iterateur(self, etape, iterable):
+        # Générateurs du pipeline en flux : seul le calcul de chaque élément est compté
+        iterateur = iter(iterable)
+        while True:
+            with self.mesurer(etape):
+                try:
+                    element = next(iterateur)
+                except StopIteration:
+                    return
+            yield element
+
+    def enregistrer_appel_llm(self, latence, usage=None):
+        with self._lock:
+            self.latences.append(latence)
+            if usage is not None:
+                self.tokens_prompt += getattr(usage, "prompt_tokens", 0) or 0
+                self.tokens_completion += getattr(usage, "completion_tokens", 0) or 0
+
+    def compter(self, compteur, nombre=1):
+        with self._lock:
+            self.compteurs[compteur] = self.compteurs.get(compteur, 0) + nombre
+
+    def terminer(self):
+        self.fin = time.perf_counter()
+
+    def en_dict(self):
+        with self._lock:
+            latences = sorted(self.latences)
+            duree_totale = (self.fin or time.perf_counter()) - self.debut
+            return {
+                "duree_totale": round(duree_totale, 4),
+                "etapes": {
+                    etape: {"appels": mesure["appels"], "duree": round(mesure["duree"], 4)}
+                    for etape, mesure in sorted(self.etapes.items(), key=lambda item: -item[1]["duree"])
+                },
+                "llm": {
+                    "appels": len(latences),
+                    "latence_moyenne": round(sum(latences) / len(latences), 4) if latences else 0.0,
+                    "latence_p50": round(_centile(latences, 50), 4),
+                    "latence_p95": round(_centile(latences, 95), 4),
+                    "latence_max": round(latences[-1], 4) if latences else 0.0,
+                    "latences": [round(latence, 4) for latence in self.latences],
+                    "tokens_prompt": self.tokens_prompt,
+                    "tokens_completion": self.tokens_completion,
+                },
+                "compteurs": dict(self.compteurs),
+                "reglages": dict(self.reglages),
+            }
+
+
+def journaliser_rapport(rapport, **contexte):
+    # Une ligne JSON par analyse, exploitable par un collecteur de journaux
+    logger.info(json.dumps({"evenement": "rapport_execution", **contexte, **rapport}, ensure_ascii=False))
+
+
+def _echapper(valeur):
+    return str(valeur).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetriquesPrometheus:
+    # Cumul des rapports d'exécution, exposé au format texte de Prometheus
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.duree_totale = 0.0
+        self.etapes = {}
+        self.appels_llm = 0
+        self.tokens = {"prompt": 0, "completion": 0}
+        self.histogramme = [0] * (len(BORNES_LATENCE) + 1)
+        self.somme_latences = 0.0
+        self.compteurs = {}
+
+    def ajouter(self, rapport):
+        with self._lock:
+            self.executions += 1
+            self.duree_totale += rapport["duree_totale"]
+            for etape, mesure in rapport["etapes"].items():
+                cumul = self.etapes.setdefault(etape, {"appels": 0, "duree": 0.0})
+                cumul["appels"] += mesure["appels"]
+                cumul["duree"] += mesure["duree"]
+            llm = rapport["llm"]
+            self.appels_llm += llm["appels"]
+            self.tokens["prompt"] += llm["tokens_prompt"]
+            self.tokens["completion"] += llm["tokens_completion"]
+            for latence in llm["latences"]:
+                self.somme_latences += latence
+                index = next((i for i, borne in enumerate(BORNES_LATENCE) if latence <= borne), len(BORNES_LATENCE))
+                self.histogramme[index] += 1
+            for compteur, nombre in rapport["compteurs"].items():
+                self.compteurs[compteur] = self.compteurs.get(compteur, 0) + nombre
+
+    def texte(self, jauges=None):
+        # jauges : {nom: (aide, [(libellés, valeur), ...])} ajoutées telles quelles (ex. travaux par statut)
+        lignes = []
+
+        def metrique(nom, type_metrique, aide, valeurs):
+            lignes.append(f"# HELP {nom} {aide}")
+            lignes.append(f"# TYPE {nom} {type_metrique}")
+            for libelles, valeur in valeurs:
+                etiquettes = ",".join(f'{cle}="{_echapper(v)}"' for cle, v in libelles.items())
+                lignes.append(f"{nom}{{{etiquettes}}} {valeur}" if etiquettes else f"{nom} {valeur}")
+
+        with self._lock:
+            metrique("extracteur_executions_total", "counter", "Analyses terminées", [({}, self.executions)])
+            metrique("extracteur_execution_secondes_total", "counter", "Durée cumulée des analyses",
+                     [({}, round(self.duree_totale, 4))])
+            metrique("extracteur_etape_secondes_total", "counter", "Durée propre cumulée par étape",
+                     [({"etape": etape}, round(m["duree"], 4)) for etape, m in sorted(self.etapes.items())])
+            metrique("extracteur_etape_appels_total", "counter", "Nombre de passages par étape",
+                     [({"etape": etape}, m["appels"]) for etape, m in sorted(self.etapes.items())])
+            metrique("extracteur_llm_appels_total", "counter", "Appels LLM effectués", [({}, self.appels_llm)])
+            metrique("extracteur_llm_tokens_total", "counter", "Tokens déclarés par l'API",
+                     [({"type": type_token}, nombre) for type_token, nombre in self.tokens.items()])
+            cumul = 0
+            seaux = []
+            for borne, nombre in zip(BORNES_LATENCE + ("+Inf",), self.histogramme):
+                cumul += nombre
+                seaux.append(({"le": borne}, cumul))
+            metrique("extracteur_llm_latence_secondes", "histogram", "Latence des appels LLM", [])
+            for libelles, valeur in seaux:
+                lignes.append(f'extracteur_llm_latence_secondes_bucket{{le="{libelles["le"]}"}} {valeur}')
+            lignes.append(f"extracteur_llm_latence_secondes_sum {round(self.somme_latences, 4)}")
+            lignes.append(f"extracteur_llm_latence_secondes_count {cumul}")
+            metrique("extracteur_compteur_total", "counter", "Compteurs du pipeline (blocs, cache, lots)",
+                     [({"nom": nom}, nombre) for nom, nombre in sorted(self.compteurs.items())])
+        for nom, (aide, valeurs) in (jauges or {}).items():
+            metrique(nom, "gauge", aide, valeurs)
+        return "\n".join(lignes) + "\n"
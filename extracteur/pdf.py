@@ -0,0 +1,104 @@
+import math
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz
+
+from .repetitions import texte_page
+from .tableaux import extraire_tableaux
+from .validation import ligne_valide
+
+# Au-delà de ce nombre de pages, l'extraction est répartie sur plusieurs processus
+SEUIL_PAGES_PARALLELE = 300
+
+
+def compter_pages(pdf_bytes):
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as document:
+        return document.page_count
+
+
+def doit_paralleliser(pdf_bytes, seuil=SEUIL_PAGES_PARALLELE, pages=None):
+    # Inutile sur une machine mono-cœur : le coût de démarrage des processus l'emporte.
+    # pages : numéros (à partir de 1) des seules pages à lire
+    if not seuil or (os.cpu_count() or 1) < 2:
+        return False
+    return (len(pages) if pages is not None else compter_pages(pdf_bytes)) >= seuil
+
+
+def tableau_retenu(tableau):
+    # Un tableau n'est traité localement que si toutes ses lignes passent la validation (mêmes règles
+    # que les réponses du LLM) ; sinon il reste entier dans le texte destiné au LLM, pour qu'aucune ligne
+    # ne soit perdue
+    return all(
+        ligne_valide(ligne["Secteur/Indicateur"], ligne["Valeur"], ligne["Phrase"]) for ligne in tableau["lignes"]
+    )
+
+
+def lire_page(page, en_tetes=frozenset()):
+    # Texte destiné au LLM (sans en-têtes, pieds de page ni tableaux retenus), lignes d'en-tête retirées
+    # et tableaux reconstruits localement à partir de la position des mots
+    tableaux = [tableau for tableau in extraire_tableaux(page) if tableau_retenu(tableau)]
+    texte, retirees = texte_page(page, en_tetes, [tableau["rect"] for tableau in tableaux])
+    return texte, retirees, tableaux
+
+
+def _extraire_plage(chemin, numeros, en_tetes=frozenset()):
+    # Chaque processus ouvre sa propre instance du document
+    depart = time.perf_counter()
+    with fitz.open(chemin) as document:
+        pages = [lire_page(document[numero - 1], en_tetes) for numero in numeros]
+    return pages, time.perf_counter() - depart
+
+
+def iter_pages_paralleles(pdf_bytes, nb_processus=None, statistiques=None, en_tetes=frozenset(), on_lecture=None,
+                          pages=None):
+    # on_lecture(numero, retirees, tableaux) est appelé dans le processus appelant pour chaque page,
+    # avec les lignes d'en-tête retirées et les tableaux retenus (voir lire_page).
+    # pages : numéros (à partir de 1) des seules pages à lire, dans l'ordre ; toutes par défaut
+    nb_processus = nb_processus or os.cpu_count() or 1
+    numeros = list(pages) if pages is not None else list(range(1, compter_pages(pdf_bytes) + 1))
+    nb_pages = len(numeros)
+    taille_plage = max(8, math.ceil(nb_pages / (nb_processus * 4)))
+    plages = [numeros[debut:debut + taille_plage] for debut in range(0, nb_pages, taille_plage)]
+
+    # Fichier temporaire : évite de sérialiser le PDF entier pour chaque plage
+    fd, chemin = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(fd, "wb") as fichier:
+        fichier.write(pdf_bytes)
+
+    depart = time.perf_counter()
+    # Fin de chaque plage côté processus : le générateur est consommé au rythme de l'analyse (appels LLM),
+    # dont la durée ne doit pas entrer dans celle de l'extraction
+    fins = []
+    duree_cumulee = 0.0
+    # spawn : le serveur Streamlit est multi-thread, fork n'y est pas sûr
+    executor = ProcessPoolExecutor(max_workers=nb_processus, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        futures = [executor.submit(_extraire_plage, chemin, plage, en_tetes) for plage in plages]
+        for future in futures:
+            future.add_done_callback(lambda _: fins.append(time.perf_counter()))
+        # Réassemblage dans l'ordre des pages, plage par plage
+        for plage, future in zip(plages, futures):
+            lues, duree = future.result()
+            duree_cumulee += duree
+            for numero, (texte, retirees, tableaux) in zip(plage, lues):
+                if on_lecture is not None:
+                    on_lecture(numero, retirees, tableaux)
+                yield texte
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        os.remove(chemin)
+
+    if statistiques is not None:
+        duree_totale = max(fins, default=depart) - depart
+        statistiques.update({
+            "pages": nb_pages,
+            "processus": nb_processus,
+            "duree": duree_totale,
+            "duree_cumulee": duree_cumulee,
+            # Gain estimé : temps d'extraction cumulé des processus / temps écoulé jusqu'à la fin de la dernière plage
+            "acceleration": duree_cumulee / duree_totale if duree_totale else 1.0,
+        })
@@ -0,0 +1,107 @@
+import re
+
+import fitz
+import pandas as pd
+
+from .lexique import INDICATEURS_PRIORITAIRES, MOTS_CLES_VALIDES, SECTIONS_HORS_SUJET, SECTIONS_MACRO
+from .tableaux import extraire_tableaux
+from .validation import alternance
+
+# Pages retenues par défaut (sélection des N meilleures pages) : score au moins égal à ce seuil
+SEUIL_PERTINENCE_PAGE = 4.0
+# Bonus (ou malus) d'une page selon le titre de sa section dans les signets du PDF
+BONUS_SECTION = 3.0
+
+COLONNES_CARTE = ["Page", "Score", "Chiffres", "Pourcentages", "Mots-clés", "Tableaux", "Section"]
+
+_MOTS_CLES = alternance(set(MOTS_CLES_VALIDES) | set(INDICATEURS_PRIORITAIRES))
+_SECTIONS_MACRO = alternance(SECTIONS_MACRO)
+_SECTIONS_HORS_SUJET = alternance(SECTIONS_HORS_SUJET)
+_NOMBRE = re.compile(r"\d+(?:[,.]\d+)?")
+_ANNEE = re.compile(r"(?:19|20)\d{2}")
+_POURCENTAGE = re.compile(r"\d\s?%|\bpoints?\b|\bpb\b")
+_PLAGE = re.compile(r"^\s*(\d+)\s*(?:[-–]\s*(\d+)\s*)?$")
+
+
+def _sections(document):
+    # Titre de la section (chemin dans les signets) de chaque page, d'après la table des matières du PDF
+    sections = [""] * document.page_count
+    chemin = []
+    for niveau, titre, page in sorted(document.get_toc(simple=True), key=lambda entree: entree[2]):
+        if page < 1:
+            continue
+        chemin = chemin[:niveau - 1] + [titre.strip()]
+        for numero in range(page - 1, document.page_count):
+            sections[numero] = " > ".join(chemin)
+    return sections
+
+
+def score_page(texte, section="", nb_tableaux=0):
+    # Densité de chiffres (hors années), pourcentages, mots-clés économiques, tableaux d'indicateurs,
+    # et section des signets : de 0 (page de garde, gouvernance) à une vingtaine (tableaux macro)
+    minuscules = texte.lower()
+    nb_mots = max(1, len(minuscules.split()))
+    chiffres = sum(1 for nombre in _NOMBRE.findall(texte) if not _ANNEE.fullmatch(nombre))
+    densite = 100 * chiffres / nb_mots
+    pourcentages = len(_POURCENTAGE.findall(minuscules))
+    mots_cles = len(set(_MOTS_CLES.findall(minuscules)))
+    score = 0.5 * min(densite, 10) + 0.25 * min(pourcentages, 20) + 0.5 * min(mots_cles, 10) + min(nb_tableaux, 3)
+    titre = section.lower()
+    if _SECTIONS_MACRO.search(titre):
+        score += BONUS_SECTION
+    elif _SECTIONS_HORS_SUJET.search(titre):
+        score -= BONUS_SECTION
+    return max(score, 0.0), round(densite, 1), pourcentages, mots_cles
+
+
+def carte_pertinence(pdf_bytes):
+    # Premier passage rapide, sans LLM : une ligne par page (COLONNES_CARTE)
+    lignes = []
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as document:
+        sections = _sections(document)
+        for page in document:
+            nb_tableaux = len(extraire_tableaux(page))
+            score, densite, pourcentages, mots_cles = score_page(page.get_text(), sections[page.number], nb_tableaux)
+            lignes.append((page.number + 1, round(score, 2), densite, pourcentages, mots_cles, nb_tableaux,
+                           sections[page.number]))
+    return pd.DataFrame(lignes, columns=COLONNES_CARTE)
+
+
+def pages_pertinentes(carte, nb_pages=None, seuil=SEUIL_PERTINENCE_PAGE):
+    # Les nb_pages pages de meilleur score (par défaut : celles qui atteignent le seuil), dans l'ordre du document
+    if nb_pages is None:
+        nb_pages = max(1, int((carte["Score"] >= seuil).sum()))
+    meilleures = carte.sort_values(["Score", "Page"], ascending=[False, True], kind="stable").head(nb_pages)
+    return sorted(int(page) for page in meilleures["Page"])
+
+
+def lire_plages(texte, nb_pages):
+    # « 1-5, 12, 30-40 » -> [1, 2, 3, 4, 5, 12, 30, ..., 40]
+    pages = set()
+    for morceau in texte.replace(";", ",").split(","):
+        if not morceau.strip():
+            continue
+        plage = _PLAGE.match(morceau)
+        if plage is None:
+            raise ValueError(f"Plage de pages invalide : {morceau.strip()}")
+        debut = int(plage.group(1))
+        fin = int(plage.group(2) or debut)
+        if debut > fin:
+            raise ValueError(f"Plage de pages invalide : {morceau.strip()}")
+        if not 1 <= debut <= fin <= nb_pages:
+            raise ValueError(f"Plage de pages hors du document (1-{nb_pages}) : {morceau.strip()}")
+        pages.update(range(debut, fin + 1))
+    if not pages:
+        raise ValueError("Aucune page sélectionnée")
+    return sorted(pages)
+
+
+def formater_plages(pages):
+    # [1, 2, 3, 5, 7, 8] -> "1-3,5,7-8" : forme compacte pour les réglages et la version du pipeline
+    plages = []
+    for page in sorted(pages):
+        if plages and page == plages[-1][1] + 1:
+            plages[-1][1] = page
+        else:
+            plages.append([page, page])
+    return ",".join(str(debut) if debut == fin else f"{debut}-{fin}" for debut, fin in plages)
@@ -0,0 +1,609 @@
+import itertools
+import logging
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+import fitz
+import pandas as pd
+
+from .backends import BACKEND_GROQ, BACKEND_OPENAI, obtenir_client
+from .cache import cle_reponse
+from .decoupage import (
+    BUDGET_TOKENS_BLOC,
+    CHEVAUCHEMENT_TOKENS,
+    dedupliquer_chevauchement,
+    estimer_tokens,
+    iter_blocs_tokens,
+    iter_phrases,
+)
+from .lexique import MOTS_CLES_VALIDES
+from .limitation import planificateur_backend
+from .lots import (
+    PARAMETRES_GENERATION_LOT,
+    PROMPT_LOT_TEMPLATE,
+    formater_lot,
+    former_lots,
+    separer_reponse_lot,
+)
+from .mesures import RapportExecution
+from .pdf import SEUIL_PAGES_PARALLELE, doit_paralleliser, iter_pages_paralleles, lire_page
+from .pertinence import formater_plages
+from .preselection import SEUIL_PRESELECTION, score_pertinence
+from .regles import MODE_LLM, MODE_REGLES, extraire_indicateurs, formater_reponse
+from .repetitions import FiltreQuasiDoublons, detecter_en_tetes, iter_phrases_uniques
+from .validation import SEUIL_VECTORISATION, alternance, ligne_valide, masque_qualite, masque_validite
+
+logger = logging.getLogger(__name__)
+
+# Nombre de requêtes Groq envoyées en parallèle par défaut
+CONCURRENCE_PAR_DEFAUT = 4
+
+MODELE_GROQ = "llama-3.3-70b-versatile"
+PARAMETRES_GENERATION = {"temperature": 0.05, "max_tokens": 1024}
+
+PROMPT_TEMPLATE = """
+MISSION: Extraire UNIQUEMENT les indicateurs économiques OFFICIELS et PRÉCIS du texte.
+
+CRITÈRES STRICTS D'INCLUSION:
+• PIB et croissance économique (avec période précise)
+• Taux d'inflation (général, sectoriel, sous-jacent)  
+• Taux directeurs et politiques monétaires
+• Commerce extérieur (exportations/importations en %)
+• Indices boursiers (MASI, etc.)
+• Taux de change et devises
+• Contribution sectorielle à la croissance
+• Masse monétaire et crédit
+• Déficit/excédent budgétaire
+
+FORMAT STRICT:
+Secteur/Indicateur|Valeur|Période|Phrase_complète
+
+Texte à analyser:
+{bloc}
+
+Répondez UNIQUEMENT avec les données au format demandé, une ligne par indicateur VALIDE.
+"""
+
+# À incrémenter à chaque changement de l'analyse ou du filtrage ; le prompt et le modèle
+# sont pris en compte automatiquement
+VERSION_PIPELINE = "5-" + cle_reponse("", PROMPT_TEMPLATE, MODELE_GROQ, PARAMETRES_GENERATION)[:12]
+
+def version_pipeline(**reglages):
+    # Les réglages de l'analyse font partie de la version : ils changent le résultat final
+    return VERSION_PIPELINE + "".join(f":{cle}={reglages[cle]}" for cle in sorted(reglages))
+
+def identifiant_llm(backend=BACKEND_GROQ, modele=None):
+    # Modèle tel qu'il entre dans les clés de cache et la version : inchangé pour le modèle Groq par défaut
+    modele = modele or MODELE_GROQ
+    return modele if backend == BACKEND_GROQ else f"{backend}:{modele}"
+
+def reglages_llm(backend=BACKEND_GROQ, modele=None):
+    # Réglages à ajouter à version_pipeline quand l'analyse ne passe pas par le modèle Groq par défaut
+    identifiant = identifiant_llm(backend, modele)
+    return {} if identifiant == MODELE_GROQ else {"llm": identifiant}
+
+COLONNES_RESULTATS = ["Secteur/Indicateur", "Valeur", "Période", "Phrase"]
+# Provenance de chaque ligne : index du bloc (après présélection) et pages lues pendant sa constitution
+COLONNES_PROVENANCE = ["Bloc", "Page", "Page fin"]
+
+
+def _signaler_pages(pages, on_page):
+    for texte in pages:
+        on_page()
+        yield texte
+
+
+class PDFEconomicExtractor:
+    def __init__(self, groq_api_key, client=None, planificateur=None, cache=None, mode=MODE_LLM,
+                 signaler_erreur=None, initialiser_thread=None, backend=BACKEND_GROQ, base_url=None, modele=None):
+        # signaler_erreur : st.error dans l'interface, journalisation sinon
+        # initialiser_thread : exécuté au démarrage de chaque thread de la pool d'appels
+        self.signaler_erreur = signaler_erreur or logger.error
+        self.initialiser_thread = initialiser_thread
+        # Un serveur compatible OpenAI ne connaît pas le modèle Groq : son nom doit être donné
+        if backend == BACKEND_OPENAI and not modele and mode != MODE_REGLES:
+            raise ValueError("Nom du modèle requis pour un serveur compatible OpenAI")
+        # Le mode hors ligne n'a pas besoin de client LLM ; sinon, client partagé par clé (backends.py)
+        if client is None and mode != MODE_REGLES:
+            try:
+                client = obtenir_client(backend, groq_api_key, base_url)
+            except Exception as e:
+                self.signaler_erreur(f"Erreur lors de l'initialisation du client LLM: {str(e)}")
+                raise e
+        self.client = client
+        self.modele = modele or MODELE_GROQ
+        # Réponses d'un autre backend jamais confondues dans le cache avec celles de Groq
+        self._modele_cache = identifiant_llm(backend, modele)
+        # Par défaut, quotas du backend : offre gratuite Groq, aucun pour un serveur local
+        self.planificateur = planificateur or planificateur_backend(backend)
+        self.cache = cache
+        self.mode = mode
+        self.tableau_final = []
+        self.resultats_blocs = {}
+        # Lignes des tableaux extraits localement, par numéro de page (sans appel LLM)
+        self.resultats_tableaux = {}
+        # Lu par l'interface (AnalyseEnCours.lignes) pendant que le thread d'analyse l'alimente
+        self._verrou_tableaux = threading.Lock()
+        self.page_courante = 0
+        self.pages_blocs = []
+        self._page_bloc_precedent = None
+        self._numero_page_lue = None
+        self.nb_blocs = 0
+        self.nb_blocs_ignores = 0
+        self.nb_blocs_regles = 0
+        self.nb_blocs_repris = 0
+        self.nb_blocs_echec = 0
+        self.stats_extraction = None
+        self.annulee = False
+        # Blocs déjà vus dans le document, écartés avant tout appel
+        self.quasi_doublons = FiltreQuasiDoublons()
+        # Mesures par étape, appels LLM et tokens de l'analyse en cours
+        self.rapport = RapportExecution()
+        self.rapport.reglages["mode"] = mode
+        self.rapport.reglages["modele"] = self.modele
+        self._planificateur_initial = (
+            self.planificateur.nb_requetes, self.planificateur.nb_limitations, self.planificateur.temps_attente,
+            self.planificateur.nb_erreurs_transitoires
+        )
+
+    def _creer_completion(self, **parametres):
+        completions = self.client.chat.completions
+        # La réponse brute expose les en-têtes x-ratelimit-* de Groq
+        if hasattr(completions, "with_raw_response"):
+            reponse_brute = completions.with_raw_response.create(**parametres)
+            self.planificateur.mettre_a_jour(reponse_brute.headers)
+            return reponse_brute.parse()
+        return completions.create(**parametres)
+
+    def _appeler_llm(self, prompt, parametres):
+        def appel():
+            debut = time.perf_counter()
+            completion = self._creer_completion(
+                model=self.modele,
+                messages=[{"role": "user", "content": prompt}],
+                **parametres
+            )
+            # Latence de la requête seule ; l'étape appel_llm inclut aussi les attentes du planificateur
+            self.rapport.enregistrer_appel_llm(time.perf_counter() - debut, getattr(completion, "usage", None))
+            return completion
+        
+        with self.rapport.mesurer("appel_llm"):
+            return self.planificateur.executer(appel, tokens_estimes=estimer_tokens(prompt))
+
+    def _signaler_erreur_api(self, e):
+        error_msg = str(e).lower()
+        if "rate limit" in error_msg:
+            self.signaler_erreur("Limite de taux API atteinte malgré les nouvelles tentatives. Attendez quelques minutes.")
+        elif "api key" in error_msg or "unauthorized" in error_msg:
+            self.signaler_erreur("Clé API invalide. Vérifiez votre clé Groq.")
+        else:
+            self.signaler_erreur(f"Erreur API Groq: {e}")
+
+    def callback_llama_groq(self, bloc):
+        # None si l'appel échoue ; "" pour une réponse vide (bloc sans indicateur), qui est un résultat
+        try:
+            prompt = PROMPT_TEMPLATE.format(bloc=bloc)
+            
+            completion = self._appeler_llm(prompt, PARAMETRES_GENERATION)
+            
+            return completion.choices[0].message.content or ""
+            
+        except Exception as e:
+            self._signaler_erreur_api(e)
+            return None
+
+    def callback_llama_groq_lot(self, lot):
+        # None si l'appel échoue ou si la réponse est tronquée : le lot sera rejoué bloc par bloc
+        try:
+            completion = self._appeler_llm(formater_lot(lot), PARAMETRES_GENERATION_LOT)
+            choix = completion.choices[0]
+            if getattr(choix, "finish_reason", None) == "length":
+                return None
+            return choix.message.content or ""
+        except Exception as e:
+            self._signaler_erreur_api(e)
+            return None
+
+    def analyser_texte_economique(self, llama_response, ids_blocs=None):
+        with self.rapport.mesurer("analyse_reponse"):
+            return self._analyser_reponse(llama_response, ids_blocs)
+
+    def _analyser_reponse(self, llama_response, ids_blocs=None):
+        # Réponse groupée : lignes préfixées par [B<index>], analysées bloc par bloc
+        if ids_blocs is not None:
+            sections = separer_reponse_lot(llama_response or "", ids_blocs, self._ligne_lot_orpheline)
+            if sections is None:
+                return None
+            return {index: self._analyser_reponse(texte) for index, texte in sections.items()}
+        
+        if not llama_response:
+            return []
+        
+        lignes = llama_response.strip().split('\n')
+        candidats = []
+        
+        for ligne in lignes:
+            ligne = ligne.strip()
+            if ligne and '|' in ligne:
+                ligne = ligne.strip('| ')
+                colonnes = [col.strip() for col in ligne.split('|')]
+                
+                if len(colonnes) >= 4:
+                    candidats.append({
+                        "Secteur/Indicateur": colonnes[0].strip(),
+                        "Valeur": colonnes[1].strip(),
+                        "Période": colonnes[2].strip(),
+                        "Phrase": colonnes[3].strip()
+                    })
+        
+        # Longues réponses : validation vectorisée de toutes les lignes d'un coup
+        if len(candidats) >= SEUIL_VECTORISATION:
+            masque = masque_validite(pd.DataFrame(candidats, columns=COLONNES_RESULTATS))
+            return [candidat for candidat, valide in zip(candidats, masque) if valide]
+        
+        return [
+            candidat for candidat in candidats
+            if self._valider_donnee_economique(
+                candidat["Secteur/Indicateur"], candidat["Valeur"], candidat["Période"], candidat["Phrase"],
+                MOTS_CLES_VALIDES
+            )
+        ]
+
+    def _ligne_lot_orpheline(self, ligne):
+        # Ligne d'une réponse groupée attribuable à aucun bloc du lot : écartée, mais tracée
+        self.rapport.compter("lignes_lot_orphelines")
+        logger.warning("Ligne de réponse groupée sans identifiant de bloc valide, écartée : %s", ligne[:200])
+
+    def _reponse_bloc(self, bloc):
+        # Un succès du cache évite complètement l'appel à Groq
+        if self.cache is None:
+            return self.callback_llama_groq(bloc)
+        cle = cle_reponse(bloc, PROMPT_TEMPLATE, self._modele_cache, PARAMETRES_GENERATION)
+        reponse_llama = self.cache.get(cle)
+        self.rapport.compter("cache_llm_hits" if reponse_llama is not None else "cache_llm_misses")
+        if reponse_llama is None:
+            reponse_llama = self.callback_llama_groq(bloc)
+            if reponse_llama is not None:
+                self.cache.set(cle, reponse_llama)
+        return reponse_llama
+
+    def _blocs_pour_llm(self, blocs, resultats, on_bloc=None, reprise=None):
+        # Blocs déjà acquis d'une analyse interrompue : repris tels quels, sans appel
+        # Moteur de règles : en mode hybride, seuls les blocs avec des valeurs non classées vont au LLM
+        for index, bloc in enumerate(blocs):
+            if reprise is not None and index in reprise.blocs:
+                resultats[index] = reprise.blocs[index]
+                self.nb_blocs_repris += 1
+                if on_bloc:
+                    on_bloc(index, resultats[index])
+                continue
+            if self.mode != MODE_LLM:
+                with self.rapport.mesurer("moteur_regles"):
+                    lignes, ambigu = extraire_indicateurs(bloc)
+                if self.mode == MODE_REGLES or not ambigu:
+                    resultats[index] = self.analyser_texte_economique(formater_reponse(lignes))
+                    self.nb_blocs_regles += 1
+                    if on_bloc:
+                        on_bloc(index, resultats[index])
+                    continue
+            yield index, bloc
+
+    def _traiter_bloc(self, bloc):
+        # None sans réponse (erreur d'API) : le bloc n'est pas considéré comme acquis
+        reponse_llama = self._reponse_bloc(bloc)
+        if reponse_llama is None:
+            return None
+        return self.analyser_texte_economique(reponse_llama)
+
+    def _traiter_lot(self, lot):
+        if len(lot) == 1:
+            index, bloc = lot[0]
+            return {index: self._traiter_bloc(bloc)}
+        
+        ids_blocs = [index for index, _ in lot]
+        cle = None
+        reponse_llama = None
+        if self.cache is not None:
+            # La réponse désigne les blocs par leur identifiant [B<index>] : la clé porte sur le prompt
+            # complet, identifiants compris, pour ne jamais réattribuer une réponse à d'autres blocs
+            cle = cle_reponse(formater_lot(lot), PROMPT_LOT_TEMPLATE, self._modele_cache, PARAMETRES_GENERATION_LOT)
+            reponse_llama = self.cache.get(cle)
+            self.rapport.compter("cache_llm_hits" if reponse_llama is not None else "cache_llm_misses")
+        if reponse_llama is None:
+            reponse_llama = self.callback_llama_groq_lot(lot)
+        self.rapport.compter("lots")
+        
+        resultats = None
+        if reponse_llama is not None:
+            resultats = self.analyser_texte_economique(reponse_llama, ids_blocs=ids_blocs)
+        if resultats is None:
+            # Sortie inexploitable : repli sur un appel par bloc
+            self.rapport.compter("lots_rejoues")
+            return {index: self._traiter_bloc(bloc) for index, bloc in lot}
+        if cle is not None:
+            self.cache.set(cle, reponse_llama)
+        return resultats
+
+    def analyser_blocs(self, blocs, max_workers=CONCURRENCE_PAR_DEFAUT, on_progress=None, mode_lot=False,
+                       on_bloc=None, annulation=None, reprise=None):
+        # blocs peut être un générateur : chaque bloc (ou lot de blocs) est envoyé dès qu'il est prêt
+        # on_bloc(index, lignes) reçoit les lignes de chaque bloc dès qu'il est analysé
+        # annulation (threading.Event) : plus aucun bloc n'est envoyé, les requêtes en vol sont conservées
+        # reprise (cache.RepriseDocument) : blocs acquis repris, chaque nouveau bloc analysé y est enregistré
+        max_workers = max(1, max_workers)
+        self.rapport.reglages.update(concurrence=max_workers, mode_lot=mode_lot)
+        resultats = {}
+        en_cours = {}
+        soumis = 0
+        hors_llm_avant = self.nb_blocs_regles + self.nb_blocs_repris
+
+        def signaler():
+            # Les blocs résolus par le moteur de règles ou repris comptent comme soumis et terminés
+            if on_progress:
+                on_progress(len(resultats), soumis + self.nb_blocs_regles + self.nb_blocs_repris - hors_llm_avant)
+
+        def collecter(futures):
+            for future in futures:
+                en_cours.pop(future)
+                for index, lignes in future.result().items():
+                    if lignes is None:
+                        self.nb_blocs_echec += 1
+                        lignes = []
+                    elif reprise is not None:
+                        reprise.enregistrer(index, lignes)
+                    resultats[index] = lignes
+                    if on_bloc:
+                        on_bloc(index, lignes)
+                signaler()
+
+        if annulation is not None:
+            blocs = itertools.takewhile(lambda _: not annulation.is_set(), blocs)
+        blocs_llm = self._blocs_pour_llm(blocs, resultats, on_bloc, reprise)
+        if mode_lot:
+            lots = former_lots(blocs_llm)
+        else:
+            lots = ([(i, bloc)] for i, bloc in blocs_llm)
+
+        with ThreadPoolExecutor(max_workers=max_workers, initializer=self.initialiser_thread) as executor:
+            for lot in lots:
+                if annulation is not None and annulation.is_set():
+                    break
+                en_cours[executor.submit(self._traiter_lot, lot)] = lot
+                soumis += len(lot)
+                # Fenêtre bornée : la lecture du PDF n'avance pas plus vite que l'API
+                if len(en_cours) >= 2 * max_workers:
+                    termines, _ = wait(en_cours, return_when=FIRST_COMPLETED)
+                    collecter(termines)
+            if annulation is not None and annulation.is_set():
+                # Les lots encore en file ne partent pas ; ceux déjà envoyés vont à leur terme
+                self.annulee = True
+                for future in list(en_cours):
+                    if future.cancel():
+                        lot = en_cours.pop(future)
+                        soumis -= len(lot)
+                        self.rapport.compter("blocs_annules", len(lot))
+            collecter(as_completed(list(en_cours)))
+        if resultats:
+            signaler()
+        if reprise is not None and not self.annulee and not self.nb_blocs_echec:
+            # Analyse complète : le point de reprise n'a plus d'utilité
+            reprise.effacer()
+
+        # Fusion dans l'ordre des blocs, indépendamment de l'ordre de complétion
+        donnees = dedupliquer_chevauchement(resultats[i] for i in sorted(resultats))
+        self.tableau_final.extend(donnees)
+        self.resultats_blocs.update(resultats)
+        return donnees
+
+    def _valider_donnee_economique(self, secteur_indicateur, valeur, periode, phrase, mots_cles_valides):
+        # Expressions précompilées ; une liste de mots-clés personnalisée est compilée à la volée
+        mots_cles = None if mots_cles_valides is MOTS_CLES_VALIDES else alternance(mots_cles_valides)
+        return ligne_valide(secteur_indicateur, valeur, phrase, mots_cles)
+
+    def iter_pages(self, pdf_bytes, seuil_parallele=SEUIL_PAGES_PARALLELE, pages=None):
+        # En-têtes, pieds de page et numéros de page répétés : détectés d'après leur position, puis
+        # retirés de chaque page pour ne pas être envoyés au LLM dans presque tous les blocs.
+        # pages : numéros (à partir de 1) des seules pages à lire (carte de pertinence) ; toutes par défaut.
+        # Gros documents : extraction répartie sur plusieurs processus
+        if pages is not None:
+            self.rapport.reglages["pages"] = formater_plages(pages)
+        if doit_paralleliser(pdf_bytes, seuil_parallele, pages):
+            with self.rapport.mesurer("en_tetes"), fitz.open(stream=pdf_bytes, filetype="pdf") as document:
+                en_tetes = detecter_en_tetes(document)
+            self.stats_extraction = {}
+            # Mesuré côté thread principal : attente des pages produites par les processus
+            yield from self.rapport.mesurer_iterateur(
+                "extraction_page", iter_pages_paralleles(
+                    pdf_bytes, statistiques=self.stats_extraction, en_tetes=en_tetes, on_lecture=self._page_lue,
+                    pages=pages
+                )
+            )
+            return
+        
+        # Les pages sont lues à la demande, sans construire le texte complet
+        with self.rapport.mesurer("ouverture_pdf"):
+            document = fitz.open(stream=pdf_bytes, filetype="pdf")
+        try:
+            with self.rapport.mesurer("en_tetes"):
+                en_tetes = detecter_en_tetes(document)
+            # Les en-têtes sont détectés sur tout le document, même si seules quelques pages sont lues
+            for numero in pages if pages is not None else range(1, document.page_count + 1):
+                with self.rapport.mesurer("extraction_page"):
+                    texte, retirees, tableaux = lire_page(document[numero - 1], en_tetes)
+                self._page_lue(numero, retirees, tableaux)
+                yield texte
+        finally:
+            document.close()
+
+    def _page_lue(self, numero, retirees, tableaux):
+        self._numero_page_lue = numero
+        if retirees:
+            self.rapport.compter("lignes_repetees", len(retirees))
+            self.rapport.compter("tokens_repetes", sum(estimer_tokens(ligne) for ligne in retirees))
+        if not tableaux:
+            return
+        # Tableaux : lignes reconstruites d'après la mise en page, validées comme celles du moteur de règles ;
+        # leur texte n'est pas envoyé au LLM
+        lignes = self.analyser_texte_economique(
+            formater_reponse([ligne for tableau in tableaux for ligne in tableau["lignes"]])
+        )
+        self.rapport.compter("tableaux", len(tableaux))
+        self.rapport.compter("tokens_tableaux", sum(estimer_tokens(tableau["texte"]) for tableau in tableaux))
+        if lignes:
+            self.rapport.compter("lignes_tableaux", len(lignes))
+            with self._verrou_tableaux:
+                self.resultats_tableaux[numero] = lignes
+            self.tableau_final.extend(lignes)
+
+    def lignes_tableaux(self):
+        # Lignes des tableaux déjà lus, dans l'ordre des pages ; sûr pendant l'analyse
+        with self._verrou_tableaux:
+            tableaux = dict(self.resultats_tableaux)
+        return [ligne for numero in sorted(tableaux) for ligne in tableaux[numero]]
+
+    def extract_text_from_pdf(self, pdf_bytes):
+        try:
+            return "".join(self.iter_pages(pdf_bytes))
+        except Exception as e:
+            self.signaler_erreur(f"Erreur lors de l'extraction du PDF: {e}")
+            return ""
+
+    def clean_text(self, text):
+        with self.rapport.mesurer("clean_text"):
+            text = re.sub(r'\n+', '\n', text)
+            text = re.sub(r'\s+', ' ', text)
+            return text.strip()
+
+    def decouper_en_blocs(self, text, budget_tokens=BUDGET_TOKENS_BLOC, chevauchement_tokens=CHEVAUCHEMENT_TOKENS):
+        # Blocs alignés sur les phrases, remplis jusqu'au budget de tokens
+        with self.rapport.mesurer("decoupage"):
+            return list(iter_blocs_tokens(iter_phrases([text]), budget_tokens, chevauchement_tokens))
+
+    def iter_blocs(self, pages, budget_tokens=BUDGET_TOKENS_BLOC, chevauchement_tokens=CHEVAUCHEMENT_TOKENS):
+        # Équivalent en flux de clean_text + decouper_en_blocs, les phrases chevauchant les pages
+        self.rapport.reglages.update(budget_tokens=budget_tokens, chevauchement_tokens=chevauchement_tokens)
+        pages_propres = (self.clean_text(page) for page in self._suivre_pages(pages))
+        phrases = iter_phrases_uniques(iter_phrases(pages_propres), self._compter_phrase_repetee)
+        # Durée propre du découpage : extraction et nettoyage des pages sont mesurés à part
+        return self.rapport.mesurer_iterateur(
+            "decoupage", iter_blocs_tokens(phrases, budget_tokens, chevauchement_tokens)
+        )
+
+    def _compter_phrase_repetee(self, phrase):
+        self.rapport.compter("phrases_repetees")
+        self.rapport.compter("tokens_phrases_repetees", estimer_tokens(phrase))
+
+    def _suivre_pages(self, pages):
+        # Numéro de la page en cours de lecture, pour la provenance des blocs : numéro réel de la page
+        # quand elle vient d'iter_pages (sélection de pages), sinon rang dans le flux
+        for texte in pages:
+            self.page_courante = self._numero_page_lue or self.page_courante + 1
+            if self._page_bloc_precedent is None:
+                self._page_bloc_precedent = self.page_courante
+            yield texte
+
+    def preselectionner_blocs(self, blocs, seuil=SEUIL_PRESELECTION):
+        self.rapport.reglages["seuil_preselection"] = seuil
+        for bloc in blocs:
+            self.nb_blocs += 1
+            # Un bloc commence sur la page lue quand le précédent a été émis et finit sur la page en cours
+            page_debut, self._page_bloc_precedent = self._page_bloc_precedent, max(1, self.page_courante)
+            with self.rapport.mesurer("preselection"):
+                retenu = not seuil or score_pertinence(bloc) >= seuil
+            if retenu:
+                with self.rapport.mesurer("quasi_doublons"):
+                    doublon = self.quasi_doublons.est_doublon(bloc)
+                if doublon:
+                    self.rapport.compter("blocs_quasi_doublons")
+                    self.rapport.compter("tokens_quasi_doublons", estimer_tokens(bloc))
+                    continue
+                self.pages_blocs.append((page_debut, self.page_courante) if self.page_courante else (None, None))
+                yield bloc
+            else:
+                self.nb_blocs_ignores += 1
+
+    def filtrer_donnees_qualite(self, donnees):
+        # Score calculé sur toutes les lignes à la fois (voir validation.scores_qualite)
+        if not donnees:
+            return []
+        masque = masque_qualite(pd.DataFrame(donnees, columns=COLONNES_RESULTATS))
+        return [donnee for donnee, retenue in zip(donnees, masque) if retenue]
+
+    def finaliser_resultats(self, donnees=None):
+        # Filtrage qualité, déduplication et tri : tableau final affiché ou exporté
+        with self.rapport.mesurer("filtrage"):
+            return self._finaliser(self.tableau_final if donnees is None else donnees)
+
+    def _finaliser(self, donnees):
+        df_final = pd.DataFrame(donnees, columns=COLONNES_RESULTATS)
+        df_final = df_final[masque_qualite(df_final)] if donnees else df_final
+        if df_final.empty:
+            return pd.DataFrame(columns=COLONNES_RESULTATS)
+        df_final = df_final.drop_duplicates(subset=['Secteur/Indicateur', 'Valeur'])
+        return df_final.sort_values(['Secteur/Indicateur', 'Période']).reset_index(drop=True)
+
+    def resultats_detailles(self):
+        # Lignes retenues par filtrer_donnees_qualite, avec leur provenance (bloc, pages), avant la
+        # déduplication globale du tableau final : entrée de l'entrepôt d'indicateurs (historique.py).
+        # Les lignes des tableaux n'ont pas de bloc
+        lignes = [
+            {**ligne, "Bloc": None, "Page": numero, "Page fin": numero}
+            for numero in sorted(self.resultats_tableaux)
+            for ligne in self.resultats_tableaux[numero]
+        ]
+        lignes += dedupliquer_chevauchement(
+            [
+                {**ligne, "Bloc": index, "Page": page_debut, "Page fin": page_fin}
+                for ligne in self.resultats_blocs[index]
+            ]
+            for index, (page_debut, page_fin) in (
+                (index, self.pages_blocs[index] if index < len(self.pages_blocs) else (None, None))
+                for index in sorted(self.resultats_blocs)
+            )
+        )
+        return pd.DataFrame(self.filtrer_donnees_qualite(lignes), columns=COLONNES_RESULTATS + COLONNES_PROVENANCE)
+
+    def rapport_execution(self):
+        # Rapport structuré de l'analyse ; avec un planificateur partagé entre analyses simultanées,
+        # les requêtes et l'attente comptées incluent celles des autres analyses
+        self.rapport.terminer()
+        requetes, limitations, attente, transitoires = self._planificateur_initial
+        rapport = self.rapport.en_dict()
+        rapport["compteurs"].update(
+            blocs=self.nb_blocs,
+            blocs_ignores=self.nb_blocs_ignores,
+            blocs_regles=self.nb_blocs_regles,
+            blocs_repris=self.nb_blocs_repris,
+            blocs_echec=self.nb_blocs_echec,
+            indicateurs_bruts=len(self.tableau_final),
+            requetes_api=self.planificateur.nb_requetes - requetes,
+            limitations_taux=self.planificateur.nb_limitations - limitations,
+            erreurs_transitoires=self.planificateur.nb_erreurs_transitoires - transitoires,
+        )
+        # Estimation : un appel par quasi-doublon écarté, et un par budget de bloc de texte répété retiré
+        compteurs = rapport["compteurs"]
+        budget = self.rapport.reglages.get("budget_tokens", BUDGET_TOKENS_BLOC)
+        compteurs["appels_evites_repetitions"] = compteurs.get("blocs_quasi_doublons", 0) + round(
+            (compteurs.get("tokens_repetes", 0) + compteurs.get("tokens_phrases_repetees", 0)) / budget
+        )
+        rapport["attente_planificateur"] = round(self.planificateur.temps_attente - attente, 4)
+        return rapport
+
+    def analyser_document(self, pdf_bytes, budget_tokens=BUDGET_TOKENS_BLOC, seuil_preselection=SEUIL_PRESELECTION,
+                          max_workers=CONCURRENCE_PAR_DEFAUT, mode_lot=False, on_progress=None, on_bloc=None,
+                          annulation=None, on_page=None, reprise=None, pages=None,
+                          chevauchement_tokens=CHEVAUCHEMENT_TOKENS):
+        # Pipeline complet en flux, sans interface ; on_page() est appelé à chaque page lue.
+        # pages : numéros des seules pages à analyser (voir pertinence.carte_pertinence).
+        # chevauchement_tokens : dernières phrases d'un bloc reprises au début du suivant
+        pages = self.iter_pages(pdf_bytes, pages=pages)
+        if on_page is not None:
+            pages = _signaler_pages(pages, on_page)
+        blocs = self.preselectionner_blocs(self.iter_blocs(pages, budget_tokens, chevauchement_tokens), seuil_preselection)
+        self.analyser_blocs(
+            blocs, max_workers=max_workers, on_progress=on_progress, mode_lot=mode_lot, on_bloc=on_bloc,
+            annulation=annulation, reprise=reprise
+        )
+        return self.finaliser_resultats()
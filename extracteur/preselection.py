@@ -0,0 +1,38 @@
+import re
+
+from .lexique import INDICATEURS_PRIORITAIRES, MOTS_CLES_VALIDES
+
+SEUIL_PRESELECTION = 3.0
+
+_MOTS_CLES = re.compile('|'.join(
+    re.escape(mot) for mot in sorted(set(MOTS_CLES_VALIDES) | set(INDICATEURS_PRIORITAIRES), key=len, reverse=True)
+))
+_NOMBRE = re.compile(r'\d+(?:[,.]\d+)?')
+_ANNEE = re.compile(r'(?:19|20)\d{2}')
+_POURCENTAGE = re.compile(r'\d\s?%|\bpoints?\b|\bpb\b')
+_PERIODE = re.compile(
+    r'trimestre|semestre|annuel|mensuel|glissement|\b(?:19|20)\d{2}\b|\bT[1-4]\b|\bQ[1-4]\b'
+    r'|janvier|février|mars|avril|mai|juin|juillet|août|septembre|octobre|novembre|décembre',
+    re.IGNORECASE
+)
+
+
+def score_pertinence(bloc):
+    # Un indicateur exige une valeur chiffrée autre qu'une année : sinon le bloc est ignoré
+    valeurs = [nombre for nombre in _NOMBRE.findall(bloc) if not _ANNEE.fullmatch(nombre)]
+    if not valeurs:
+        return 0.0
+
+    texte = bloc.lower()
+    nb_mots = max(1, len(texte.split()))
+    pourcentages = min(1.5 * len(_POURCENTAGE.findall(texte)), 3.0)
+    periodes = min(len(_PERIODE.findall(bloc)), 2)
+    mots_cles = min(len(set(_MOTS_CLES.findall(texte))), 3)
+
+    # Sans unité ni période (sommaire, mentions légales), les mots-clés pèsent moitié moins
+    if not pourcentages and not periodes:
+        mots_cles /= 2
+
+    densite = min(10 * len(valeurs) / nb_mots, 1.0)
+    return densite + pourcentages + periodes + mots_cles
+
@@ -0,0 +1,121 @@
+import operator
+import re
+
+import numpy as np
+import pandas as pd
+
+from .pipeline import COLONNES_RESULTATS
+
+# Préfixes acceptés dans les requêtes (après normalisation) -> colonne du tableau
+ALIAS_COLONNES = {
+    "secteur": "Secteur/Indicateur",
+    "indicateur": "Secteur/Indicateur",
+    "valeur": "Valeur",
+    "periode": "Période",
+    "phrase": "Phrase",
+}
+
+_COMPARAISONS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge, "=": operator.eq}
+_TERME = re.compile(r'(\w+)(<=|>=|<|>|=|:)("[^"]*"|\S+)|"([^"]*)"|(\S+)')
+_INTERVALLE = re.compile(r'^(-?\d+(?:\.\d+)?)?\.\.(-?\d+(?:\.\d+)?)?$')
+
+
+def normaliser_texte(textes):
+    # Minuscules sans accents ni ligatures (œ, æ), apostrophes unifiées : « Économie » == « economie »
+    return (
+        textes.astype(str)
+        .str.lower()
+        .str.replace("œ", "oe", regex=False)
+        .str.replace("æ", "ae", regex=False)
+        .str.replace("’", "'", regex=False)
+        .str.normalize("NFKD")
+        .str.encode("ascii", "ignore")
+        .str.decode("ascii")
+    )
+
+
+def _normaliser(terme):
+    return normaliser_texte(pd.Series([terme])).iloc[0]
+
+
+def valeur_numerique(valeurs):
+    # Premier nombre de la valeur (« -0,5 pb » -> -0.5), NaN si aucun
+    nombres = (
+        valeurs.astype(str)
+        .str.replace("−", "-", regex=False)
+        .str.extract(r"([+-]?\s?\d+(?:[.,]\d+)?)", expand=False)
+        .str.replace(r"\s", "", regex=True)
+        .str.replace(",", ".", regex=False)
+    )
+    return pd.to_numeric(nombres, errors="coerce").to_numpy(dtype=float)
+
+
+def _nombre(texte):
+    return float(texte.replace(",", "."))
+
+
+class IndexRecherche:
+    # Construit une fois par jeu de résultats : chaque colonne est encodée par dictionnaire
+    # (valeurs distinctes normalisées + code par ligne), la recherche porte sur les valeurs distinctes
+    def __init__(self, df):
+        self.df = df
+        self.nb_lignes = len(df)
+        self.colonnes = [colonne for colonne in COLONNES_RESULTATS if colonne in df.columns]
+        self._index = {}
+        for colonne in self.colonnes:
+            codes, distinctes = pd.factorize(df[colonne].fillna("").astype(str))
+            self._index[colonne] = (normaliser_texte(pd.Series(distinctes, dtype=object)), codes)
+        self.valeurs = valeur_numerique(df["Valeur"]) if "Valeur" in df.columns else np.full(len(df), np.nan)
+
+    def _masque_terme(self, terme, colonnes):
+        # Sous-chaîne insensible aux accents, comme l'ancienne recherche sur la ligne entière
+        terme = _normaliser(terme).strip()
+        masque = np.zeros(self.nb_lignes, dtype=bool)
+        if not terme:
+            return ~masque
+        for colonne in colonnes:
+            distinctes, codes = self._index[colonne]
+            retenues = distinctes.str.contains(terme, regex=False).to_numpy(dtype=bool)
+            masque |= retenues[codes]
+        return masque
+
+    def _masque_valeur(self, operateur, argument):
+        intervalle = _INTERVALLE.match(argument.replace(",", "."))
+        if operateur == ":" and intervalle:
+            masque = ~np.isnan(self.valeurs)
+            minimum, maximum = intervalle.groups()
+            if minimum is not None:
+                masque &= self.valeurs >= float(minimum)
+            if maximum is not None:
+                masque &= self.valeurs <= float(maximum)
+            return masque
+        if operateur in _COMPARAISONS:
+            with np.errstate(invalid="ignore"):
+                return _COMPARAISONS[operateur](self.valeurs, _nombre(argument))
+        return None
+
+    def masque(self, requete):
+        # Termes combinés par ET : « pib 2023 », « periode:T1 », « valeur>=2.5 », « valeur:1..3 », « "taux directeur" »
+        masque = np.ones(self.nb_lignes, dtype=bool)
+        for champ, operateur, argument, expression, mot in _TERME.findall(requete):
+            colonne = ALIAS_COLONNES.get(_normaliser(champ)) if champ else None
+            if colonne is None:
+                terme = expression or mot or f"{champ}{operateur}{argument}"
+                masque &= self._masque_terme(terme, self.colonnes)
+                continue
+            argument = argument.strip('"')
+            if colonne == "Valeur":
+                try:
+                    masque_valeur = self._masque_valeur(operateur, argument)
+                except ValueError:
+                    masque_valeur = None
+                if masque_valeur is not None:
+                    masque &= masque_valeur
+                    continue
+            masque &= self._masque_terme(argument, [colonne])
+        return masque
+
+    def rechercher(self, requete):
+        if not requete.strip():
+            return self.df
+        return self.df[self.masque(requete)]
@@ -0,0 +1,176 @@
+import re
+
+from .decoupage import iter_phrases
+
+MODE_LLM = "llm"
+MODE_REGLES = "regles"
+MODE_HYBRIDE = "hybride"
+
+# Lexique : expression rencontrée dans la phrase -> libellé de l'indicateur
+LEXIQUE_INDICATEURS = {
+    "taux directeur": "Taux directeur",
+    "inflation sous-jacente": "Inflation sous-jacente",
+    "inflation": "Inflation",
+    "indice des prix à la consommation": "Inflation",
+    "produit intérieur brut": "PIB",
+    "pib": "PIB",
+    "croissance économique": "Croissance économique",
+    "valeur ajoutée agricole": "Agriculture",
+    "activités agricoles": "Agriculture",
+    "secteur agricole": "Agriculture",
+    "agriculture": "Agriculture",
+    "activités non agricoles": "Activités non agricoles",
+    "industrie manufacturière": "Industrie manufacturière",
+    "industries manufacturières": "Industrie manufacturière",
+    "industrie": "Industrie",
+    "bâtiment et travaux publics": "Construction",
+    "construction": "Construction",
+    "services": "Services",
+    "exportations": "Exportations",
+    "importations": "Importations",
+    "déficit budgétaire": "Déficit budgétaire",
+    "déficit commercial": "Déficit commercial",
+    "excédent budgétaire": "Excédent budgétaire",
+    "masse monétaire": "Masse monétaire",
+    "crédit bancaire": "Crédit bancaire",
+    "masi": "Indice MASI",
+    "taux de change": "Taux de change",
+    "investissement": "Investissement",
+    "consommation des ménages": "Consommation des ménages",
+    "chômage": "Taux de chômage",
+}
+
+_LEXIQUE = re.compile(
+    r"\b(" + "|".join(re.escape(terme) for terme in sorted(LEXIQUE_INDICATEURS, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE
+)
+
+_VALEUR = re.compile(
+    r"(?<![\w,.])([+\-−]?\s?\d+(?:[,.]\d+)?)\s?"
+    r"(%|pour\s?cent|points?\s+de\s+pourcentage|points?\s+de\s+base|points?|pb|pts?)(?!\w)",
+    re.IGNORECASE
+)
+
+_VERBES = re.compile(
+    r"\b(?:progress|augment|cr[uû]|recul|baiss|diminu|atteint|accélér|ralenti|décélér|rebond|contract|"
+    r"gagn|perdu|amélior|dégrad|creus|allég|enregistr|affich|établi|situ|chiffr|élev|ressort|"
+    r"maintenu|fix|relev|abaiss|rédui|pass|estim|évalu|prév|"
+    r"se\s+situe|s'établi|s'élève|s'élèvent|"
+    r"en\s+(?:hausse|baisse|progression|repli|recul|augmentation|diminution|accélération|ralentissement))\w*",
+    re.IGNORECASE
+)
+
+# Variation à la baisse : « a reculé de 3,4 % », « en baisse de 0,5 point », « abaissé son taux de 25 pb »
+_BAISSE = re.compile(
+    r"(?:recul|baiss|diminu|contract|perdu|repli|chut|fléchi|dégrad|abaiss|rédui|régress)\w*"
+    r"(?:\s+[\w'’]+){0,4}?\s+de\s*$",
+    re.IGNORECASE
+)
+
+# Nombre quelconque (montant, indice, cours) ; les années et les dates ne sont pas des valeurs
+_NOMBRE = re.compile(r"(?<![\w,.])\d+(?:[ \u00a0\u202f]\d{3})*(?:[,.]\d+)?(?!\w)")
+_DATE = re.compile(
+    r"\s*(?:janvier|février|mars|avril|mai|juin|juillet|août|septembre|octobre|novembre|décembre)\b",
+    re.IGNORECASE
+)
+
+_ORDINAUX = {"premier": "T1", "1er": "T1", "deuxième": "T2", "second": "T2", "troisième": "T3", "quatrième": "T4"}
+
+_PERIODE_TRIMESTRE = re.compile(
+    r"\b(premier|1er|deuxième|second|troisième|quatrième)\s+trimestre(?:\s+(?:de\s+l'année\s+)?((?:19|20)\d{2}))?",
+    re.IGNORECASE
+)
+_PERIODE_COURTE = re.compile(r"\b([TQ][1-4])\s*[-/ ]?\s*((?:19|20)\d{2})\b", re.IGNORECASE)
+_PERIODE_MOIS = re.compile(
+    r"\b((?:fin\s+)?(?:janvier|février|mars|avril|mai|juin|juillet|août|septembre|octobre|novembre|décembre))"
+    r"\s+((?:19|20)\d{2})\b",
+    re.IGNORECASE
+)
+_ANNEE = re.compile(r"\b((?:19|20)\d{2})\b")
+
+
+def normaliser_periode(phrase):
+    match = _PERIODE_TRIMESTRE.search(phrase)
+    if match:
+        trimestre = _ORDINAUX[match.group(1).lower()]
+        annee = match.group(2)
+        if not annee:
+            match_annee = _ANNEE.search(phrase)
+            annee = match_annee.group(1) if match_annee else ""
+        return f"{trimestre} {annee}".strip()
+    match = _PERIODE_COURTE.search(phrase)
+    if match:
+        return f"T{match.group(1)[1]} {match.group(2)}"
+    match = _PERIODE_MOIS.search(phrase)
+    if match:
+        return f"{match.group(1).capitalize()} {match.group(2)}"
+    match = _ANNEE.search(phrase)
+    if match:
+        return match.group(1)
+    return ""
+
+
+def _normaliser_valeur(nombre, unite, baisse=False):
+    nombre = re.sub(r"\s", "", nombre).replace("−", "-")
+    if baisse and nombre[0] not in "+-":
+        nombre = f"-{nombre}"
+    unite = unite.lower()
+    if unite.startswith("%") or unite.startswith("pour"):
+        return f"{nombre}%"
+    if unite.startswith("pb") or "base" in unite:
+        return f"{nombre} pb"
+    return f"{nombre} points"
+
+
+def _nombres_non_classes(phrase, valeurs):
+    # Nombres hors des valeurs reconnues (avec unité), hors années et dates :
+    # « 312,5 milliards de dirhams », « taux de change ... 10,8 »
+    couverts = [valeur.span() for valeur in valeurs]
+    for nombre in _NOMBRE.finditer(phrase):
+        if _ANNEE.fullmatch(nombre.group()) or _DATE.match(phrase, nombre.end()):
+            continue
+        if not any(debut <= nombre.start() < fin for debut, fin in couverts):
+            return True
+    return False
+
+
+def extraire_indicateurs(bloc):
+    # Renvoie les lignes reconnues et un drapeau indiquant des valeurs chiffrées non classées :
+    # en mode hybride, un bloc ambigu est confié au LLM
+    lignes = []
+    ambigu = False
+    for phrase in iter_phrases([bloc]):
+        valeurs = list(_VALEUR.finditer(phrase))
+        if _nombres_non_classes(phrase, valeurs):
+            ambigu = True
+        if not valeurs:
+            continue
+        termes = list(_LEXIQUE.finditer(phrase))
+        verbe = _VERBES.search(phrase)
+        if not termes or not verbe:
+            ambigu = True
+            continue
+        periode = normaliser_periode(phrase)
+        fin_precedente = 0
+        for valeur in valeurs:
+            # Sens de la variation : verbe de baisse entre la valeur précédente et celle-ci
+            baisse = bool(_BAISSE.search(phrase[fin_precedente:valeur.start()]))
+            fin_precedente = valeur.end()
+            # Indicateur le plus proche précédant la valeur (sinon le premier de la phrase)
+            precedents = [terme for terme in termes if terme.start() < valeur.start()]
+            terme = precedents[-1] if precedents else termes[0]
+            lignes.append({
+                "Secteur/Indicateur": LEXIQUE_INDICATEURS[terme.group(1).lower()],
+                "Valeur": _normaliser_valeur(valeur.group(1), valeur.group(2), baisse),
+                "Période": periode,
+                "Phrase": phrase.strip(),
+            })
+    return lignes, ambigu
+
+
+def formater_reponse(lignes):
+    # Même format que la réponse du LLM, pour passer par analyser_texte_economique
+    return "\n".join(
+        f"{ligne['Secteur/Indicateur']}|{ligne['Valeur']}|{ligne['Période']}|{ligne['Phrase'].replace('|', ' ')}"
+        for ligne in lignes
+    )
@@ -0,0 +1,169 @@
+import re
+import zlib
+from collections import Counter, defaultdict
+
+import numpy as np
+
+# En-têtes et pieds de page : lignes situées dans les marges haute et basse de la page
+# (part de la hauteur) et répétées sur au moins FREQUENCE_EN_TETE des pages échantillonnées
+MARGE_EN_TETE = 0.1
+FREQUENCE_EN_TETE = 0.5
+PAGES_MIN_EN_TETE = 3
+PAGES_ECHANTILLON = 50
+
+# Phrases répétées à l'identique (encadrés, avertissements, résumé repris dans le corps) : retirées
+# avant le découpage en blocs, quelle que soit leur position ; les fragments courts sont conservés
+MOTS_MIN_PHRASE_REPETEE = 6
+
+# Quasi-doublons : similarité de Jaccard estimée entre les ensembles de shingles de deux blocs
+SEUIL_QUASI_DOUBLON = 0.85
+TAILLE_SHINGLE = 5
+NB_BANDES = 16
+LIGNES_PAR_BANDE = 4
+
+_CHIFFRES = re.compile(r"\d+")
+_NOMBRE = re.compile(r"\d+(?:[,.]\d+)?")
+_PREMIER = (1 << 31) - 1
+# Permutations fixes : un même PDF donne toujours les mêmes blocs, donc les mêmes index (points de reprise)
+_aleatoire = np.random.default_rng(20240601)
+_A = _aleatoire.integers(1, _PREMIER, NB_BANDES * LIGNES_PAR_BANDE, dtype=np.int64)
+_B = _aleatoire.integers(0, _PREMIER, NB_BANDES * LIGNES_PAR_BANDE, dtype=np.int64)
+
+
+def signature_ligne(ligne):
+    # « Page 12 / 40 » et « Page 13 / 40 » ont la même signature
+    return " ".join(_CHIFFRES.sub("#", ligne.lower()).split())
+
+
+def _zone(bloc, hauteur):
+    x0, y0, x1, y1 = bloc[:4]
+    if y1 <= hauteur * MARGE_EN_TETE:
+        return "haut"
+    if y0 >= hauteur * (1 - MARGE_EN_TETE):
+        return "bas"
+    return None
+
+
+def _lignes_marges(page):
+    # (zone, signature, ligne) de chaque ligne de texte des marges haute et basse
+    hauteur = page.rect.height
+    for bloc in page.get_text("blocks"):
+        zone = _zone(bloc, hauteur) if bloc[6] == 0 else None
+        if zone is None:
+            continue
+        for ligne in bloc[4].splitlines():
+            signature = signature_ligne(ligne)
+            if signature:
+                yield zone, signature, ligne
+
+
+def detecter_en_tetes(document, nb_echantillon=PAGES_ECHANTILLON):
+    # Signatures des lignes répétées dans les marges, sur un échantillon de pages réparties dans le document
+    nb_pages = document.page_count
+    if nb_pages < PAGES_MIN_EN_TETE:
+        return frozenset()
+    pas = max(1, nb_pages / nb_echantillon)
+    numeros = sorted({int(i * pas) for i in range(min(nb_pages, nb_echantillon))})
+    occurrences = Counter()
+    for numero in numeros:
+        occurrences.update({(zone, signature) for zone, signature, _ in _lignes_marges(document[numero])})
+    minimum = max(PAGES_MIN_EN_TETE, FREQUENCE_EN_TETE * len(numeros))
+    return frozenset(cle for cle, nombre in occurrences.items() if nombre >= minimum)
+
+
+def _dans_zones(bloc, zones):
+    # Bloc de texte situé au moins pour moitié dans l'une des zones (x0, y0, x1, y1)
+    x0, y0, x1, y1 = bloc[:4]
+    surface = max((x1 - x0) * (y1 - y0), 1e-6)
+    for zx0, zy0, zx1, zy1 in zones:
+        largeur = min(x1, zx1) - max(x0, zx0)
+        hauteur = min(y1, zy1) - max(y0, zy0)
+        if largeur > 0 and hauteur > 0 and largeur * hauteur >= surface / 2:
+            return True
+    return False
+
+
+def texte_page(page, en_tetes=frozenset(), zones_exclues=()):
+    # Texte de la page (identique à page.get_text()) sans les en-têtes et pieds de page détectés ni les
+    # zones exclues (tableaux extraits localement) ; renvoie aussi les lignes d'en-tête retirées.
+    # Une ligne identique à un en-tête dans le corps de la page est conservée
+    if not en_tetes and not zones_exclues:
+        return page.get_text(), []
+    hauteur = page.rect.height
+    morceaux = []
+    retirees = []
+    for bloc in page.get_text("blocks"):
+        if bloc[6] != 0 or _dans_zones(bloc, zones_exclues):
+            continue
+        zone = _zone(bloc, hauteur)
+        if zone is None:
+            morceaux.append(bloc[4])
+            continue
+        conservees = []
+        for ligne in bloc[4].splitlines(keepends=True):
+            if (zone, signature_ligne(ligne)) in en_tetes:
+                retirees.append(ligne.strip())
+            else:
+                conservees.append(ligne)
+        morceaux.append("".join(conservees))
+    return "".join(morceaux), retirees
+
+
+def iter_phrases_uniques(phrases, on_repetition=None):
+    # on_repetition(phrase) est appelé pour chaque phrase déjà vue dans le document
+    vues = set()
+    for phrase in phrases:
+        mots = phrase.lower().split()
+        if len(mots) >= MOTS_MIN_PHRASE_REPETEE:
+            cle = " ".join(mots)
+            if cle in vues:
+                if on_repetition is not None:
+                    on_repetition(phrase)
+                continue
+            vues.add(cle)
+        yield phrase
+
+
+def _shingles(texte, taille=TAILLE_SHINGLE):
+    mots = texte.lower().split()
+    if len(mots) <= taille:
+        return {" ".join(mots)}
+    return {" ".join(mots[i:i + taille]) for i in range(len(mots) - taille + 1)}
+
+
+def signature_minhash(texte):
+    empreintes = np.fromiter(
+        (zlib.crc32(shingle.encode("utf-8")) % _PREMIER for shingle in _shingles(texte)), dtype=np.int64
+    )
+    return ((_A[:, None] * empreintes[None, :] + _B[:, None]) % _PREMIER).min(axis=1)
+
+
+class FiltreQuasiDoublons:
+    # Blocs dont le contenu a déjà été vu dans le document (encadrés, avertissements, résumés répétés) :
+    # MinHash sur des shingles de mots, candidats trouvés par LSH (bandes de la signature)
+    def __init__(self, seuil=SEUIL_QUASI_DOUBLON):
+        self.seuil = seuil
+        self._signatures = []
+        self._nombres = []
+        self._bandes = defaultdict(list)
+
+    def est_doublon(self, bloc):
+        # Un bloc n'est écarté que s'il n'apporte aucun chiffre absent du bloc déjà vu :
+        # une mise à jour d'une seule valeur dans un paragraphe répété est conservée
+        signature = signature_minhash(bloc)
+        nombres = set(_NOMBRE.findall(bloc))
+        cles = [
+            (bande, signature[bande * LIGNES_PAR_BANDE:(bande + 1) * LIGNES_PAR_BANDE].tobytes())
+            for bande in range(NB_BANDES)
+        ]
+        candidats = {indice for cle in cles for indice in self._bandes.get(cle, ())}
+        for indice in sorted(candidats):
+            if (np.mean(signature == self._signatures[indice]) >= self.seuil
+                    and nombres <= self._nombres[indice]):
+                return True
+        indice = len(self._signatures)
+        self._signatures.append(signature)
+        self._nombres.append(nombres)
+        for cle in cles:
+            self._bandes[cle].append(indice)
+        return False
@@ -0,0 +1,416 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+from .backends import BACKEND_FAUX, BACKEND_GROQ, BACKEND_OPENAI, NOMS_BACKENDS
+from .cache import REPERTOIRE_CACHE, LLMResponseCache, empreinte_document
+from .decoupage import BUDGET_TOKENS_BLOC, CHEVAUCHEMENT_TOKENS
+from .export import FORMATS_EXPORT, exporter
+from .limitation import planificateur_backend
+from .mesures import MetriquesPrometheus, journaliser_rapport
+from .pdf import compter_pages
+from .pertinence import lire_plages
+from .pipeline import COLONNES_RESULTATS, CONCURRENCE_PAR_DEFAUT, PDFEconomicExtractor
+from .preselection import SEUIL_PRESELECTION
+from .regles import MODE_HYBRIDE, MODE_LLM, MODE_REGLES
+
+logger = logging.getLogger("extracteur.service")
+
+STATUT_EN_ATTENTE = "en_attente"
+STATUT_EN_COURS = "en_cours"
+STATUT_TERMINE = "termine"
+STATUT_ECHEC = "echec"
+
+OPTIONS_PAR_DEFAUT = {
+    "mode": MODE_LLM,
+    "budget_tokens": BUDGET_TOKENS_BLOC,
+    "chevauchement_tokens": CHEVAUCHEMENT_TOKENS,
+    "seuil_preselection": SEUIL_PRESELECTION,
+    "mode_lot": True,
+    "concurrence": CONCURRENCE_PAR_DEFAUT,
+    "pages": None,
+}
+
+
+class JobStore:
+    # File de travaux persistante : survit aux redémarrages du service
+    def __init__(self, repertoire=None):
+        self.repertoire = Path(repertoire) if repertoire else REPERTOIRE_CACHE / "service"
+        (self.repertoire / "pdfs").mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.repertoire / "jobs.sqlite3"), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                nom TEXT,
+                statut TEXT NOT NULL,
+                options TEXT NOT NULL,
+                termines INTEGER NOT NULL DEFAULT 0,
+                total INTEGER NOT NULL DEFAULT 0,
+                resultat TEXT,
+                erreur TEXT,
+                cree_le REAL NOT NULL,
+                debut REAL,
+                fin REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_statut ON jobs(statut, cree_le);
+            CREATE TABLE IF NOT EXISTS lignes_partielles (
+                job_id TEXT NOT NULL,
+                index_bloc INTEGER NOT NULL,
+                lignes TEXT NOT NULL,
+                PRIMARY KEY (job_id, index_bloc)
+            );
+        """)
+        self._conn.commit()
+
+    def chemin_pdf(self, job_id):
+        return self.repertoire / "pdfs" / f"{job_id}.pdf"
+
+    def creer(self, pdf_bytes, nom, options):
+        job_id = uuid.uuid4().hex
+        self.chemin_pdf(job_id).write_bytes(pdf_bytes)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, nom, statut, options, cree_le) VALUES (?, ?, ?, ?, ?)",
+                (job_id, nom, STATUT_EN_ATTENTE, json.dumps({**OPTIONS_PAR_DEFAUT, **options}), time.time())
+            )
+            self._conn.commit()
+        return job_id
+
+    def reprendre_interrompus(self):
+        # Travaux coupés par un arrêt du service : remis en file, résultats partiels effacés
+        with self._lock:
+            ids = [ligne["id"] for ligne in self._conn.execute(
+                "SELECT id FROM jobs WHERE statut = ?", (STATUT_EN_COURS,)
+            )]
+            self._conn.executemany("DELETE FROM lignes_partielles WHERE job_id = ?", [(i,) for i in ids])
+            self._conn.execute(
+                "UPDATE jobs SET statut = ?, termines = 0, total = 0, debut = NULL WHERE statut = ?",
+                (STATUT_EN_ATTENTE, STATUT_EN_COURS)
+            )
+            self._conn.commit()
+        return len(ids)
+
+    def reserver_suivant(self):
+        with self._lock:
+            ligne = self._conn.execute(
+                "SELECT * FROM jobs WHERE statut = ? ORDER BY cree_le LIMIT 1", (STATUT_EN_ATTENTE,)
+            ).fetchone()
+            if ligne is None:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET statut = ?, debut = ? WHERE id = ?", (STATUT_EN_COURS, time.time(), ligne["id"])
+            )
+            self._conn.commit()
+        return {**dict(ligne), "options": json.loads(ligne["options"])}
+
+    def progression(self, job_id, termines, total):
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET termines = ?, total = ? WHERE id = ?", (termines, total, job_id))
+            self._conn.commit()
+
+    def ajouter_lignes(self, job_id, index_bloc, lignes):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO lignes_partielles (job_id, index_bloc, lignes) VALUES (?, ?, ?)",
+                (job_id, index_bloc, json.dumps(lignes, ensure_ascii=False))
+            )
+            self._conn.commit()
+
+    def terminer(self, job_id, lignes):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET statut = ?, resultat = ?, fin = ? WHERE id = ?",
+                (STATUT_TERMINE, json.dumps(lignes, ensure_ascii=False), time.time(), job_id)
+            )
+            self._conn.commit()
+
+    def echouer(self, job_id, erreur):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET statut = ?, erreur = ?, fin = ? WHERE id = ?",
+                (STATUT_ECHEC, erreur, time.time(), job_id)
+            )
+            self._conn.commit()
+
+    def get(self, job_id):
+        with self._lock:
+            ligne = self._conn.execute(
+                "SELECT id, nom, statut, termines, total, erreur, cree_le, debut, fin FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+            if ligne is None:
+                return None
+            nb_lignes = self._conn.execute(
+                "SELECT COUNT(*) FROM lignes_partielles WHERE job_id = ?", (job_id,)
+            ).fetchone()[0]
+        job = {**dict(ligne), "blocs_analyses": nb_lignes}
+        if job["statut"] == STATUT_TERMINE and self.chemin_pdf(job_id).exists():
+            # Même clé qu'une analyse locale : le client ingère le résultat dans son entrepôt d'indicateurs
+            job["empreinte"] = empreinte_document(self.chemin_pdf(job_id).read_bytes())
+        return job
+
+    def compter_par_statut(self):
+        with self._lock:
+            return dict(self._conn.execute("SELECT statut, COUNT(*) FROM jobs GROUP BY statut").fetchall())
+
+    def lister(self, limite=100):
+        with self._lock:
+            return [dict(ligne) for ligne in self._conn.execute(
+                "SELECT id, nom, statut, termines, total, cree_le, fin FROM jobs ORDER BY cree_le DESC LIMIT ?",
+                (limite,)
+            )]
+
+    def lignes_partielles(self, job_id):
+        with self._lock:
+            lignes = self._conn.execute(
+                "SELECT lignes FROM lignes_partielles WHERE job_id = ? ORDER BY index_bloc", (job_id,)
+            ).fetchall()
+        return [donnee for (contenu,) in lignes for donnee in json.loads(contenu)]
+
+    def resultat(self, job_id):
+        with self._lock:
+            ligne = self._conn.execute("SELECT resultat FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(ligne[0]) if ligne and ligne[0] else None
+
+
+class ExtractionService:
+    def __init__(self, store, nb_workers=2, api_key="", faux_llm=False, backend=BACKEND_GROQ, base_url=None,
+                 modele=None, requetes_par_minute=None, tokens_par_minute=None):
+        self.store = store
+        self.nb_workers = nb_workers
+        self.api_key = api_key
+        self.faux_llm = faux_llm
+        self.backend = BACKEND_FAUX if faux_llm else backend
+        self.base_url = base_url
+        self.modele = modele
+        # Planificateur et cache partagés par tous les travaux du service : quotas du backend (aucun pour
+        # un serveur local ou le client simulé), pas de réponses factices dans le cache des vraies réponses
+        self.planificateur = planificateur_backend(self.backend, requetes_par_minute, tokens_par_minute)
+        self.cache = None if faux_llm else LLMResponseCache()
+        self.metriques = MetriquesPrometheus()
+        self._boucle = None
+        self._nouveau_job = None
+
+    def soumettre(self, pdf_bytes, nom, options):
+        job_id = self.store.creer(pdf_bytes, nom, options)
+        if self._boucle is not None:
+            self._boucle.call_soon_threadsafe(self._nouveau_job.set)
+        return job_id
+
+    def _traiter(self, job):
+        job_id = job["id"]
+        options = job["options"]
+        try:
+            extractor = PDFEconomicExtractor(
+                self.api_key,
+                planificateur=self.planificateur,
+                cache=self.cache,
+                mode=options["mode"],
+                backend=self.backend,
+                base_url=self.base_url,
+                modele=self.modele
+            )
+            df = extractor.analyser_document(
+                self.store.chemin_pdf(job_id).read_bytes(),
+                budget_tokens=options["budget_tokens"],
+                chevauchement_tokens=options.get("chevauchement_tokens", CHEVAUCHEMENT_TOKENS),
+                seuil_preselection=options["seuil_preselection"],
+                max_workers=options["concurrence"],
+                mode_lot=options["mode_lot"],
+                pages=options.get("pages"),
+                on_progress=lambda termines, total: self.store.progression(job_id, termines, total),
+                on_bloc=lambda index, lignes: self.store.ajouter_lignes(job_id, index, lignes)
+            )
+            self.store.terminer(job_id, df.to_dict("records"))
+            logger.info("Travail %s terminé : %d indicateurs", job_id, len(df))
+            rapport = extractor.rapport_execution()
+            self.metriques.ajouter(rapport)
+            journaliser_rapport(rapport, job=job_id, document=job["nom"])
+        except Exception as e:
+            logger.exception("Travail %s en échec", job_id)
+            self.store.echouer(job_id, str(e))
+
+    async def _worker(self):
+        while True:
+            job = self.store.reserver_suivant()
+            if job is None:
+                self._nouveau_job.clear()
+                try:
+                    await asyncio.wait_for(self._nouveau_job.wait(), timeout=5)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await asyncio.to_thread(self._traiter, job)
+
+    async def executer(self, hote="127.0.0.1", port=8502):
+        self._boucle = asyncio.get_running_loop()
+        self._nouveau_job = asyncio.Event()
+        repris = self.store.reprendre_interrompus()
+        if repris:
+            logger.info("%d travaux interrompus remis en file", repris)
+
+        serveur = ThreadingHTTPServer((hote, port), _fabriquer_handler(self))
+        logger.info("Service d'extraction sur http://%s:%d (%d workers)", hote, port, self.nb_workers)
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.nb_workers)]
+        try:
+            await asyncio.to_thread(serveur.serve_forever)
+        finally:
+            serveur.shutdown()
+            serveur.server_close()
+            for worker in workers:
+                worker.cancel()
+
+
+def _fabriquer_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def _repondre(self, code, contenu, type_contenu="application/json"):
+            if type_contenu == "application/json":
+                contenu = json.dumps(contenu, ensure_ascii=False).encode("utf-8")
+            if type_contenu == "application/json" or type_contenu.startswith("text/"):
+                type_contenu = f"{type_contenu}; charset=utf-8"
+            self.send_response(code)
+            self.send_header("Content-Type", type_contenu)
+            self.send_header("Content-Length", str(len(contenu)))
+            self.end_headers()
+            self.wfile.write(contenu)
+
+        def log_message(self, format, *args):
+            logger.debug(format, *args)
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path != "/jobs":
+                return self._repondre(404, {"erreur": "Ressource inconnue"})
+            longueur = int(self.headers.get("Content-Length", 0))
+            pdf_bytes = self.rfile.read(longueur)
+            if not pdf_bytes.startswith(b"%PDF"):
+                return self._repondre(400, {"erreur": "Le corps de la requête doit être un fichier PDF"})
+            parametres = {cle: valeurs[0] for cle, valeurs in parse_qs(url.query).items()}
+            try:
+                options = _lire_options(parametres)
+                if "pages" in options:
+                    # « 1-20,45 » : plages vérifiées dès la soumission, sur le nombre de pages du PDF
+                    options["pages"] = lire_plages(options["pages"], compter_pages(pdf_bytes))
+            except ValueError as e:
+                return self._repondre(400, {"erreur": str(e)})
+            job_id = service.soumettre(pdf_bytes, parametres.get("nom", "document.pdf"), options)
+            self._repondre(202, {"id": job_id, "statut": STATUT_EN_ATTENTE})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            morceaux = [morceau for morceau in url.path.split("/") if morceau]
+            if morceaux == ["sante"]:
+                return self._repondre(200, {"statut": "ok"})
+            if morceaux == ["jobs"]:
+                return self._repondre(200, service.store.lister())
+            if morceaux == ["metrics"]:
+                par_statut = service.store.compter_par_statut()
+                statuts = (STATUT_EN_ATTENTE, STATUT_EN_COURS, STATUT_TERMINE, STATUT_ECHEC)
+                texte = service.metriques.texte({
+                    "extracteur_travaux": (
+                        "Travaux par statut", [({"statut": statut}, par_statut.get(statut, 0)) for statut in statuts]
+                    )
+                })
+                return self._repondre(200, texte.encode("utf-8"), "text/plain; version=0.0.4")
+            if len(morceaux) < 2 or morceaux[0] != "jobs":
+                return self._repondre(404, {"erreur": "Ressource inconnue"})
+
+            job = service.store.get(morceaux[1])
+            if job is None:
+                return self._repondre(404, {"erreur": "Travail inconnu"})
+            if len(morceaux) == 2:
+                return self._repondre(200, job)
+            if morceaux[2] == "resultats":
+                # Lignes déjà extraites, avant filtrage qualité final
+                return self._repondre(200, {**job, "lignes": service.store.lignes_partielles(job["id"])})
+            if morceaux[2] == "sortie":
+                if job["statut"] != STATUT_TERMINE:
+                    return self._repondre(409, {"erreur": "Travail non terminé", "statut": job["statut"]})
+                lignes = service.store.resultat(job["id"])
+                format_export = parse_qs(url.query).get("format", ["json"])[0]
+                if format_export in FORMATS_EXPORT:
+                    try:
+                        fichier = exporter(pd.DataFrame(lignes, columns=COLONNES_RESULTATS), format_export)
+                    except ImportError as e:
+                        return self._repondre(501, {"erreur": str(e)})
+                    with fichier:
+                        return self._repondre(200, fichier.read(), FORMATS_EXPORT[format_export][1])
+                return self._repondre(200, lignes)
+            return self._repondre(404, {"erreur": "Ressource inconnue"})
+
+    return Handler
+
+
+def _lire_options(parametres):
+    options = {}
+    if "mode" in parametres:
+        if parametres["mode"] not in (MODE_LLM, MODE_HYBRIDE, MODE_REGLES):
+            raise ValueError(f"Mode inconnu : {parametres['mode']}")
+        options["mode"] = parametres["mode"]
+    if "budget_tokens" in parametres:
+        options["budget_tokens"] = int(parametres["budget_tokens"])
+    if "chevauchement_tokens" in parametres:
+        options["chevauchement_tokens"] = max(0, int(parametres["chevauchement_tokens"]))
+    if "seuil_preselection" in parametres:
+        options["seuil_preselection"] = float(parametres["seuil_preselection"])
+    if "mode_lot" in parametres:
+        options["mode_lot"] = parametres["mode_lot"] not in ("0", "false", "non")
+    if "concurrence" in parametres:
+        options["concurrence"] = max(1, int(parametres["concurrence"]))
+    if parametres.get("pages"):
+        options["pages"] = parametres["pages"]
+    return options
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m extracteur.service",
+        description="Service HTTP d'extraction asynchrone (file de travaux persistante)."
+    )
+    parser.add_argument("--hote", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--workers", type=int, default=2, help="Nombre de documents traités simultanément")
+    parser.add_argument("--repertoire", default=None, help="Répertoire de la file de travaux")
+    parser.add_argument("--faux-llm", action="store_true", help="Client LLM simulé, sans appel réseau")
+    parser.add_argument("--backend", choices=list(NOMS_BACKENDS), default=BACKEND_GROQ,
+                        help="API LLM : Groq, serveur compatible OpenAI ou client simulé")
+    parser.add_argument("--url-llm", default=None, help="URL de base de l'API (serveur compatible OpenAI)")
+    parser.add_argument("--modele", default=None,
+                        help="Modèle demandé à l'API (défaut : modèle Groq ; obligatoire avec --backend openai)")
+    parser.add_argument("--rpm", type=int, default=None,
+                        help="Quota de requêtes par minute de l'API (défaut : 30 pour Groq, illimité sinon ; 0 : illimité)")
+    parser.add_argument("--tpm", type=int, default=None,
+                        help="Quota de tokens par minute de l'API (défaut : 12000 pour Groq, illimité sinon ; 0 : illimité)")
+    parser.add_argument("--api-key", default=os.environ.get("GROQ_API_KEY", ""))
+    args = parser.parse_args(argv)
+    if args.backend == BACKEND_OPENAI and not args.faux_llm and not args.modele:
+        parser.error("--modele est obligatoire avec --backend openai")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    service = ExtractionService(
+        JobStore(args.repertoire), nb_workers=max(1, args.workers), api_key=args.api_key,
+        faux_llm=args.faux_llm or args.backend == BACKEND_FAUX, backend=args.backend, base_url=args.url_llm,
+        modele=args.modele, requetes_par_minute=args.rpm, tokens_par_minute=args.tpm
+    )
+    try:
+        asyncio.run(service.executer(args.hote, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
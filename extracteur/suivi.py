@@ -0,0 +1,119 @@
+import threading
+import time
+
+import pandas as pd
+
+from .decoupage import BUDGET_TOKENS_BLOC, CHEVAUCHEMENT_TOKENS
+from .pdf import compter_pages
+from .pipeline import COLONNES_RESULTATS, CONCURRENCE_PAR_DEFAUT
+from .preselection import SEUIL_PRESELECTION
+
+
+class AnalyseEnCours:
+    # Analyse exécutée dans un thread : l'interface lit à chaque rafraîchissement les lignes déjà extraites,
+    # la progression et le temps restant estimé, et peut l'annuler sans perdre ce qui est acquis
+    def __init__(self, extractor, pdf_bytes, budget_tokens=BUDGET_TOKENS_BLOC, seuil_preselection=SEUIL_PRESELECTION,
+                 max_workers=CONCURRENCE_PAR_DEFAUT, mode_lot=False, reprise=None, pages=None,
+                 chevauchement_tokens=CHEVAUCHEMENT_TOKENS, horloge=time.monotonic):
+        self.extractor = extractor
+        self.pdf_bytes = pdf_bytes
+        self.options = {
+            "budget_tokens": budget_tokens,
+            "seuil_preselection": seuil_preselection,
+            "max_workers": max_workers,
+            "mode_lot": mode_lot,
+            "reprise": reprise,
+            "pages": pages,
+            "chevauchement_tokens": chevauchement_tokens,
+        }
+        self.annulation = threading.Event()
+        self._horloge = horloge
+        self._lock = threading.Lock()
+        self._lignes = {}
+        self.termines = 0
+        self.soumis = 0
+        self.pages_lues = 0
+        self.nb_pages = None
+        self.debut = None
+        self.fin = None
+        self.df_final = None
+        self.rapport = None
+        self.erreur = None
+        self._thread = threading.Thread(target=self._executer, daemon=True)
+
+    def demarrer(self):
+        self.debut = self._horloge()
+        self._thread.start()
+        return self
+
+    def annuler(self):
+        self.annulation.set()
+
+    @property
+    def terminee(self):
+        return self.fin is not None
+
+    @property
+    def annulee(self):
+        return self.extractor.annulee
+
+    def attendre(self, timeout=None):
+        self._thread.join(timeout)
+        return self.terminee
+
+    def _page_lue(self):
+        with self._lock:
+            self.pages_lues += 1
+
+    def _bloc_analyse(self, index, lignes):
+        with self._lock:
+            self._lignes[index] = lignes
+
+    def _progression(self, termines, soumis):
+        with self._lock:
+            self.termines = termines
+            self.soumis = soumis
+
+    def _executer(self):
+        try:
+            pages = self.options["pages"]
+            self.nb_pages = len(pages) if pages is not None else compter_pages(self.pdf_bytes)
+            self.df_final = self.extractor.analyser_document(
+                self.pdf_bytes,
+                on_progress=self._progression,
+                on_bloc=self._bloc_analyse,
+                on_page=self._page_lue,
+                annulation=self.annulation,
+                **self.options
+            )
+            self.rapport = self.extractor.rapport_execution()
+        except Exception as e:
+            self.erreur = e
+        finally:
+            self.fin = self._horloge()
+
+    def lignes(self):
+        # Lignes validées dans l'ordre du document, avant filtrage qualité et déduplication ;
+        # les lignes des tableaux (extraites localement) sont disponibles dès la lecture de leur page
+        lignes = self.extractor.lignes_tableaux()
+        with self._lock:
+            lignes += [ligne for index in sorted(self._lignes) for ligne in self._lignes[index]]
+        return pd.DataFrame(lignes, columns=COLONNES_RESULTATS)
+
+    def total_estime(self):
+        # Blocs soumis extrapolés au nombre de pages : la lecture du PDF avance au rythme de l'API
+        with self._lock:
+            soumis, pages_lues = self.soumis, self.pages_lues
+        if not self.nb_pages or not pages_lues or self.terminee:
+            return soumis
+        return max(soumis, round(soumis * self.nb_pages / pages_lues))
+
+    def temps_restant(self):
+        # Débit mesuré sur les seuls blocs analysés : les blocs repris d'un point de reprise sont instantanés
+        with self._lock:
+            termines = self.termines
+        nouveaux = termines - self.extractor.nb_blocs_repris
+        if self.terminee or nouveaux <= 0:
+            return None
+        ecoule = self._horloge() - self.debut
+        return max(0.0, ecoule / nouveaux * (self.total_estime() - termines))
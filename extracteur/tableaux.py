@@ -0,0 +1,189 @@
+import re
+
+# Deux mots d'une même ligne appartiennent à des cellules différentes au-delà de cet écart
+# (en hauteur de mot, soit environ un cadratin ; une espace justifiée reste bien en dessous)
+ECART_CELLULE = 1.0
+# Interligne maximal à l'intérieur d'un tableau (en hauteur de ligne)
+INTERLIGNE_MAX = 2.5
+LIGNES_DONNEES_MIN = 2
+COLONNES_MIN = 2
+
+_NUMERIQUE = re.compile(
+    r"^[(+\-−–]?\s?\d{1,3}(?:[ \u00a0\u202f]\d{3})*(?:[,.]\d+)?\)?\s?%?\*?$|^[+\-−–]?\d+(?:[,.]\d+)?\s?%?\*?$"
+)
+_MANQUANT = re.compile(r"^(?:-|–|—|…|\.\.\.?|n\.?d\.?|n\.?s\.?|nd|ns)$", re.IGNORECASE)
+_ANNEE = re.compile(r"(?<!\d)(?:19|20)\d{2}(?!\d)")
+_SOUS_PERIODE = re.compile(
+    r"^(?:[TQS][1-4]|[1-4](?:er|e|ème)?\s?trim\.?|janv|févr|fevr|mars|avr|mai|juin|juil|août|aout|sept|oct|nov|déc|dec)",
+    re.IGNORECASE
+)
+_UNITE_POURCENT = re.compile(r"%|pourcentage|pour cent", re.IGNORECASE)
+_LETTRES = re.compile(r"[^\W\d_]{2,}")
+
+
+def est_periode(texte):
+    # « 2023 », « T1 2023 », « 2023 T1 », « 2022-23 », « janv. 2024 », « 1er trim. 2024 »
+    texte = texte.strip().rstrip("*").strip()
+    if len(texte) > 20:
+        return False
+    if _ANNEE.search(texte):
+        return not _NUMERIQUE.match(texte) or bool(_ANNEE.fullmatch(texte))
+    return bool(_SOUS_PERIODE.match(texte)) and len(texte) <= 6
+
+
+def _est_valeur(texte):
+    return bool(_NUMERIQUE.match(texte)) and not _ANNEE.fullmatch(texte)
+
+
+def _lignes_visuelles(mots):
+    # Mots regroupés par ligne d'après leur centre vertical, puis découpés en cellules sur les grands écarts
+    lignes = []
+    for mot in sorted(mots, key=lambda mot: ((mot[1] + mot[3]) / 2, mot[0])):
+        centre = (mot[1] + mot[3]) / 2
+        hauteur = max(mot[3] - mot[1], 1.0)
+        if lignes and abs(centre - lignes[-1]["centre"]) <= hauteur / 2:
+            lignes[-1]["mots"].append(mot)
+        else:
+            lignes.append({"centre": centre, "hauteur": hauteur, "mots": [mot]})
+    for ligne in lignes:
+        mots_ligne = sorted(ligne["mots"], key=lambda mot: mot[0])
+        cellules = []
+        for mot in mots_ligne:
+            if cellules and mot[0] - cellules[-1][1] <= ECART_CELLULE * ligne["hauteur"]:
+                cellule = cellules[-1]
+                cellules[-1] = (cellule[0], max(cellule[1], mot[2]), f"{cellule[2]} {mot[4]}")
+            else:
+                cellules.append((mot[0], mot[2], mot[4]))
+        ligne["cellules"] = cellules
+        ligne["rect"] = (
+            min(mot[0] for mot in mots_ligne), min(mot[1] for mot in mots_ligne),
+            max(mot[2] for mot in mots_ligne), max(mot[3] for mot in mots_ligne),
+        )
+    return lignes
+
+
+def _decomposer(ligne):
+    # Ligne de données : libellé (cellules de tête non numériques) suivi de valeurs ; None sinon
+    cellules = ligne["cellules"]
+    debut = 0
+    while debut < len(cellules) and not (_est_valeur(cellules[debut][2]) or _MANQUANT.match(cellules[debut][2])):
+        debut += 1
+    libelle = " ".join(cellule[2] for cellule in cellules[:debut])
+    valeurs = cellules[debut:]
+    if not _LETTRES.search(libelle) and not est_periode(libelle):
+        return None
+    if not all(_est_valeur(cellule[2]) or _MANQUANT.match(cellule[2]) for cellule in valeurs):
+        return None
+    if sum(_est_valeur(cellule[2]) for cellule in valeurs) < 1:
+        return None
+    return libelle, valeurs
+
+
+def _colonne(cellule, colonnes):
+    # Colonne d'en-tête qui recouvre le plus la cellule (chiffres alignés à droite, en-têtes centrés)
+    meilleure, recouvrement_max = None, 0.0
+    for indice, (x0, x1, _) in enumerate(colonnes):
+        recouvrement = min(x1, cellule[1]) - max(x0, cellule[0])
+        if recouvrement > recouvrement_max:
+            meilleure, recouvrement_max = indice, recouvrement
+    if meilleure is not None:
+        return meilleure
+    centre = (cellule[0] + cellule[1]) / 2
+    distances = [abs(centre - (x0 + x1) / 2) for x0, x1, _ in colonnes]
+    indice = min(range(len(colonnes)), key=distances.__getitem__)
+    largeur = colonnes[indice][1] - colonnes[indice][0]
+    return indice if distances[indice] <= max(largeur, 20.0) else None
+
+
+def _periodes_en_colonnes(colonnes):
+    return sum(est_periode(colonne[2]) for colonne in colonnes) >= COLONNES_MIN
+
+
+def _construire(entete, donnees, titre, page_numero):
+    premiere_valeur = min(valeurs[0][0] for _, valeurs, _ in donnees)
+    colonnes = [cellule for cellule in entete["cellules"] if cellule[1] > premiere_valeur - 2]
+    coin = " ".join(cellule[2] for cellule in entete["cellules"] if cellule[1] <= premiere_valeur - 2)
+    if len(colonnes) < COLONNES_MIN:
+        return None
+    en_colonnes = _periodes_en_colonnes(colonnes)
+    if not en_colonnes and sum(est_periode(libelle) for libelle, _, _ in donnees) < LIGNES_DONNEES_MIN:
+        return None
+    contexte = f"{titre} {coin}"
+    lignes = []
+    for libelle, valeurs, _ in donnees:
+        for cellule in valeurs:
+            if not _est_valeur(cellule[2]):
+                continue
+            indice = _colonne(cellule, colonnes)
+            if indice is None:
+                continue
+            entete_colonne = colonnes[indice][2]
+            secteur, periode = (libelle, entete_colonne) if en_colonnes else (entete_colonne, libelle)
+            valeur = cellule[2].rstrip("*").strip()
+            if "%" not in valeur and _UNITE_POURCENT.search(f"{contexte} {secteur}"):
+                valeur = f"{valeur} %"
+            lignes.append({
+                "Secteur/Indicateur": secteur.strip(" :"),
+                "Valeur": valeur,
+                "Période": periode.rstrip("*").strip(),
+                "Phrase": f"{titre or f'Tableau (p. {page_numero})'} — {secteur.strip(' :')}, "
+                          f"{periode.rstrip('*').strip()} : {valeur}",
+            })
+    return lignes
+
+
+def extraire_tableaux(page):
+    # Tableaux d'indicateurs reconstruits à partir de la position des mots (page.get_text("words")) :
+    # une ligne d'en-tête (périodes en colonnes, ou indicateurs en colonnes et périodes en lignes) suivie
+    # d'au moins LIGNES_DONNEES_MIN lignes « libellé  valeur  valeur... » alignées sur ses colonnes.
+    # Renvoie [{"rect", "lignes", "texte"}] : zone du tableau, lignes au format COLONNES_RESULTATS, texte brut
+    lignes_visuelles = _lignes_visuelles(page.get_text("words"))
+    tableaux = []
+    i = 0
+    while i < len(lignes_visuelles) - LIGNES_DONNEES_MIN:
+        entete = lignes_visuelles[i]
+        if len(entete["cellules"]) < COLONNES_MIN or _decomposer(entete) is not None:
+            i += 1
+            continue
+        donnees = []
+        precedente = entete
+        j = fin = i + 1
+        while j < len(lignes_visuelles):
+            ligne = lignes_visuelles[j]
+            if ligne["centre"] - precedente["centre"] > INTERLIGNE_MAX * precedente["hauteur"]:
+                break
+            decomposee = _decomposer(ligne)
+            if decomposee is None:
+                # Intertitre d'une seule cellule (« Secteur primaire ») : le tableau continue s'il est
+                # suivi d'une ligne de données
+                if len(ligne["cellules"]) == 1 and donnees and j == fin:
+                    precedente = ligne
+                    j += 1
+                    continue
+                break
+            donnees.append(decomposee + (ligne,))
+            precedente = ligne
+            j = fin = j + 1
+        lignes_tableau = None
+        if len(donnees) >= LIGNES_DONNEES_MIN:
+            # Titre : ligne juste au-dessus de l'en-tête, si elle est proche (« Tableau 3 : ... (en %) »)
+            titre = ""
+            if i > 0:
+                dessus = lignes_visuelles[i - 1]
+                if entete["centre"] - dessus["centre"] <= INTERLIGNE_MAX * dessus["hauteur"]:
+                    titre = " ".join(cellule[2] for cellule in dessus["cellules"])
+            lignes_tableau = _construire(entete, donnees, titre, page.number + 1)
+        if not lignes_tableau:
+            i += 1
+            continue
+        membres = lignes_visuelles[i:fin]
+        tableaux.append({
+            "rect": (
+                min(ligne["rect"][0] for ligne in membres), min(ligne["rect"][1] for ligne in membres),
+                max(ligne["rect"][2] for ligne in membres), max(ligne["rect"][3] for ligne in membres),
+            ),
+            "lignes": lignes_tableau,
+            "texte": "\n".join(" ".join(cellule[2] for cellule in ligne["cellules"]) for ligne in membres),
+        })
+        i = fin
+    return tableaux
@@ -0,0 +1,81 @@
+import re
+
+import numpy as np
+
+from .lexique import EXCLUSIONS, INDICATEURS_PRIORITAIRES, MOTS_CLES_VALIDES, MOTS_EXCLUS_INDICATEUR, MOTS_PERIODE
+
+# Au-delà de ce nombre de lignes, la validation passe par pandas plutôt que ligne par ligne
+SEUIL_VECTORISATION = 64
+
+_VALEUR_CHIFFREE = r'-?\d+[,.]?\d*'
+
+
+def alternance(mots):
+    # « any(mot in texte for mot in mots) » équivaut à une recherche de l'alternation des mots
+    if not mots:
+        return re.compile(r"(?!)")
+    return re.compile("|".join(re.escape(mot) for mot in sorted(mots, key=len, reverse=True)))
+
+
+_EXCLUS_INDICATEUR = alternance(MOTS_EXCLUS_INDICATEUR)
+_MOTS_CLES = alternance(MOTS_CLES_VALIDES)
+_EXCLUSIONS = alternance(EXCLUSIONS)
+_PERIODE = alternance(MOTS_PERIODE)
+_INDICATEURS = alternance(INDICATEURS_PRIORITAIRES)
+_VALEUR = re.compile(_VALEUR_CHIFFREE)
+_UNITE = alternance(["%", "point"])
+
+
+def ligne_valide(secteur_indicateur, valeur, phrase, mots_cles=None):
+    mots_cles = mots_cles or _MOTS_CLES
+    if _EXCLUS_INDICATEUR.search(secteur_indicateur.lower()):
+        return False
+    texte_complet = f"{secteur_indicateur} {phrase}".lower()
+    if not mots_cles.search(texte_complet) or not _VALEUR.search(valeur):
+        return False
+    if _EXCLUSIONS.search(texte_complet):
+        return False
+    return len(secteur_indicateur) >= 3 and len(phrase) >= 20
+
+
+def masque_validite(df, mots_cles=None):
+    # Mêmes règles que ligne_valide, sur toutes les lignes à la fois
+    mots_cles = mots_cles or _MOTS_CLES
+    secteur = df["Secteur/Indicateur"].astype(str)
+    phrase = df["Phrase"].astype(str)
+    texte_complet = (secteur + " " + phrase).str.lower()
+    masque = (
+        ~secteur.str.lower().str.contains(_EXCLUS_INDICATEUR)
+        & texte_complet.str.contains(mots_cles)
+        & df["Valeur"].astype(str).str.contains(_VALEUR)
+        & ~texte_complet.str.contains(_EXCLUSIONS)
+        & (secteur.str.len() >= 3)
+        & (phrase.str.len() >= 20)
+    )
+    return masque.to_numpy(dtype=bool)
+
+
+def scores_qualite(df):
+    # +2 par indicateur prioritaire présent, +1 pour une unité (% ou point), +1 pour une période
+    phrase = df["Phrase"].fillna("").astype(str).str.lower()
+    # « dans le secteur ou dans la phrase » : une seule recherche sur les deux textes séparés par \0,
+    # qu'aucun mot du lexique ne contient
+    secteur_phrase = df["Secteur/Indicateur"].fillna("").astype(str).str.lower() + "\0" + phrase
+    score = np.zeros(len(df), dtype=np.int64)
+    for indicateur in INDICATEURS_PRIORITAIRES:
+        score += 2 * secteur_phrase.str.contains(indicateur, regex=False).to_numpy(dtype=np.int64)
+    score += df["Valeur"].fillna("").astype(str).str.contains(_UNITE).to_numpy(dtype=np.int64)
+    score += phrase.str.contains(_PERIODE).to_numpy(dtype=np.int64)
+    return score
+
+
+def masque_qualite(df, score_minimal=2):
+    if score_minimal != 2:
+        return scores_qualite(df) >= score_minimal
+    # Score >= 2 : un indicateur prioritaire, ou à la fois une unité et une période
+    phrase = df["Phrase"].fillna("").astype(str).str.lower()
+    secteur_phrase = df["Secteur/Indicateur"].fillna("").astype(str).str.lower() + "\0" + phrase
+    masque = secteur_phrase.str.contains(_INDICATEURS) | (
+        df["Valeur"].fillna("").astype(str).str.contains(_UNITE) & phrase.str.contains(_PERIODE)
+    )
+    return masque.to_numpy(dtype=bool)
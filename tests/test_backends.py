@@ -0,0 +1,29 @@
+import pytest
+
+from extracteur.backends import BACKEND_FAUX, BACKEND_GROQ, BACKEND_OPENAI
+from extracteur.limitation import QUOTAS_ILLIMITES, REQUETES_PAR_MINUTE, TOKENS_PAR_MINUTE, planificateur_backend, quotas_backend
+from extracteur.pipeline import PDFEconomicExtractor
+
+
+def test_quotas_par_backend():
+    assert quotas_backend(BACKEND_GROQ) == (REQUETES_PAR_MINUTE, TOKENS_PAR_MINUTE)
+    assert quotas_backend(BACKEND_OPENAI) == QUOTAS_ILLIMITES
+    assert quotas_backend(BACKEND_FAUX) == QUOTAS_ILLIMITES
+    assert quotas_backend(BACKEND_OPENAI, 60, 50000) == (60, 50000)
+    assert quotas_backend(BACKEND_GROQ, 0, 0) == QUOTAS_ILLIMITES
+
+
+def test_quotas_repartis_entre_processus():
+    planificateur = planificateur_backend(BACKEND_GROQ, nb_processus=3)
+    assert (planificateur.requetes_par_minute, planificateur.tokens_par_minute) == (10, 4000)
+
+
+def test_serveur_local_non_limite_par_les_quotas_groq():
+    extractor = PDFEconomicExtractor("", client=object(), backend=BACKEND_OPENAI, modele="qwen2.5-7b-instruct")
+    assert extractor.planificateur.requetes_par_minute == QUOTAS_ILLIMITES[0]
+    assert extractor.modele == "qwen2.5-7b-instruct"
+
+
+def test_modele_obligatoire_pour_un_serveur_compatible():
+    with pytest.raises(ValueError):
+        PDFEconomicExtractor("", client=object(), backend=BACKEND_OPENAI)
@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+
+from extracteur.cache import DocumentResultCache, LLMResponseCache
+from extracteur.limitation import RateLimitScheduler
+from extracteur.pipeline import PDFEconomicExtractor
+
+
+class ClientVide:
+    # Répond toujours par un contenu vide : bloc sans indicateur
+    def __init__(self):
+        self.appels = 0
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **parametres):
+        self.appels += 1
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=""))], usage=None)
+
+
+def test_reponse_vide_mise_en_cache(tmp_path):
+    cache = LLMResponseCache(tmp_path / "reponses.sqlite3")
+    cache.set("cle", "")
+    assert cache.get("cle") == ""
+    assert cache.get("absente") is None
+
+
+def test_bloc_sans_indicateur_non_renvoye(tmp_path):
+    cache = LLMResponseCache(tmp_path / "reponses.sqlite3")
+    client = ClientVide()
+    bloc = "Le conseil s'est réuni en séance plénière pour examiner le rapport annuel."
+    for _ in range(2):
+        extractor = PDFEconomicExtractor(
+            "", client=client, cache=cache, planificateur=RateLimitScheduler(10**6, 10**9)
+        )
+        # Une réponse vide est un résultat acquis (liste vide), pas un échec
+        assert extractor._traiter_bloc(bloc) == []
+    assert client.appels == 1
+    assert cache.hits == 1
+
+
+def test_cache_documents_par_version(tmp_path):
+    temps = [0.0]
+    cache = DocumentResultCache(tmp_path / "documents.sqlite3", max_documents=2, horloge=lambda: temps[0])
+    lignes = [{"Secteur/Indicateur": "PIB", "Valeur": "3,2%", "Période": "2023", "Phrase": "..."}]
+    cache.set("a", "v1", lignes, nom="a.pdf")
+    assert cache.get("a", "v1") == lignes
+    # Autre version du pipeline (réglages, prompt, modèle) : résultat à recalculer
+    assert cache.get("a", "v2") is None
+    temps[0] = 1.0
+    cache.set("b", "v1", [])
+    temps[0] = 2.0
+    cache.get("a", "v1")
+    temps[0] = 3.0
+    cache.set("c", "v1", [])
+    # Au-delà de max_documents : le moins récemment utilisé est évincé
+    assert cache.get("b", "v1") is None
+    assert cache.get("a", "v1") == lignes and cache.get("c", "v1") == []
@@ -0,0 +1,41 @@
+import pandas as pd
+
+from extracteur import cli
+from extracteur.benchmark import generer_pdf
+from extracteur.historique import IndicatorStore
+
+
+def test_aller_retour_cli(tmp_path, monkeypatch, caplog):
+    # Les processus de travail (spawn) lisent le répertoire des caches dans l'environnement
+    monkeypatch.setenv("PDF_EXTRACTOR_CACHE_DIR", str(tmp_path / "cache"))
+    historique = IndicatorStore(tmp_path / "indicateurs.sqlite3")
+    monkeypatch.setattr(cli, "IndicatorStore", lambda: historique)
+    entrees = tmp_path / "bulletins"
+    entrees.mkdir()
+    for graine in (1, 2):
+        (entrees / f"bulletin_{graine}.pdf").write_bytes(generer_pdf(3, 0.6, graine))
+    arguments = [str(entrees), "-o", str(tmp_path / "sortie"), "--backend", "faux", "-p", "2",
+                 "--metriques", str(tmp_path / "metriques.prom")]
+
+    assert cli.main(arguments) == 0
+    combine = pd.read_csv(tmp_path / "sortie" / "indicateurs.csv", sep=";")
+    assert not combine.empty
+    assert set(combine["Document"]) == {"bulletin_1.pdf", "bulletin_2.pdf"}
+    for graine in (1, 2):
+        par_document = pd.read_csv(tmp_path / "sortie" / f"bulletin_{graine}.csv", sep=";")
+        assert len(par_document) == (combine["Document"] == f"bulletin_{graine}.pdf").sum()
+    assert len(historique.documents()) == 2
+    assert "extracteur_" in (tmp_path / "metriques.prom").read_text(encoding="utf-8")
+
+    # Seconde exécution : résultats servis par le cache des documents, identiques
+    caplog.clear()
+    with caplog.at_level("INFO", logger="extracteur"):
+        assert cli.main(arguments) == 0
+    assert caplog.text.count("(cache)") == 2
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / "sortie" / "indicateurs.csv", sep=";"), combine)
+    assert len(historique.documents()) == 2
+
+
+def test_modele_requis_pour_openai(tmp_path):
+    (tmp_path / "bulletin.pdf").write_bytes(generer_pdf(1))
+    assert cli.main([str(tmp_path / "bulletin.pdf"), "-o", str(tmp_path), "--backend", "openai"]) == 2
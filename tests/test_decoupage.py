@@ -0,0 +1,22 @@
+from extracteur.decoupage import estimer_tokens, iter_blocs_tokens
+
+PHRASES = [f"Phrase numéro {numero} sur la croissance du produit intérieur brut en 2023." for numero in range(12)]
+
+
+def test_blocs_sans_chevauchement():
+    blocs = list(iter_blocs_tokens(PHRASES, budget_tokens=40))
+    assert " ".join(blocs) == " ".join(PHRASES)
+
+
+def test_blocs_avec_chevauchement():
+    par_phrase = estimer_tokens(PHRASES[0])
+    blocs = list(iter_blocs_tokens(PHRASES, budget_tokens=4 * par_phrase, chevauchement_tokens=par_phrase))
+    assert len(blocs) > 1
+    for precedent, suivant in zip(blocs, blocs[1:]):
+        # La dernière phrase de chaque bloc est reprise en tête du suivant, sans dépasser le budget
+        assert suivant.startswith(precedent[precedent.rindex("Phrase"):])
+        assert estimer_tokens(suivant) <= 4 * par_phrase
+    # Toutes les phrases sont couvertes, et aucun bloc final ne répète seulement la fin du précédent
+    assert all(any(phrase in bloc for bloc in blocs) for phrase in PHRASES)
+    assert blocs[-1].endswith(PHRASES[-1])
+    assert blocs[-1] not in blocs[-2]
@@ -0,0 +1,33 @@
+import pandas as pd
+
+from extracteur.historique import IndicatorStore
+
+
+def lignes(*donnees):
+    return pd.DataFrame(
+        [{"Secteur/Indicateur": indicateur, "Valeur": valeur, "Période": periode,
+          "Phrase": f"{indicateur} : {valeur} en {periode}"} for indicateur, valeur, periode in donnees]
+    )
+
+
+def test_dernier_document_l_emporte(tmp_path):
+    store = IndicatorStore(tmp_path / "indicateurs.sqlite3")
+    # Libellés différents d'un document à l'autre : MIN(indicateur) ne désigne pas la ligne la plus récente
+    store.ingerer("a", "bulletin_2023.pdf", lignes(("Inflation", "3,0 %", "2023"), ("PIB", "2,8 %", "2022")))
+    store.ingerer("b", "bulletin_2024.pdf", lignes(("inflation", "3,4 %", "2023"), ("PIB", "3,1 %", "2022")))
+    store.ingerer("c", "note.pdf", lignes(("Taux de chômage", "7,4 %", "2023")))
+    serie = store.serie("dernier").set_index(["Indicateur", "Période"])["Valeur"]
+    assert serie[("Inflation", "2023")] == 3.4
+    assert serie[("PIB", "2022")] == 3.1
+    assert store.serie("min").set_index(["Indicateur", "Période"])["Valeur"][("Inflation", "2023")] == 3.0
+
+
+def test_dernier_independant_de_l_ordre_des_observations(tmp_path):
+    store = IndicatorStore(tmp_path / "indicateurs.sqlite3")
+    store.ingerer("a", "ancien.pdf", lignes(("PIB", "2,5 %", "2021"), ("pib", "9,9 %", "2020")))
+    store.ingerer("b", "recent.pdf", lignes(("pib", "9,9 %", "2021"), ("PIB", "1,0 %", "2020")))
+    # Une valeur vue dans les deux documents compte pour le plus récent
+    store.ingerer("c", "revision.pdf", lignes(("PIB", "2,5 %", "2021")))
+    serie = store.serie("dernier").set_index("Période")["Valeur"]
+    assert serie["2021"] == 2.5
+    assert serie["2020"] == 1.0
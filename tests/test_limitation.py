@@ -0,0 +1,90 @@
+import pytest
+
+from extracteur.limitation import RateLimitScheduler, est_erreur_transitoire
+
+
+class Horloge:
+    def __init__(self):
+        self.maintenant = 0.0
+        self.sommeils = []
+
+    def __call__(self):
+        return self.maintenant
+
+    def dormir(self, duree):
+        self.sommeils.append(duree)
+        self.maintenant += duree
+
+
+class ErreurAPI(Exception):
+    def __init__(self, status_code, message="erreur"):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class APIConnectionError(Exception):
+    pass
+
+
+def planificateur(horloge, **options):
+    return RateLimitScheduler(
+        requetes_par_minute=1000, tokens_par_minute=10**6, horloge=horloge, sommeil=horloge.dormir,
+        aleatoire=lambda: 0.5, **options
+    )
+
+
+def appel_echouant(erreurs):
+    erreurs = list(erreurs)
+
+    def appel():
+        if erreurs:
+            raise erreurs.pop(0)
+        return "ok"
+    return appel
+
+
+def test_429_rejoue_apres_backoff():
+    horloge = Horloge()
+    sched = planificateur(horloge)
+    assert sched.executer(appel_echouant([ErreurAPI(429), ErreurAPI(429)])) == "ok"
+    assert sched.nb_limitations == 2
+    assert sched.nb_requetes == 3
+    # Backoff exponentiel avec gigue (aleatoire = 0,5) : 0,75 s puis 1,5 s
+    assert horloge.maintenant == pytest.approx(0.75 + 1.5)
+
+
+@pytest.mark.parametrize("erreur", [
+    ErreurAPI(500), ErreurAPI(503), APIConnectionError("connexion perdue"), TimeoutError("expiré"),
+])
+def test_erreurs_transitoires_rejouees(erreur):
+    horloge = Horloge()
+    sched = planificateur(horloge)
+    assert sched.executer(appel_echouant([erreur])) == "ok"
+    assert sched.nb_erreurs_transitoires == 1
+    assert horloge.sommeils == [pytest.approx(0.75)]
+
+
+def test_erreur_client_non_rejouee():
+    sched = planificateur(Horloge())
+    with pytest.raises(ErreurAPI):
+        sched.executer(appel_echouant([ErreurAPI(400)]))
+    assert not est_erreur_transitoire(ErreurAPI(401))
+    assert sched.nb_requetes == 1
+
+
+def test_abandon_apres_max_tentatives():
+    sched = planificateur(Horloge(), max_tentatives=2)
+    with pytest.raises(ErreurAPI):
+        sched.executer(appel_echouant([ErreurAPI(502)] * 3))
+    assert sched.nb_erreurs_transitoires == 2
+
+
+def test_requete_plus_grosse_que_le_quota_attend_une_fenetre_vide():
+    horloge = Horloge()
+    sched = RateLimitScheduler(requetes_par_minute=100, tokens_par_minute=1000, horloge=horloge,
+                               sommeil=horloge.dormir)
+    sched.executer(lambda: "a", tokens_estimes=200)
+    horloge.maintenant = 10.0
+    sched.executer(lambda: "b", tokens_estimes=5000)
+    # Envoyée seulement quand la première requête est sortie de la fenêtre
+    assert horloge.maintenant == pytest.approx(60.0)
@@ -0,0 +1,61 @@
+import re
+from types import SimpleNamespace
+
+from extracteur.cache import LLMResponseCache
+from extracteur.limitation import RateLimitScheduler
+from extracteur.lots import separer_reponse_lot
+from extracteur.pipeline import PDFEconomicExtractor
+
+
+def test_lignes_orphelines_signalees():
+    orphelines = []
+    reponse = "[B1] PIB|3,2%|2023|Le PIB a progressé de 3,2 %\n[B2] Inflation|4,1%|2023|...\nChômage|7,4%|2023|..."
+    sections = separer_reponse_lot(reponse, [1, 2], orphelines.append)
+    assert sections == {1: "PIB|3,2%|2023|Le PIB a progressé de 3,2 %", 2: "Inflation|4,1%|2023|..."}
+    assert orphelines == ["Chômage|7,4%|2023|..."]
+
+
+def test_reponse_majoritairement_non_attribuable():
+    assert separer_reponse_lot("PIB|3%|2023|a\nInflation|2%|2023|b\n[B1] Crédit|5%|2023|c", [1, 2]) is None
+
+
+class ClientLot:
+    # Réponse groupée : une ligne par bloc, selon son contenu, préfixée par l'identifiant lu dans le prompt
+    REPONSES = {
+        "croissance": "PIB|3,2%|2023|Le PIB a progressé de 3,2 % en 2023",
+        "prix": "Inflation|6,1%|2023|L'inflation a atteint 6,1 % en 2023",
+    }
+
+    def __init__(self):
+        self.appels = 0
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, messages, **parametres):
+        self.appels += 1
+        prompt = messages[-1]["content"]
+        lignes = [
+            f"[B{index}] {self.REPONSES[theme]}"
+            for index, theme in re.findall(r"\[B(\d+)\]\n.*?(croissance|prix)", prompt, re.DOTALL)
+        ]
+        message = SimpleNamespace(content="\n".join(lignes))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")], usage=None)
+
+
+def test_cache_lot_lie_aux_identifiants(tmp_path):
+    cache = LLMResponseCache(tmp_path / "reponses.sqlite3")
+    client = ClientLot()
+    blocs = ["Note sur la croissance de l'économie nationale.", "Note sur l'évolution des prix à la consommation."]
+
+    def analyser(premier_index):
+        extractor = PDFEconomicExtractor("", client=client, cache=cache, planificateur=RateLimitScheduler(10**6, 10**9))
+        return extractor._traiter_lot(list(enumerate(blocs, start=premier_index)))
+
+    analyser(3)
+    # Mêmes blocs, indices décalés (autre présélection ou sélection de pages) : la réponse en cache ne
+    # s'applique pas, chaque ligne reste attachée à son bloc
+    resultats = analyser(4)
+    assert [ligne["Secteur/Indicateur"] for ligne in resultats[4]] == ["PIB"]
+    assert [ligne["Secteur/Indicateur"] for ligne in resultats[5]] == ["Inflation"]
+    assert client.appels == 2
+    analyser(4)
+    assert client.appels == 2
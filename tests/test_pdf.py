@@ -0,0 +1,20 @@
+import time
+
+from extracteur.benchmark import generer_pdf
+from extracteur.pdf import iter_pages_paralleles
+
+LATENCE_CONSOMMATEUR = 0.1
+
+
+def test_duree_extraction_hors_consommateur():
+    pdf = generer_pdf(40, 0.5, 1)
+    statistiques = {}
+    depart = time.perf_counter()
+    for _ in iter_pages_paralleles(pdf, nb_processus=2, statistiques=statistiques):
+        # Analyse lente en aval (appels LLM) : ne compte pas dans la durée de l'extraction
+        time.sleep(LATENCE_CONSOMMATEUR)
+    ecoule = time.perf_counter() - depart
+    assert statistiques["pages"] == 40
+    assert ecoule >= 40 * LATENCE_CONSOMMATEUR
+    assert statistiques["duree"] < ecoule / 2
+    assert statistiques["acceleration"] == statistiques["duree_cumulee"] / statistiques["duree"]
@@ -0,0 +1,36 @@
+import fitz
+import pytest
+
+from extracteur.pertinence import carte_pertinence, formater_plages, lire_plages, pages_pertinentes, score_page
+
+
+def test_plages_de_pages():
+    assert lire_plages("1-3, 5;7-8", 10) == [1, 2, 3, 5, 7, 8]
+    assert formater_plages([8, 1, 2, 3, 5, 7]) == "1-3,5,7-8"
+    for texte in ("4-2", "0", "9-12", "a", " , "):
+        with pytest.raises(ValueError):
+            lire_plages(texte, 10)
+
+
+def test_score_page():
+    garde = score_page("Rapport annuel 2023 de la banque centrale")[0]
+    conjoncture = score_page(
+        "Le PIB a progressé de 3,2 % en 2023, l'inflation a atteint 6,1 % et le taux directeur 3 %. "
+        "Les exportations ont augmenté de 4,5 %.", section="Conjoncture économique"
+    )[0]
+    assert conjoncture > garde
+    phrase = "Le PIB a progressé de 3,2 %."
+    assert score_page(phrase, section="Gouvernance")[0] < score_page(phrase)[0]
+
+
+def test_pages_pertinentes():
+    document = fitz.open()
+    for texte in ("Rapport annuel", "Le PIB a progressé de 3,2 % et l'inflation a atteint 6,1 % en 2023, "
+                  "le taux directeur 3 %.", "Composition du conseil d'administration", "Les exportations ont "
+                  "augmenté de 4,5 % et les importations de 2,1 % ; le déficit budgétaire atteint 4,4 %."):
+        document.new_page().insert_text((50, 80), texte, fontsize=9)
+    carte = carte_pertinence(document.tobytes())
+    assert list(carte["Page"]) == [1, 2, 3, 4]
+    # Les N meilleures pages, rendues dans l'ordre du document
+    assert pages_pertinentes(carte, nb_pages=2) == [2, 4]
+    assert pages_pertinentes(carte, seuil=1000) == [int(carte.loc[carte["Score"].idxmax(), "Page"])]
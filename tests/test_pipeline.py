@@ -0,0 +1,135 @@
+import threading
+
+from extracteur.benchmark import generer_pdf
+from extracteur.cache import RunCheckpointStore
+from extracteur.faux_llm import FakeGroqClient
+from extracteur.limitation import RateLimitScheduler
+from extracteur.pipeline import PDFEconomicExtractor
+from extracteur.suivi import AnalyseEnCours
+
+NB_BLOCS = 24
+BLOCS = [
+    f"Note {numero} : le PIB a progressé de {numero % 7},{numero % 10} % au deuxième trimestre 2024, "
+    f"et l'inflation a atteint {numero % 5},{numero % 3} % sur la même période."
+    for numero in range(NB_BLOCS)
+]
+
+
+class ClientCompteur(FakeGroqClient):
+    # Client simulé qui mesure le nombre maximal d'appels simultanés
+    def __init__(self, latence=0.01):
+        super().__init__(latence=latence)
+        self.en_vol = 0
+        self.en_vol_max = 0
+
+    def create(self, model, messages, **parametres):
+        with self._lock:
+            self.en_vol += 1
+            self.en_vol_max = max(self.en_vol_max, self.en_vol)
+        try:
+            return super().create(model, messages, **parametres)
+        finally:
+            with self._lock:
+                self.en_vol -= 1
+
+
+def _extracteur(client):
+    return PDFEconomicExtractor("", client=client, planificateur=RateLimitScheduler(10**6, 10**9))
+
+
+def test_fenetre_bornee():
+    client = ClientCompteur()
+    extractor = _extracteur(client)
+    termines = []
+    ecarts = []
+
+    def blocs():
+        # Écart entre les blocs lus et les blocs analysés au moment où le suivant est demandé
+        for bloc in BLOCS:
+            ecarts.append(len(ecarts) - len(termines))
+            yield bloc
+
+    donnees = extractor.analyser_blocs(blocs(), max_workers=2, on_bloc=lambda index, lignes: termines.append(index))
+    assert sorted(termines) == list(range(NB_BLOCS))
+    assert len(donnees) == 2 * NB_BLOCS
+    # Au plus 2 × max_workers blocs en attente : la lecture du PDF suit le rythme de l'API
+    assert max(ecarts) <= 2 * 2
+    assert client.en_vol_max <= 2
+
+
+def test_annulation_conserve_les_lignes_acquises():
+    client = FakeGroqClient(latence=0.01)
+    extractor = _extracteur(client)
+    annulation = threading.Event()
+    acquis = {}
+
+    def bloc_analyse(index, lignes):
+        acquis[index] = lignes
+        if len(acquis) == 3:
+            annulation.set()
+
+    donnees = extractor.analyser_blocs(BLOCS, max_workers=1, on_bloc=bloc_analyse, annulation=annulation)
+    assert extractor.annulee
+    assert 3 <= len(acquis) < NB_BLOCS
+    assert client.nb_appels == len(acquis)
+    # Les lignes des blocs analysés avant l'annulation sont conservées, dans l'ordre des blocs
+    assert donnees == [ligne for index in sorted(acquis) for ligne in acquis[index]]
+    assert donnees
+
+
+def test_reprise_depuis_point_de_reprise(tmp_path):
+    store = RunCheckpointStore(tmp_path / "points_reprise.sqlite3")
+    complet = _extracteur(FakeGroqClient()).analyser_blocs(BLOCS, max_workers=2)
+
+    # Première analyse interrompue : les blocs acquis sont enregistrés
+    annulation = threading.Event()
+    premiere = _extracteur(FakeGroqClient())
+    premiere.analyser_blocs(
+        BLOCS, max_workers=1, annulation=annulation, reprise=store.reprise("empreinte", "v1"),
+        on_bloc=lambda index, lignes: annulation.set() if index >= 4 else None
+    )
+    acquis = store.charger("empreinte", "v1")
+    assert premiere.annulee and 5 <= len(acquis) < NB_BLOCS
+
+    # Reprise : seuls les blocs manquants sont envoyés, le résultat est celui d'une analyse complète
+    client = FakeGroqClient()
+    seconde = _extracteur(client)
+    donnees = seconde.analyser_blocs(BLOCS, max_workers=2, reprise=store.reprise("empreinte", "v1"))
+    assert seconde.nb_blocs_repris == len(acquis)
+    assert client.nb_appels == NB_BLOCS - len(acquis)
+    assert donnees == complet
+    # Analyse complète : le point de reprise est effacé
+    assert store.charger("empreinte", "v1") == {}
+    # Autre version du pipeline : rien à reprendre
+    assert store.reprise("empreinte", "v2").blocs == {}
+
+
+def test_analyse_en_cours_annulee():
+    extractor = _extracteur(FakeGroqClient(latence=0.05))
+    analyse = AnalyseEnCours(extractor, generer_pdf(12, 0.6, 3), max_workers=1).demarrer()
+    while analyse.lignes().empty and not analyse.terminee:
+        analyse.attendre(0.02)
+    analyse.annuler()
+    assert analyse.attendre(30)
+    assert analyse.erreur is None and analyse.annulee
+    assert not analyse.df_final.empty
+    assert analyse.termines < analyse.total_estime() or analyse.pages_lues < analyse.nb_pages
+
+
+def test_document_en_flux_et_rapport():
+    pdf = generer_pdf(6, 0.6, 2)
+    client = FakeGroqClient()
+    extractor = _extracteur(client)
+    pages_lues = []
+    df = extractor.analyser_document(pdf, mode_lot=True, on_page=lambda: pages_lues.append(1))
+    assert len(pages_lues) == 6
+    assert not df.empty and not df.duplicated().any()
+    rapport = extractor.rapport_execution()
+    # Étapes mesurées, appels et tokens du client simulé, réglages de l'analyse
+    assert {"extraction_page", "decoupage", "appel_llm"} <= set(rapport["etapes"])
+    assert rapport["llm"]["appels"] == client.nb_appels
+    assert rapport["llm"]["tokens_prompt"] > 0
+    assert rapport["reglages"]["mode_lot"] is True
+    # Chaque ligne détaillée garde sa provenance
+    detail = extractor.resultats_detailles()
+    assert detail["Page"].between(1, 6).all()
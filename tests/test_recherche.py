@@ -0,0 +1,31 @@
+import pandas as pd
+
+from extracteur.recherche import IndexRecherche
+
+LIGNES = pd.DataFrame([
+    {"Secteur/Indicateur": "Inflation", "Valeur": "2,5 %", "Période": "T1 2024",
+     "Phrase": "L'inflation a atteint 2,5 %"},
+    {"Secteur/Indicateur": "Inflation sous-jacente", "Valeur": "1,2 %", "Période": "T1 2024",
+     "Phrase": "L'inflation sous-jacente s'est établie à 1,2 %"},
+    {"Secteur/Indicateur": "Taux directeur", "Valeur": "2,75 %", "Période": "Mars 2024",
+     "Phrase": "Le taux directeur a été maintenu à 2,75 %"},
+    {"Secteur/Indicateur": "Activités non agricoles", "Valeur": "-0,4 %", "Période": "2023",
+     "Phrase": "Les activités non agricoles ont reculé de 0,4 % en 2023"},
+])
+
+
+def _secteurs(requete):
+    return list(IndexRecherche(LIGNES).rechercher(requete)["Secteur/Indicateur"])
+
+
+def test_recherche_par_colonne_et_valeur():
+    assert _secteurs("secteur:inflation valeur>=2") == ["Inflation"]
+    assert _secteurs("valeur:1..3") == ["Inflation", "Inflation sous-jacente", "Taux directeur"]
+    assert _secteurs("valeur<0") == ["Activités non agricoles"]
+    assert _secteurs('"taux directeur"') == ["Taux directeur"]
+
+
+def test_recherche_insensible_aux_accents():
+    assert _secteurs("activites 2023") == ["Activités non agricoles"]
+    assert _secteurs("periode:mars") == ["Taux directeur"]
+    assert len(_secteurs("")) == len(LIGNES)
@@ -0,0 +1,38 @@
+import pytest
+
+from extracteur.regles import extraire_indicateurs
+
+
+def valeurs(bloc):
+    lignes, _ = extraire_indicateurs(bloc)
+    return [(ligne["Secteur/Indicateur"], ligne["Valeur"]) for ligne in lignes]
+
+
+@pytest.mark.parametrize("bloc", [
+    "Les avoirs officiels de réserve se sont établis à 312,5 milliards de dirhams en 2023.",
+    "Le taux de change du dirham vis-à-vis du dollar s'est établi à 10,8 en moyenne.",
+    "Le PIB a progressé de 3,2 % en 2023, pour un total de 1 452 milliards de dirhams.",
+])
+def test_nombre_sans_unite_rend_le_bloc_ambigu(bloc):
+    assert extraire_indicateurs(bloc)[1]
+
+
+@pytest.mark.parametrize("bloc", [
+    "Le PIB a progressé de 3,2 % en 2023.",
+    "L'inflation s'est établie à 6,1 % au premier trimestre 2023.",
+    "Au 31 décembre 2023, l'inflation s'est établie à 3,4 %.",
+])
+def test_valeurs_classees_non_ambigues(bloc):
+    assert not extraire_indicateurs(bloc)[1]
+
+
+def test_sens_de_la_variation_conserve():
+    assert valeurs("La valeur ajoutée agricole a reculé de 3,4 % en 2023.") == [("Agriculture", "-3,4%")]
+    assert valeurs("Les exportations sont en baisse de 2,1 % après une hausse de 5 % en 2022.") == [
+        ("Exportations", "-2,1%"), ("Exportations", "5%")
+    ]
+    assert valeurs("Le taux directeur a été abaissé de 25 points de base à 2,75 %.") == [
+        ("Taux directeur", "-25 pb"), ("Taux directeur", "2,75%")
+    ]
+    # Niveau atteint après une baisse : pas une variation
+    assert valeurs("L'inflation a reculé à 3,4 % en 2023.") == [("Inflation", "3,4%")]
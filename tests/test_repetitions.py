@@ -0,0 +1,37 @@
+import fitz
+
+from extracteur.repetitions import FiltreQuasiDoublons, detecter_en_tetes, iter_phrases_uniques, texte_page
+
+ENCADRE = (
+    "Avertissement : les données de ce bulletin sont provisoires et susceptibles de révision. Le PIB a progressé "
+    "de 3,2 % en 2023 selon les estimations de la banque centrale, qui publie chaque trimestre sa note de conjoncture."
+)
+
+
+def test_quasi_doublons():
+    filtre = FiltreQuasiDoublons()
+    assert not filtre.est_doublon(ENCADRE)
+    assert filtre.est_doublon(ENCADRE.replace("chaque trimestre", "chaque  trimestre") + " ")
+    # Même paragraphe avec un chiffre mis à jour : conservé
+    assert not filtre.est_doublon(ENCADRE.replace("3,2", "3,4"))
+
+
+def test_phrases_repetees():
+    repetees = []
+    phrases = ["Source : Haut-Commissariat au Plan, comptes nationaux.", "Le PIB a progressé de 3,2 %.",
+               "source : haut-commissariat au plan,  comptes nationaux.", "Hausse de 2 %."]
+    assert list(iter_phrases_uniques(phrases, repetees.append)) == phrases[:2] + phrases[3:]
+    assert repetees == [phrases[2]]
+
+
+def test_en_tetes_retires():
+    document = fitz.open()
+    for numero in range(4):
+        page = document.new_page()
+        page.insert_text((50, 30), "Banque centrale - Bulletin trimestriel", fontsize=8)
+        page.insert_text((50, 300), f"Le PIB a progressé de {numero + 1},5 % au trimestre.", fontsize=10)
+        page.insert_text((280, 815), str(numero + 1), fontsize=8)
+    en_tetes = detecter_en_tetes(document)
+    texte, retirees = texte_page(document[2], en_tetes)
+    assert "Bulletin trimestriel" not in texte and "3,5 %" in texte
+    assert "Banque centrale - Bulletin trimestriel" in retirees
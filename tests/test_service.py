@@ -0,0 +1,89 @@
+import asyncio
+import contextlib
+import socket
+import threading
+import time
+from urllib.error import HTTPError
+
+import pandas as pd
+import pytest
+
+from extracteur.benchmark import generer_pdf
+from extracteur.cache import empreinte_document
+from extracteur.client_service import STATUTS_FINAUX, ExtractionServiceClient
+from extracteur.faux_llm import FakeGroqClient
+from extracteur.limitation import RateLimitScheduler
+from extracteur.pipeline import COLONNES_RESULTATS, PDFEconomicExtractor
+from extracteur.service import STATUT_TERMINE, ExtractionService, JobStore
+
+PDF = b"%PDF-1.4 contenu de test"
+
+
+def test_empreinte_travail_termine(tmp_path):
+    store = JobStore(tmp_path)
+    job_id = store.creer(PDF, "bulletin.pdf", {})
+    # L'empreinte n'est donnée qu'avec le résultat final, pour l'ingestion dans l'entrepôt du client
+    assert "empreinte" not in store.get(job_id)
+    store.terminer(job_id, [])
+    assert store.get(job_id)["empreinte"] == empreinte_document(PDF)
+
+
+@pytest.fixture
+def service_http(tmp_path):
+    # Service réel (HTTP + workers asyncio) avec le client simulé, sur un port libre
+    service = ExtractionService(JobStore(tmp_path / "service"), nb_workers=1, faux_llm=True)
+    with socket.socket() as prise:
+        prise.bind(("127.0.0.1", 0))
+        port = prise.getsockname()[1]
+    boucle = asyncio.new_event_loop()
+    tache = boucle.create_task(service.executer(port=port))
+
+    def executer():
+        with contextlib.suppress(asyncio.CancelledError):
+            boucle.run_until_complete(tache)
+        boucle.run_until_complete(boucle.shutdown_default_executor())
+
+    thread = threading.Thread(target=executer, daemon=True)
+    thread.start()
+    client = ExtractionServiceClient(f"http://127.0.0.1:{port}", timeout=5)
+    for _ in range(100):
+        try:
+            client._appeler("/sante")
+            break
+        except OSError:
+            time.sleep(0.05)
+    yield client
+    boucle.call_soon_threadsafe(tache.cancel)
+    thread.join(10)
+    boucle.close()
+
+
+def _attendre(client, job_id):
+    for _ in range(600):
+        travail = client.statut(job_id)
+        if travail["statut"] in STATUTS_FINAUX:
+            return travail
+        time.sleep(0.05)
+    raise TimeoutError(job_id)
+
+
+def test_aller_retour_service(service_http):
+    pdf = generer_pdf(3, 0.6, 1)
+    job_id = service_http.soumettre(pdf, "bulletin.pdf", mode_lot=True, chevauchement_tokens=100, pages="1-2")
+    travail = _attendre(service_http, job_id)
+    assert travail["statut"] == STATUT_TERMINE
+    assert travail["nom"] == "bulletin.pdf" and travail["empreinte"] == empreinte_document(pdf)
+
+    # Même résultat qu'une analyse locale avec les mêmes réglages
+    extractor = PDFEconomicExtractor("", client=FakeGroqClient(), planificateur=RateLimitScheduler(10**6, 10**9))
+    attendu = extractor.analyser_document(pdf, mode_lot=True, chevauchement_tokens=100, pages=[1, 2])
+    sortie = pd.DataFrame(service_http.sortie(job_id), columns=COLONNES_RESULTATS)
+    assert not sortie.empty
+    pd.testing.assert_frame_equal(sortie, attendu.reset_index(drop=True), check_dtype=False)
+    assert len(service_http.resultats(job_id)["lignes"]) >= len(sortie)
+
+
+def test_service_refuse_pages_hors_document(service_http):
+    with pytest.raises(HTTPError) as erreur:
+        service_http.soumettre(generer_pdf(2), "bulletin.pdf", pages="1-5")
+    assert erreur.value.code == 400
@@ -0,0 +1,70 @@
+import fitz
+
+from extracteur.limitation import RateLimitScheduler
+from extracteur.pdf import lire_page
+from extracteur.pipeline import PDFEconomicExtractor
+from extracteur.tableaux import extraire_tableaux
+from extracteur.validation import ligne_valide
+
+COLONNES = [250, 330, 410]
+
+
+def _tableau(page, y, titre, coin, lignes):
+    if titre:
+        page.insert_text((50, y - 14), titre, fontsize=9)
+    page.insert_text((50, y), coin, fontsize=9)
+    for x, periode in zip(COLONNES, ["2022", "2023", "2024"]):
+        page.insert_text((x, y), periode, fontsize=9)
+    for libelle, valeurs in lignes:
+        y += 14
+        page.insert_text((50, y), libelle, fontsize=9)
+        for x, valeur in zip(COLONNES, valeurs):
+            page.insert_text((x + 5, y), valeur, fontsize=9)
+    return y
+
+
+def pdf_deux_tableaux():
+    # Un tableau d'indicateurs reconnus, puis un tableau sans titre de secteurs absents du lexique
+    document = fitz.open()
+    page = document.new_page()
+    y = _tableau(page, 80, "Tableau 1 : Croissance et prix (en %)", "Indicateur",
+                 [("PIB", ["1,5", "3,4", "3,2"]), ("Inflation", ["6,6", "6,1", "0,9"])])
+    _tableau(page, y + 60, "", "Branche", [("Mines", ["-20,1", "1,2", "12,4"]),
+                                           ("Hôtels et restaurants", ["42,3", "11,2", "8,1"])])
+    return document.tobytes()
+
+
+def test_tableau_non_valide_reste_dans_le_texte():
+    with fitz.open(stream=pdf_deux_tableaux(), filetype="pdf") as document:
+        assert len(extraire_tableaux(document[0])) == 2
+        texte, _, tableaux = lire_page(document[0])
+    # Seul le tableau dont des lignes passent la validation est traité localement et retiré du texte
+    assert len(tableaux) == 1
+    assert "PIB" not in texte and "Inflation" not in texte
+    assert "Mines" in texte and "Hôtels et restaurants" in texte and "42,3" in texte
+
+
+def test_tableau_non_valide_envoye_au_llm(tmp_path, monkeypatch):
+    monkeypatch.setenv("PDF_EXTRACTOR_CACHE_DIR", str(tmp_path))
+    extractor = PDFEconomicExtractor("", client=object(), planificateur=RateLimitScheduler(10**6, 10**9))
+    texte = "".join(extractor.iter_pages(pdf_deux_tableaux(), seuil_parallele=0))
+    assert "Hôtels et restaurants" in texte
+    assert {ligne["Secteur/Indicateur"] for ligne in extractor.lignes_tableaux()} == {"PIB", "Inflation"}
+    assert extractor.rapport.compteurs["tableaux"] == 1
+
+
+def test_tableau_mixte_reste_entier_dans_le_texte():
+    document = fitz.open()
+    page = document.new_page()
+    _tableau(page, 80, "Tableau 2 : Valeur ajoutée par branche (en %)", "Branche",
+             [("Agriculture", ["-11,3", "1,4", "-4,8"]), ("Mines", ["-20,1", "1,2", "12,4"]),
+              ("Hôtels et restaurants", ["42,3", "11,2", "8,1"])])
+    with fitz.open(stream=document.tobytes(), filetype="pdf") as document:
+        lignes = extraire_tableaux(document[0])[0]["lignes"]
+        texte, _, tableaux = lire_page(document[0])
+    # Une partie des lignes seulement est valide : tout le tableau est confié au LLM
+    assert {ligne["Secteur/Indicateur"] for ligne in lignes} == {"Agriculture", "Mines", "Hôtels et restaurants"}
+    valides = [ligne_valide(ligne["Secteur/Indicateur"], ligne["Valeur"], ligne["Phrase"]) for ligne in lignes]
+    assert any(valides) and not all(valides)
+    assert tableaux == []
+    assert "Agriculture" in texte and "Mines" in texte and "42,3" in texte
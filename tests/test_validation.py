@@ -0,0 +1,103 @@
+import random
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from extracteur.lexique import EXCLUSIONS, INDICATEURS_PRIORITAIRES, MOTS_CLES_VALIDES, MOTS_EXCLUS_INDICATEUR, MOTS_PERIODE
+from extracteur.validation import alternance, ligne_valide, masque_qualite, masque_validite, scores_qualite
+
+# Implémentations d'origine (boucles any(...)), référence de la version compilée et vectorisée
+
+
+def ligne_valide_reference(secteur_indicateur, valeur, phrase, mots_cles_valides=MOTS_CLES_VALIDES):
+    if any(mot in secteur_indicateur.lower() for mot in MOTS_EXCLUS_INDICATEUR):
+        return False
+    texte_complet = f"{secteur_indicateur} {phrase}".lower()
+    if not any(mot in texte_complet for mot in mots_cles_valides):
+        return False
+    if not re.search(r'-?\d+[,.]?\d*', valeur):
+        return False
+    if any(mot in texte_complet for mot in EXCLUSIONS):
+        return False
+    return not (len(secteur_indicateur) < 3 or len(phrase) < 20)
+
+
+def score_reference(donnee):
+    secteur_indicateur = donnee.get('Secteur/Indicateur', '').lower()
+    phrase = donnee.get('Phrase', '').lower()
+    valeur = donnee.get('Valeur', '')
+    score = 0
+    for indicateur in INDICATEURS_PRIORITAIRES:
+        if indicateur in secteur_indicateur or indicateur in phrase:
+            score += 2
+    if '%' in valeur or 'point' in valeur:
+        score += 1
+    if any(mot in phrase for mot in MOTS_PERIODE):
+        score += 1
+    return score
+
+
+MOTS = (
+    list(MOTS_CLES_VALIDES) + list(INDICATEURS_PRIORITAIRES) + list(MOTS_EXCLUS_INDICATEUR) + list(EXCLUSIONS)
+    + list(MOTS_PERIODE) + ["Économie", "ÉTÉ", "prévisions", "hausse", "déficit", "Crédit", "à", "été", "œuvre",
+                            "PIB", "Inflation", "TAUX", "Trimestre", "2023", "%", "points", "de", "la", "le"]
+)
+VALEURS = ["", "3,2%", "-1.5 points", "12", "n.d.", "%", "environ", "4 pb", "−2,1 %", "1 200", "point"]
+
+
+def texte_aleatoire(aleatoire, nb_max):
+    return " ".join(aleatoire.choice(MOTS) for _ in range(aleatoire.randint(0, nb_max)))
+
+
+def lignes_aleatoires(graine, nombre=3000):
+    aleatoire = random.Random(graine)
+    return [
+        {
+            "Secteur/Indicateur": texte_aleatoire(aleatoire, 3),
+            "Valeur": aleatoire.choice(VALEURS),
+            "Période": aleatoire.choice(["", "2023", "T1 2024"]),
+            "Phrase": texte_aleatoire(aleatoire, 12),
+        }
+        for _ in range(nombre)
+    ]
+
+
+@pytest.mark.parametrize("graine", [1, 2, 3])
+def test_validation_identique_a_la_boucle(graine):
+    lignes = lignes_aleatoires(graine)
+    attendu = [ligne_valide_reference(l["Secteur/Indicateur"], l["Valeur"], l["Phrase"]) for l in lignes]
+    assert [ligne_valide(l["Secteur/Indicateur"], l["Valeur"], l["Phrase"]) for l in lignes] == attendu
+    assert masque_validite(pd.DataFrame(lignes)).tolist() == attendu
+    assert any(attendu) and not all(attendu)
+
+
+def test_validation_mots_cles_personnalises():
+    mots_cles = ["économie", "crédit"]
+    lignes = lignes_aleatoires(4)
+    attendu = [ligne_valide_reference(l["Secteur/Indicateur"], l["Valeur"], l["Phrase"], mots_cles) for l in lignes]
+    compile = alternance(mots_cles)
+    assert [ligne_valide(l["Secteur/Indicateur"], l["Valeur"], l["Phrase"], compile) for l in lignes] == attendu
+    assert masque_validite(pd.DataFrame(lignes), compile).tolist() == attendu
+
+
+@pytest.mark.parametrize("graine", [5, 6])
+def test_qualite_identique_a_la_boucle(graine):
+    lignes = lignes_aleatoires(graine)
+    df = pd.DataFrame(lignes)
+    attendu = np.array([score_reference(ligne) for ligne in lignes])
+    assert scores_qualite(df).tolist() == attendu.tolist()
+    for score_minimal in (1, 2, 3, 4):
+        assert masque_qualite(df, score_minimal).tolist() == (attendu >= score_minimal).tolist()
+
+
+def test_valeurs_vides_et_manquantes():
+    df = pd.DataFrame([
+        {"Secteur/Indicateur": None, "Valeur": None, "Période": None, "Phrase": None},
+        {"Secteur/Indicateur": "", "Valeur": "", "Période": "", "Phrase": ""},
+        {"Secteur/Indicateur": "Inflation", "Valeur": "2,1 %", "Période": "2023",
+         "Phrase": "L'inflation a atteint 2,1 % en moyenne annuelle en 2024"},
+    ])
+    assert scores_qualite(df).tolist() == [0, 0, score_reference(df.iloc[2].to_dict())]
+    assert masque_qualite(df).tolist() == [False, False, True]